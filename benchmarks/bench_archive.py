@@ -0,0 +1,54 @@
+"""Archival of finished appointments, timed per batch of rows moved.
+
+Every round books a batch of long-past appointments and archives them, so a
+round also checks that ids freed by the previous archival are never handed
+out again (an id reused by a new appointment cannot be archived a second time):
+    python -m pytest benchmarks/bench_archive.py --benchmark-json=archive.json
+"""
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import delete, func, select
+from src.models.appointment import Appointment
+from src.models.archive import ArchivedAppointment
+from src.models.base import db
+from src.services.archive import archive_appointments
+
+BATCH = 200
+# Older than anything datagen writes, so only the rows booked here are archived
+BOOKED_AT = datetime(1990, 1, 1, 9, 0)
+HORIZON_DAYS = (datetime.utcnow() - BOOKED_AT).days - 1
+
+
+def _clear_booked(app):
+    with app.app_context():
+        for model in (Appointment, ArchivedAppointment):
+            db.session.execute(delete(model).where(model.appointment_date < BOOKED_AT + timedelta(days=1)))
+        db.session.commit()
+
+
+@pytest.fixture(scope='module')
+def booked(app):
+    _clear_booked(app)
+    yield
+    _clear_booked(app)
+
+
+def bench_archive_appointments(benchmark, app, booked):
+    def book():
+        with app.app_context():
+            archived_max = db.session.execute(select(func.max(ArchivedAppointment.id))).scalar() or 0
+            appointments = [
+                Appointment(patient_id=1, appointment_date=BOOKED_AT + timedelta(minutes=i), status='completed')
+                for i in range(BATCH)
+            ]
+            db.session.add_all(appointments)
+            db.session.commit()
+            new_ids = [appointment.id for appointment in appointments]
+            assert min(new_ids) > archived_max, 'archived appointment ids were reused'
+        return (), {}
+
+    def archive():
+        with app.app_context():
+            assert archive_appointments(horizon_days=HORIZON_DAYS) == BATCH
+
+    benchmark.pedantic(archive, setup=book, rounds=5)
@@ -0,0 +1,50 @@
+"""Bytes on the wire and compression CPU per request for the large /api payloads.
+
+Each benchmark times encoding one real response body (the CPU the compression
+layer adds to a request) and records its size in extra_info:
+    python -m pytest benchmarks/bench_compression.py --benchmark-json=compression.json
+"""
+from datetime import date, timedelta
+import pytest
+from src.services.compression import available_encoders, compress_body
+
+_today = date.today()
+_year = f'start_date={(_today - timedelta(days=365)).isoformat()}&end_date={_today.isoformat()}'
+
+ENDPOINTS = {
+    'patients': '/api/patients',
+    'appointments': '/api/appointments',
+    'reports_year': f'/api/reports?{_year}',
+    'revenue_year': f'/api/reports/revenue?{_year}',
+}
+
+
+@pytest.fixture(scope='module')
+def payloads(client):
+    bodies = {}
+    for name, url in ENDPOINTS.items():
+        response = client.get(url, headers={'Accept-Encoding': 'identity'})
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response.headers
+        bodies[name] = response.get_data()
+    return bodies
+
+
+@pytest.mark.parametrize('encoder', available_encoders(), ids=lambda encoder: encoder.name)
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def bench_compress(benchmark, payloads, endpoint, encoder):
+    body = payloads[endpoint]
+    compressed = benchmark(compress_body, encoder, body)
+    benchmark.extra_info['identity_bytes'] = len(body)
+    benchmark.extra_info['encoded_bytes'] = len(compressed)
+    benchmark.extra_info['ratio'] = round(len(body) / max(len(compressed), 1), 1)
+
+
+@pytest.mark.parametrize('encoding', ['identity', 'gzip'])
+def bench_get_appointments_encoded(benchmark, client, encoding):
+    def get():
+        response = client.get('/api/appointments', headers={'Accept-Encoding': encoding})
+        assert response.status_code == 200
+        return response
+    response = benchmark(get)
+    benchmark.extra_info['bytes'] = len(response.get_data())
@@ -0,0 +1,102 @@
+"""Micro-benchmarks for the route handlers against the synthetic dataset.
+
+Run from the repository root:
+    python -m pytest benchmarks --benchmark-json=bench.json
+    python benchmarks/compare.py bench.json
+"""
+from datetime import date, timedelta
+
+
+def _get(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response
+
+
+def _range(days):
+    today = date.today()
+    return f'start_date={(today - timedelta(days=days)).isoformat()}&end_date={today.isoformat()}'
+
+
+# Patients
+
+def bench_get_patients(benchmark, client):
+    benchmark(_get, client, '/api/patients')
+
+
+def bench_get_patient(benchmark, client):
+    benchmark(_get, client, '/api/patients/1')
+
+
+def bench_search_patients_by_name(benchmark, client):
+    benchmark(_get, client, '/api/patients/search?q=garcia')
+
+
+def bench_search_patients_by_phone(benchmark, client):
+    benchmark(_get, client, '/api/patients/search?q=555-12')
+
+
+def bench_create_patient(benchmark, client):
+    def create():
+        response = client.post('/api/patients', json={
+            'first_name': 'Bench', 'last_name': 'Patient', 'phone': '555-000-0000'
+        })
+        assert response.status_code == 201
+    benchmark(create)
+
+
+# Appointments
+
+def bench_get_appointments(benchmark, client):
+    benchmark(_get, client, '/api/appointments')
+
+
+def bench_get_appointments_for_day(benchmark, client):
+    benchmark(_get, client, f'/api/appointments?date={date.today().isoformat()}')
+
+
+def bench_get_appointments_for_patient(benchmark, client):
+    benchmark(_get, client, '/api/appointments?patient_id=1')
+
+
+def bench_get_upcoming_appointments(benchmark, client):
+    benchmark(_get, client, '/api/appointments/upcoming')
+
+
+def bench_create_appointment(benchmark, client):
+    when = (date.today() + timedelta(days=3)).isoformat() + 'T10:00:00'
+
+    def create():
+        response = client.post('/api/appointments', json={
+            'patient_id': 1, 'appointment_date': when, 'treatment_type': 'Cleaning'
+        })
+        assert response.status_code == 201
+    benchmark(create)
+
+
+# Treatments
+
+def bench_get_treatments(benchmark, client):
+    benchmark(_get, client, '/api/treatments')
+
+
+# Reports
+
+def bench_dashboard(benchmark, client):
+    benchmark(_get, client, '/api/reports/dashboard')
+
+
+def bench_unified_reports_month(benchmark, client):
+    benchmark(_get, client, f'/api/reports?{_range(30)}')
+
+
+def bench_unified_reports_year(benchmark, client):
+    benchmark(_get, client, f'/api/reports?{_range(365)}')
+
+
+def bench_appointment_reports_year(benchmark, client):
+    benchmark(_get, client, f'/api/reports/appointments?{_range(365)}')
+
+
+def bench_revenue_reports_year(benchmark, client):
+    benchmark(_get, client, f'/api/reports/revenue?{_range(365)}')
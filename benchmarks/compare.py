@@ -0,0 +1,81 @@
+"""Compare a pytest-benchmark JSON run against the stored baseline.
+
+Usage:
+    python benchmarks/compare.py bench.json            # fail on regressions
+    python benchmarks/compare.py bench.json --save     # record a new baseline
+
+Medians are compared per backend (sqlite, postgresql). A benchmark regresses
+when its median exceeds the baseline by more than the allowed ratio.
+"""
+import argparse
+import json
+import os
+import sys
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_MAX_REGRESSION = 0.25
+
+
+def load_medians(results_path):
+    with open(results_path) as f:
+        results = json.load(f)
+    backend = results.get('backend', 'sqlite')
+    medians = {bench['name']: bench['stats']['median'] for bench in results['benchmarks']}
+    return backend, medians
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check benchmark results against the baseline')
+    parser.add_argument('results', help='file written by pytest --benchmark-json')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help='allowed slowdown ratio, e.g. 0.25 for +25%%')
+    parser.add_argument('--save', action='store_true', help='overwrite the baseline for this backend')
+    args = parser.parse_args()
+
+    backend, medians = load_medians(args.results)
+
+    baseline = {'max_regression': DEFAULT_MAX_REGRESSION, 'backends': {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.save:
+        baseline['backends'][backend] = {name: round(value, 6) for name, value in sorted(medians.items())}
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Saved {len(medians)} {backend} medians to {args.baseline}')
+        return 0
+
+    expected = baseline['backends'].get(backend)
+    if not expected:
+        print(f'No {backend} baseline recorded; run with --save first')
+        return 1
+
+    max_regression = args.max_regression
+    if max_regression is None:
+        max_regression = baseline.get('max_regression', DEFAULT_MAX_REGRESSION)
+
+    failures = 0
+    for name, median in sorted(medians.items()):
+        reference = expected.get(name)
+        if reference is None:
+            print(f'  NEW   {name}: {median * 1000:.2f} ms (no baseline)')
+            continue
+        ratio = median / reference - 1
+        status = 'OK'
+        if ratio > max_regression:
+            status = 'SLOW'
+            failures += 1
+        print(f'  {status:<5} {name}: {median * 1000:.2f} ms vs {reference * 1000:.2f} ms ({ratio:+.0%})')
+
+    if failures:
+        print(f'{failures} benchmark(s) regressed by more than {max_regression:.0%}')
+        return 1
+    print('No regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The app reads DATABASE_URL at import time, so pick the benchmark database first.
+# Run once per backend, e.g. BENCH_DATABASE_URL=postgresql://localhost/dental_bench
+BENCH_DATABASE_URL = os.environ.get(
+    'BENCH_DATABASE_URL',
+    f"sqlite:///{os.path.join(tempfile.gettempdir(), 'dental-bench.db')}"
+)
+BENCH_PATIENTS = int(os.environ.get('BENCH_PATIENTS', 2000))
+BENCH_YEARS = int(os.environ.get('BENCH_YEARS', 3))
+BACKEND = BENCH_DATABASE_URL.split(':', 1)[0].split('+', 1)[0]
+
+os.environ['DATABASE_URL'] = BENCH_DATABASE_URL
+
+
+def pytest_benchmark_update_json(config, benchmarks, output_json):
+    """Tag the results with the backend so compare.py picks the right baseline"""
+    output_json['backend'] = BACKEND
+    output_json['dataset'] = {'patients': BENCH_PATIENTS, 'years': BENCH_YEARS}
+
+
+@pytest.fixture(scope='session')
+def app():
+    from src.main import app as flask_app
+    from src.models.base import db
+    from src.models.patient import Patient
+    from src.models.user import User
+    from src.services.search import ensure_search_index
+    from benchmarks.datagen import generate
+
+    with flask_app.app_context():
+        # Reuse the dataset between runs unless its size changed
+        if Patient.query.count() != BENCH_PATIENTS:
+            db.drop_all()
+            db.create_all()
+            User.create_admin_user('admin', 'admin@dentaloffice.com', 'admin123')
+            generate(db.session, patients=BENCH_PATIENTS, years=BENCH_YEARS)
+            # drop_all takes the full-text triggers with it; recreate and rebuild
+            ensure_search_index()
+    return flask_app
+
+
+@pytest.fixture(scope='session')
+def client(app):
+    test_client = app.test_client()
+    response = test_client.post('/api/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 200
+    return test_client
@@ -0,0 +1,62 @@
+"""HTTP load scenario mirroring a receptionist's day.
+
+Seed the target with benchmarks/datagen.py, start the app, then:
+    locust -f benchmarks/locustfile.py --host http://localhost:5000 \
+        --users 20 --spawn-rate 2 --run-time 5m --headless
+"""
+import random
+from datetime import date, datetime, timedelta
+from locust import HttpUser, between, task
+
+from datagen import LAST_NAMES, TREATMENTS
+
+
+class Receptionist(HttpUser):
+    wait_time = between(1, 5)
+
+    def on_start(self):
+        self.rng = random.Random()
+        self.patient_ids = []
+        self.client.post('/api/login', json={'username': 'admin', 'password': 'admin123'})
+
+    @task(5)
+    def dashboard(self):
+        self.client.get('/api/reports/dashboard')
+        self.client.get('/api/appointments/upcoming')
+        self.client.get(f'/api/appointments?date={date.today().isoformat()}',
+                        name='/api/appointments?date=[today]')
+
+    @task(4)
+    def search_patient(self):
+        query = self.rng.choice(LAST_NAMES).lower()[:4]
+        response = self.client.get(f'/api/patients/search?q={query}', name='/api/patients/search')
+        if response.ok:
+            self.patient_ids = [patient['id'] for patient in response.json()[:20]]
+
+    @task(2)
+    def view_patient(self):
+        if not self.patient_ids:
+            return
+        patient_id = self.rng.choice(self.patient_ids)
+        self.client.get(f'/api/patients/{patient_id}', name='/api/patients/[id]')
+        self.client.get(f'/api/appointments?patient_id={patient_id}',
+                        name='/api/appointments?patient_id=[id]')
+
+    @task(2)
+    def book_appointment(self):
+        if not self.patient_ids:
+            return
+        day = date.today() + timedelta(days=self.rng.randrange(1, 30))
+        when = datetime.combine(day, datetime.min.time()) + timedelta(hours=self.rng.randrange(8, 17))
+        self.client.post('/api/appointments', json={
+            'patient_id': self.rng.choice(self.patient_ids),
+            'appointment_date': when.isoformat(),
+            'treatment_type': self.rng.choice(TREATMENTS)[0],
+        })
+
+    @task(1)
+    def monthly_report(self):
+        today = date.today()
+        start = today.replace(day=1)
+        self.client.get(f'/api/reports?start_date={start.isoformat()}&end_date={today.isoformat()}',
+                        name='/api/reports?[month]')
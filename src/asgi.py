@@ -0,0 +1,30 @@
+import os
+import sys
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from contextlib import asynccontextmanager
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from src.main import app as flask_app
+from src.routes.async_api import routes
+from src.services.async_db import dispose_async_engines
+
+# Async serving mode: the hot read endpoints run on asyncio with SQLAlchemy's
+# async engine, so a request waiting on the database holds no thread; every
+# other route is the Flask app, run in a thread pool. Start with
+# `cd src && uvicorn asgi:app --host 0.0.0.0 --port $PORT`.
+wsgi = WSGIMiddleware(flask_app, workers=int(os.environ.get('ASGI_WSGI_THREADS', 10)))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await dispose_async_engines()
+
+
+app = Starlette(routes=routes + [Mount('/', app=wsgi)], lifespan=lifespan)
+app.state.flask_app = flask_app
+app.state.wsgi = wsgi
+app.state.compression_min_bytes = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
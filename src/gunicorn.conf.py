@@ -0,0 +1,27 @@
+import os
+import shutil
+import tempfile
+
+# Every worker writes its metric values here so /metrics can aggregate them
+# (must be set before the app, and therefore prometheus_client, is imported)
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'dental-office-metrics')
+)
+
+# Threaded workers so long-lived /api/events streams do not pin a whole worker each
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def on_starting(server):
+    """Start every deployment with an empty metrics directory"""
+    multiproc_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that went away"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
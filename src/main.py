@@ -3,7 +3,7 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, request, redirect, url_for
+from flask import Flask, send_from_directory, request, redirect, url_for, session
 from flask_cors import CORS
 from flask_login import LoginManager, login_required, current_user
 from flask_bcrypt import Bcrypt
@@ -12,11 +12,44 @@ from src.models.user import User
 from src.models.patient import Patient
 from src.models.appointment import Appointment
 from src.models.treatment import Treatment
+from src.models.provider import Provider
+from src.models.operatory import Operatory
+from src.models.schema import upgrade_schema
 from src.routes.user import user_bp
 from src.routes.patient import patient_bp
 from src.routes.appointment import appointment_bp
 from src.routes.treatment import treatment_bp
+from src.routes.provider import provider_bp
 from src.routes.reports import reports_bp
+from src.routes.metrics import metrics_bp
+from src.routes.audit import audit_bp
+from src.routes.events import events_bp
+from src.routes.sync import sync_bp
+from src.routes.jobs import jobs_bp
+from src.routes.attachment import attachments_bp
+from src.routes.search import search_bp
+from src.routes.calendar import calendar_bp
+from src.services.metrics import init_metrics
+from src.services.compression import init_compression
+from src.services.admission import init_admission
+from src.services.replicas import init_replicas
+from src.services.archive import init_archive
+from src.services.audit import init_audit
+from src.services.events import init_events
+from src.services.sync import init_sync
+from src.services.reminders import init_reminders
+from src.services.analytics import init_analytics
+from src.services.revenue import init_revenue, ensure_revenue_cubes
+from src.services.dedup import init_dedup, ensure_blocking_keys
+from src.services.contacts import init_contacts
+from src.services.blobstore import init_attachments
+from src.services.idempotency import init_idempotency
+from src.services.search import init_search, ensure_search_index
+from src.services.calendar import init_calendar
+from src.services.backup import init_backups, ensure_backup_schedule
+from src.services.partitioning import init_partitioning, ensure_appointment_partitions
+from src.services.jobs import enqueue
+from src.services.sessions import init_sessions, user_snapshot, user_from_snapshot, SNAPSHOT_KEY
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -33,17 +66,48 @@ bcrypt = Bcrypt(app)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # The id is '<user id>:<password fingerprint>' (see User.get_id)
+    user_id, _, fingerprint = user_id.partition(':')
+    
+    # Serve the user from the session snapshot instead of a query per request
+    snapshot = session.get(SNAPSHOT_KEY)
+    if snapshot and str(snapshot.get('id')) == user_id and snapshot.get('fingerprint') == fingerprint:
+        return user_from_snapshot(snapshot)
+    
+    # A stale fingerprint is a login (e.g. a remember-me cookie) from before a password change
+    user = User.query.get(int(user_id))
+    if not user or not user.is_active or user.password_fingerprint() != fingerprint:
+        return None
+    session[SNAPSHOT_KEY] = user_snapshot(user)
+    return user
 
 # Enable CORS for all routes
 CORS(app, supports_credentials=True)
 
+# Request latency/throughput metrics (hooks must run before require_login)
+init_metrics(app)
+
+# gzip/br/zstd for /api responses, negotiated from Accept-Encoding
+init_compression(app)
+
+# Per-class concurrency limits: writes first, then search, then reports; 503 when saturated
+init_admission(app)
+
 # Register blueprints (API routes should be registered before catch-all static file route)
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(patient_bp, url_prefix='/api')
 app.register_blueprint(appointment_bp, url_prefix='/api')
 app.register_blueprint(treatment_bp, url_prefix='/api')
+app.register_blueprint(provider_bp, url_prefix='/api')
 app.register_blueprint(reports_bp, url_prefix='/api')
+app.register_blueprint(audit_bp, url_prefix='/api')
+app.register_blueprint(events_bp, url_prefix='/api')
+app.register_blueprint(sync_bp, url_prefix='/api')
+app.register_blueprint(jobs_bp, url_prefix='/api')
+app.register_blueprint(attachments_bp, url_prefix='/api')
+app.register_blueprint(search_bp, url_prefix='/api')
+app.register_blueprint(calendar_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp)
 
 # Database configuration
 database_url = os.environ.get('DATABASE_URL')
@@ -53,15 +117,83 @@ if database_url:
     print("✅ Using external database from DATABASE_URL")
 else:
     # Use SQLite as default
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    database_dir = os.path.join(os.path.dirname(__file__), 'database')
+    os.makedirs(database_dir, exist_ok=True)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(database_dir, 'app.db')}"
     print("📁 Using SQLite database")
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Read replicas (DATABASE_REPLICA_URLS) serve GET requests; binds must exist before init_app
+init_replicas(app)
 db.init_app(app)
 
+# Server-side sessions (SESSION_BACKEND=sql|file); the cookie only carries the session id
+init_sessions(app)
+
+# Field-level audit trail, written in batches by a background thread
+init_audit(app)
+
+# `flask archive-appointments` moves old finished appointments out of the hot table
+init_archive(app)
+
+# Change feed for live schedule updates (/api/events)
+init_events(app)
+
+# Tombstones for hard deletes, served by /api/sync
+init_sync()
+
+# `flask send-reminders` (or a `send_reminders` job) notifies tomorrow's patients
+init_reminders(app)
+
+# Day/week/month revenue cubes kept in step with appointment and treatment changes
+init_revenue(app)
+
+# Blocking-key index for duplicate patient detection and merging
+init_dedup(app)
+
+# `flask backfill-contacts` recomputes the normalized phone/email lookup columns
+init_contacts(app)
+
+# Content-addressed attachment storage; `flask purge-attachments` drops deleted blobs
+init_attachments(app)
+
+# Idempotency-Key replay for create/update routes; expired keys are swept periodically
+init_idempotency(app)
+
+# `flask reindex-search` rebuilds the full-text index behind /api/search
+init_search(app)
+
+# Cached ICS schedule feeds, dropped on appointment, patient and provider changes
+init_calendar(app)
+
+# Online backups (`flask backup-database`, scheduled by BACKUP_INTERVAL_HOURS), restore and clinic export
+init_backups(app)
+
+# Range partitioning of appointments by date on PostgreSQL (APPOINTMENT_PARTITIONING=yearly|monthly)
+init_partitioning(app)
+
 # Create database tables and setup admin user
 with app.app_context():
     db.create_all()
+    added_columns = upgrade_schema()
+    
+    # Existing patients predate the normalized lookup columns
+    if ('patients', 'phone_normalized') in added_columns:
+        enqueue('backfill_contact_columns', dedupe_key='backfill_contact_columns')
+        print("☎️  Queued a backfill of normalized patient phone/email for the job worker")
+    
+    # First start after upgrading: build the revenue cubes from existing history
+    if ensure_revenue_cubes() is not None:
+        print("💰 Queued a revenue cube rebuild for the job worker")
+    if ensure_blocking_keys() is not None:
+        print("🔎 Queued a patient blocking-key rebuild for the job worker")
+    unindexed = ensure_search_index()
+    if unindexed:
+        enqueue('reindex_search', {'tables': unindexed}, dedupe_key='reindex_search')
+        print("🔍 Queued a full-text search reindex for the job worker")
+    ensure_backup_schedule()
+    ensure_appointment_partitions()
     
     # Create default admin user if no users exist
     if User.query.count() == 0:
@@ -72,6 +204,10 @@ with app.app_context():
         print("🔑 Default admin user created: username='admin', password='admin123'")
         print("⚠️  Please change the default password after first login!")
 
+# In-memory columnar appointment snapshot behind the report facets (ANALYTICS_SNAPSHOT=off disables);
+# its refresher reads the tables, so it starts once they exist
+init_analytics(app)
+
 # Authentication check for main application
 @app.before_request
 def require_login():
@@ -80,6 +216,8 @@ def require_login():
         'user.login_page', 
         'user.login', 
         'user.setup_admin',
+        'metrics.metrics',  # Protected by METRICS_TOKEN instead of a login
+        'calendar.get_calendar_feed',  # Protected by the feed token in its URL
         'static'
     ]
     
@@ -1,24 +1,52 @@
-from datetime import datetime
+from datetime import datetime, time, timedelta
 from src.models.base import db
 
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # Per-resource schedules are range scans on (resource, date)
+        db.Index('ix_appointments_provider_date', 'provider_id', 'appointment_date'),
+        db.Index('ix_appointments_operatory_date', 'operatory_id', 'appointment_date'),
+        # Archival deletes the newest finished rows; SQLite must not hand their ids out again
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
-    appointment_date = db.Column(db.DateTime, nullable=False)
+    appointment_date = db.Column(db.DateTime, nullable=False, index=True)
     treatment_type = db.Column(db.String(100))
     notes = db.Column(db.Text)
     status = db.Column(db.String(20), default='scheduled')  # scheduled, completed, cancelled, no-show
+    provider_id = db.Column(db.Integer, db.ForeignKey('providers.id'), nullable=True)
+    operatory_id = db.Column(db.Integer, db.ForeignKey('operatories.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    deleted_at = db.Column(db.DateTime, nullable=True)  # Soft delete: set instead of removing the row
     
-    # Relationship
-    patient = db.relationship('Patient', backref=db.backref('appointments', lazy=True))
+    # Relationship: `patient` is provided by the backref on Patient.appointments
     
     def __repr__(self):
         return f'<Appointment {self.id} - {self.patient_id} on {self.appointment_date}>'
     
+    @classmethod
+    def not_deleted(cls):
+        """Filter clause excluding soft-deleted appointments"""
+        return cls.deleted_at.is_(None)
+    
+    @classmethod
+    def on_days(cls, start_date, end_date=None):
+        """Filter clause for appointments from start_date through end_date (inclusive)
+        
+        A half-open range on appointment_date, unlike func.date(), can use the
+        (resource, appointment_date) indexes and lets PostgreSQL prune the
+        partitions outside the range when appointments is partitioned.
+        """
+        end_date = end_date or start_date
+        return db.and_(
+            cls.appointment_date >= datetime.combine(start_date, time()),
+            cls.appointment_date < datetime.combine(end_date + timedelta(days=1), time())
+        )
+    
     def to_dict(self):
         """Convert appointment to dictionary"""
         return {
@@ -28,6 +56,8 @@ class Appointment(db.Model):
             'treatment_type': self.treatment_type,
             'notes': self.notes,
             'status': self.status,
+            'provider_id': self.provider_id,
+            'operatory_id': self.operatory_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
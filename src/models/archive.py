@@ -0,0 +1,29 @@
+from datetime import datetime
+from src.models.base import db
+
+class ArchivedAppointment(db.Model):
+    """Completed/cancelled appointments moved out of the hot appointments table"""
+    __tablename__ = 'appointments_archive'
+    
+    # Same id as the original appointment row
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    patient_id = db.Column(db.Integer, nullable=False, index=True)
+    appointment_date = db.Column(db.DateTime, nullable=False, index=True)
+    treatment_type = db.Column(db.String(100))
+    notes = db.Column(db.Text)
+    status = db.Column(db.String(20))
+    provider_id = db.Column(db.Integer, nullable=True)
+    operatory_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    # Columns copied verbatim from appointments when archiving
+    COPIED_COLUMNS = (
+        'id', 'patient_id', 'appointment_date', 'treatment_type', 'notes',
+        'status', 'provider_id', 'operatory_id', 'created_at', 'updated_at', 'deleted_at'
+    )
+    
+    def __repr__(self):
+        return f'<ArchivedAppointment {self.id} - {self.patient_id} on {self.appointment_date}>'
@@ -0,0 +1,40 @@
+from datetime import datetime
+from src.models.base import db
+
+class Attachment(db.Model):
+    """Metadata of a patient document or radiograph; the bytes live in the blob store"""
+    __tablename__ = 'attachments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=False, default='application/octet-stream')
+    size = db.Column(db.BigInteger, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)  # blob key (content address)
+    description = db.Column(db.Text, nullable=True)
+    uploaded_by = db.Column(db.Integer, nullable=True)  # user id
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<Attachment {self.filename} of patient {self.patient_id}>'
+    
+    @classmethod
+    def not_deleted(cls):
+        """Filter clause excluding deleted attachments"""
+        return cls.deleted_at.is_(None)
+    
+    def to_dict(self):
+        """Convert attachment metadata to dictionary"""
+        return {
+            'id': self.id,
+            'patient_id': self.patient_id,
+            'filename': self.filename,
+            'content_type': self.content_type,
+            'size': self.size,
+            'sha256': self.sha256,
+            'description': self.description,
+            'uploaded_by': self.uploaded_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'content_url': f'/api/attachments/{self.id}/content'
+        }
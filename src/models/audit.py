@@ -0,0 +1,36 @@
+import json
+from datetime import datetime
+from src.models.base import db
+
+class AuditEntry(db.Model):
+    """Append-only record of a change to a patient, appointment, treatment, user or attachment"""
+    __tablename__ = 'audit_log'
+    __table_args__ = (
+        db.Index('ix_audit_log_entity', 'entity_type', 'entity_id', 'created_at'),
+        # Monthly partitions on PostgreSQL (created on demand by the audit writer)
+        {'postgresql_partition_by': 'RANGE (log_date)'},
+    )
+
+    # Client-generated id: partitioned tables need the partition key in the primary key
+    id = db.Column(db.String(32), primary_key=True)
+    log_date = db.Column(db.Date, primary_key=True)
+    entity_type = db.Column(db.String(30), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # create, update, delete, archive
+    changes = db.Column(db.Text, nullable=False)  # JSON: {field: [old, new]}
+    user_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AuditEntry {self.action} {self.entity_type} {self.entity_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'action': self.action,
+            'changes': json.loads(self.changes),
+            'user_id': self.user_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
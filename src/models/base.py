@@ -1,4 +1,20 @@
+from flask import g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select
 
-db = SQLAlchemy()
+class RoutingSession(Session):
+    """Session that sends plain reads to the replica picked for the current request
 
+    src/services/replicas.py sets g.db_read_bind for GET requests; flushes,
+    DML, raw SQL and SELECT ... FOR UPDATE always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context():
+            read_bind = g.get('db_read_bind')
+            if read_bind and isinstance(clause, Select) and clause._for_update_arg is None:
+                return self._db.engines[read_bind]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
@@ -0,0 +1,15 @@
+from src.models.base import db
+
+class PatientBlockingKey(db.Model):
+    """Blocking key of a patient; patients sharing a key are duplicate candidates"""
+    __tablename__ = 'patient_blocking_keys'
+    __table_args__ = (
+        db.Index('ix_patient_blocking_keys_key', 'key', 'patient_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, nullable=False, index=True)
+    key = db.Column(db.String(150), nullable=False)  # e.g. phone:+15551234567, sdx_dob:S530|1980-02-01
+    
+    def __repr__(self):
+        return f'<PatientBlockingKey {self.key} -> {self.patient_id}>'
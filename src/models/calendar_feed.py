@@ -0,0 +1,37 @@
+from datetime import datetime
+from src.models.base import db
+
+class CalendarFeed(db.Model):
+    """A token-authenticated iCalendar subscription to the office's or one provider's schedule"""
+    __tablename__ = 'calendar_feeds'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True)  # SHA-256 of the URL token
+    provider_id = db.Column(db.Integer, db.ForeignKey('providers.id'), nullable=True)  # None: whole office
+    created_by = db.Column(db.Integer, nullable=True)  # user id
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<CalendarFeed {self.name}>'
+    
+    @classmethod
+    def active(cls):
+        """Filter clause excluding revoked feeds"""
+        return cls.revoked_at.is_(None)
+    
+    def cache_key(self):
+        """Feeds showing the same appointments share one rendered body"""
+        return 'office' if self.provider_id is None else f'provider:{self.provider_id}'
+    
+    def to_dict(self):
+        """Convert feed to dictionary (the token is only shown when the feed is created)"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'scope': 'office' if self.provider_id is None else 'provider',
+            'provider_id': self.provider_id,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,19 @@
+from datetime import datetime
+from src.models.base import db
+
+class IdempotencyKey(db.Model):
+    """Outcome of a write request, replayed when a client retries with the same Idempotency-Key"""
+    __tablename__ = 'idempotency_keys'
+
+    user_id = db.Column(db.Integer, primary_key=True)  # keys are scoped to the user sending them
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)  # method, path and body of the first request
+    status = db.Column(db.String(20), nullable=False, default='processing')  # processing, completed
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.LargeBinary, nullable=True)
+    response_content_type = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key} user={self.user_id} {self.status}>'
@@ -0,0 +1,25 @@
+from datetime import datetime
+from src.models.base import db
+
+class Operatory(db.Model):
+    """A treatment room or chair appointments are booked into"""
+    __tablename__ = 'operatories'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Operatory {self.name}>'
+    
+    def to_dict(self):
+        """Convert operatory to dictionary"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
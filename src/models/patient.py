@@ -1,12 +1,35 @@
+import re
 from datetime import datetime
+from sqlalchemy.orm import validates
 from src.models.base import db
 
+def normalize_phone(phone, default_country='1'):
+    """E.164-style '+<digits>' form of a phone number, or None if it has too few digits"""
+    if not phone:
+        return None
+    digits = re.sub(r'\D', '', phone)
+    if phone.strip().startswith('+'):
+        return '+' + digits if len(digits) >= 8 else None
+    if digits.startswith('00'):
+        digits = digits[2:]
+    elif len(digits) == 10:
+        digits = default_country + digits
+    return '+' + digits if len(digits) >= 8 else None
+
+def normalize_email(email):
+    return email.strip().lower() if email and email.strip() else None
+
 class Patient(db.Model):
+    __tablename__ = 'patients'
+    
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
     email = db.Column(db.String(120), nullable=True)  # FIXED: Made nullable and removed unique constraint
     phone = db.Column(db.String(20), nullable=False)
+    # Maintained from phone/email by the validators below; used for exact lookups
+    phone_normalized = db.Column(db.String(20), nullable=True, index=True)
+    email_normalized = db.Column(db.String(120), nullable=True, index=True)
     date_of_birth = db.Column(db.Date, nullable=True)
     address = db.Column(db.Text, nullable=True)
     medical_history = db.Column(db.Text, nullable=True)
@@ -19,7 +42,8 @@ class Patient(db.Model):
     
     notes = db.Column(db.Text, nullable=True)  # Added notes field
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    deleted_at = db.Column(db.DateTime, nullable=True)  # Soft delete: set instead of removing the row
 
     # Relationship with appointments
     appointments = db.relationship("Appointment", backref="patient", lazy=True, cascade="all, delete-orphan")
@@ -27,6 +51,16 @@ class Patient(db.Model):
     def __repr__(self):
         return f"<Patient {self.first_name} {self.last_name}>"
 
+    @validates('phone')
+    def _normalize_phone(self, key, phone):
+        self.phone_normalized = normalize_phone(phone)
+        return phone
+
+    @validates('email')
+    def _normalize_email(self, key, email):
+        self.email_normalized = normalize_email(email)
+        return email
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -46,6 +80,11 @@ class Patient(db.Model):
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
 
+    @classmethod
+    def not_deleted(cls):
+        """Filter clause excluding soft-deleted patients"""
+        return cls.deleted_at.is_(None)
+
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
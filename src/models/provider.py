@@ -0,0 +1,33 @@
+from datetime import datetime
+from src.models.base import db
+
+class Provider(db.Model):
+    """A dentist, hygienist or assistant appointments are booked with"""
+    __tablename__ = 'providers'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    role = db.Column(db.String(20), nullable=False, default='dentist')  # dentist, hygienist, assistant
+    email = db.Column(db.String(120), nullable=True)
+    daily_capacity = db.Column(db.Integer, nullable=True)  # appointments per working day, for utilization
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    ROLES = ('dentist', 'hygienist', 'assistant')
+    
+    def __repr__(self):
+        return f'<Provider {self.name}>'
+    
+    def to_dict(self):
+        """Convert provider to dictionary"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'role': self.role,
+            'email': self.email,
+            'daily_capacity': self.daily_capacity,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
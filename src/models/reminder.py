@@ -0,0 +1,25 @@
+from datetime import datetime
+from src.models.base import db
+
+class Reminder(db.Model):
+    """Delivery record of one reminder per appointment and channel (guards against re-sends)"""
+    __tablename__ = 'appointment_reminders'
+    __table_args__ = (
+        db.UniqueConstraint('appointment_id', 'channel', name='uq_reminder_appointment_channel'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: archiving moves old appointments out of the appointments table
+    appointment_id = db.Column(db.Integer, nullable=False)
+    channel = db.Column(db.String(20), nullable=False)  # email, sms
+    recipient = db.Column(db.String(120), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    claim_token = db.Column(db.String(32), nullable=True, index=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)  # 'sending' rows older than the claim timeout are retried
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<Reminder {self.channel} for appointment {self.appointment_id}: {self.status}>'
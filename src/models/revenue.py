@@ -0,0 +1,18 @@
+from src.models.base import db
+
+class RevenueCube(db.Model):
+    """Completed-appointment revenue pre-aggregated per period and treatment"""
+    __tablename__ = 'revenue_cubes'
+    __table_args__ = (
+        db.UniqueConstraint('grain', 'period_start', 'treatment_type', name='uq_revenue_cube_cell'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    grain = db.Column(db.String(5), nullable=False)  # day, week (starting Monday), month
+    period_start = db.Column(db.Date, nullable=False)
+    treatment_type = db.Column(db.String(100), nullable=False)
+    appointment_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<RevenueCube {self.grain} {self.period_start} {self.treatment_type}>'
@@ -0,0 +1,93 @@
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.schema import CreateTable
+from src.models.base import db
+
+# Tables whose ids also live on elsewhere after the row is deleted; a rebuilt
+# SQLite table starts numbering above them
+ID_FLOORS = {'appointments': ('appointments_archive', 'id')}
+
+def upgrade_schema():
+    """Bring existing tables up to date with the models.
+
+    db.create_all() only creates missing tables, so deployments created by an
+    older release would lack newer columns and indexes. This adds them in
+    place; new columns must therefore be nullable or carry a server default.
+    Returns the (table, column) pairs that were added, so callers can backfill.
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = set()
+
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    ddl += f" DEFAULT {default.text if hasattr(default, 'text') else repr(default)}"
+                conn.execute(text(ddl))
+                added.add((table.name, column.name))
+                print(f"🛠️  Added column {table.name}.{column.name}")
+
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn, checkfirst=True)
+                    print(f"🛠️  Created index {index.name}")
+
+    if engine.dialect.name == 'sqlite':
+        # Separately: the inspector above reads through its own connections
+        with engine.begin() as conn:
+            for table in db.metadata.sorted_tables:
+                if table.name in existing_tables and table.dialect_options['sqlite']['autoincrement']:
+                    _sqlite_add_autoincrement(conn, table)
+    return added
+
+
+def _sqlite_add_autoincrement(conn, table):
+    """Rebuild a SQLite table created without AUTOINCREMENT, if it was
+
+    Without it SQLite reuses the ids of deleted rows at the top of the table.
+    AUTOINCREMENT can only be given at CREATE TABLE, so the rows are copied
+    into a new table that replaces the old one (which takes its indexes and
+    triggers with it; the indexes are recreated here, the search triggers by
+    ensure_search_index).
+    """
+    sql = conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {'name': table.name}).scalar()
+    if sql is None or 'AUTOINCREMENT' in sql.upper():
+        return
+
+    staging = f'{table.name}_rebuild'
+    columns = ', '.join(f'"{column.name}"' for column in table.columns)
+    conn.execute(text(f'DROP TABLE IF EXISTS {staging}'))
+    # A scratch copy of the metadata, so foreign keys resolve without touching db.metadata
+    scratch = MetaData()
+    for other in db.metadata.sorted_tables:
+        other.to_metadata(scratch)
+    conn.execute(CreateTable(table.to_metadata(scratch, name=staging)))
+    conn.execute(text(f'INSERT INTO {staging} ({columns}) SELECT {columns} FROM {table.name}'))
+    conn.execute(text(f'DROP TABLE {table.name}'))
+    conn.execute(text(f'ALTER TABLE {staging} RENAME TO {table.name}'))
+    for index in table.indexes:
+        index.create(conn)
+
+    floor = ID_FLOORS.get(table.name)
+    if floor is not None:
+        highest = conn.execute(text(f'SELECT max({floor[1]}) FROM {floor[0]}')).scalar() or 0
+        updated = conn.execute(text(
+            'UPDATE sqlite_sequence SET seq = max(seq, :highest) WHERE name = :name'
+        ), {'highest': highest, 'name': table.name}).rowcount
+        if not updated:
+            conn.execute(text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :highest)'),
+                         {'name': table.name, 'highest': highest})
+    print(f"🛠️  Rebuilt {table.name} so deleted ids are never reused")
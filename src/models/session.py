@@ -0,0 +1,15 @@
+from datetime import datetime
+from src.models.base import db
+
+class UserSession(db.Model):
+    """Server-side Flask session, looked up by the id carried in the cookie"""
+    __tablename__ = 'user_sessions'
+
+    id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UserSession {self.id[:8]} user={self.user_id}>'
@@ -0,0 +1,17 @@
+from datetime import datetime
+from src.models.base import db
+
+class DeletedRecord(db.Model):
+    """Tombstone left behind by a hard delete so sync clients can drop the row"""
+    __tablename__ = 'deleted_records'
+    __table_args__ = (
+        db.Index('ix_deleted_records_deleted_at', 'deleted_at', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(30), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DeletedRecord {self.entity_type} {self.entity_id}>'
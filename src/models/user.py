@@ -1,7 +1,9 @@
+import hashlib
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from flask_bcrypt import Bcrypt
 from src.models.base import db
+from src.services.metrics import BCRYPT_VERIFY_SECONDS
 
 bcrypt = Bcrypt()
 
@@ -22,11 +24,23 @@ class User(UserMixin, db.Model):
 
     def check_password(self, password):
         """Check if the provided password matches the user's password."""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        with BCRYPT_VERIFY_SECONDS.time():
+            return bcrypt.check_password_hash(self.password_hash, password)
+
+    def password_fingerprint(self):
+        """Short digest of the password hash; changes whenever the password does."""
+        if self.password_hash is None:
+            # Detached user rebuilt from a session snapshot
+            return getattr(self, 'snapshot_fingerprint', '')
+        return hashlib.sha256(self.password_hash.encode()).hexdigest()[:16]
 
     def get_id(self):
-        """Return the user ID as a string (required by Flask-Login)."""
-        return str(self.id)
+        """Return the Flask-Login id: the user ID plus the password fingerprint.
+
+        Remember-me cookies carry this id, so changing the password makes
+        every cookie issued before the change stop working.
+        """
+        return f'{self.id}:{self.password_fingerprint()}'
 
     def to_dict(self):
         return {
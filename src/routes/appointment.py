@@ -2,20 +2,34 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required
 from src.models.appointment import Appointment
 from src.models.patient import Patient
+from src.models.provider import Provider
+from src.models.operatory import Operatory
 from src.models.base import db
+from src.services.archive import archived_appointments_for_patient
+from src.services.idempotency import idempotent
 from datetime import datetime
 
 appointment_bp = Blueprint('appointment', __name__)
 
-@appointment_bp.route('/appointments', methods=['GET'])
+def _resource_errors(data):
+    """Error message if a provider_id/operatory_id in data does not exist, else None"""
+    for field, model, label in (('provider_id', Provider, 'Provider'), ('operatory_id', Operatory, 'Operatory')):
+        if data.get(field) is not None and db.session.get(model, data[field]) is None:
+            return f'{label} not found'
+    return None
+
+@appointment_bp.route('/appointments', methods=['GET'], defaults={'provider_id': None})
+@appointment_bp.route('/providers/<int:provider_id>/appointments', methods=['GET'])
 @login_required
-def get_appointments():
-    """Get all appointments with optional filters"""
+def get_appointments(provider_id):
+    """Get all appointments (or one provider's) with optional filters"""
     try:
         # Get query parameters
         date_filter = request.args.get('date')
         status_filter = request.args.get('status')
+        operatory_id_filter = request.args.get('operatory_id')
         patient_id_filter = request.args.get('patient_id')
+        include_archived = request.args.get('include_archived', 'false').lower() == 'true'
         
         # Start with base query
         query = db.session.query(
@@ -25,15 +39,22 @@ def get_appointments():
             Appointment.notes,
             Appointment.status,
             Appointment.patient_id,
+            Appointment.provider_id,
+            Appointment.operatory_id,
             Patient.first_name,
             Patient.last_name
-        ).join(Patient, Appointment.patient_id == Patient.id)
+        ).join(Patient, Appointment.patient_id == Patient.id).filter(Appointment.not_deleted())
         
         # Apply filters
+        if provider_id is not None:
+            if db.session.get(Provider, provider_id) is None:
+                return jsonify({'error': 'Provider not found'}), 404
+            query = query.filter(Appointment.provider_id == provider_id)
+        
         if date_filter:
             try:
                 filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-                query = query.filter(db.func.date(Appointment.appointment_date) == filter_date)
+                query = query.filter(Appointment.on_days(filter_date))
             except ValueError:
                 return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
         
@@ -47,6 +68,12 @@ def get_appointments():
             except ValueError:
                 return jsonify({'error': 'Invalid patient_id'}), 400
         
+        if operatory_id_filter:
+            try:
+                query = query.filter(Appointment.operatory_id == int(operatory_id_filter))
+            except ValueError:
+                return jsonify({'error': 'Invalid operatory_id'}), 400
+        
         # Execute query and format results
         appointments = query.order_by(Appointment.appointment_date.desc()).all()
         
@@ -59,9 +86,23 @@ def get_appointments():
                 'notes': apt.notes,
                 'status': apt.status,
                 'patient_id': apt.patient_id,
+                'provider_id': apt.provider_id,
+                'operatory_id': apt.operatory_id,
                 'patient_name': f"{apt.first_name} {apt.last_name}"
             })
         
+        # Patient history views can ask for archived rows as well
+        if include_archived and patient_id_filter and provider_id is None:
+            archived = archived_appointments_for_patient(patient_id)
+            if archived:
+                patient_name = result[0]['patient_name'] if result else None
+                if patient_name is None:
+                    patient = Patient.query.get(patient_id)
+                    patient_name = patient.full_name() if patient else None
+                for apt in archived:
+                    apt['patient_name'] = patient_name
+                result = sorted(result + archived, key=lambda apt: apt['appointment_date'], reverse=True)
+        
         return jsonify(result)
         
     except Exception as e:
@@ -80,10 +121,13 @@ def get_appointment(appointment_id):
             Appointment.notes,
             Appointment.status,
             Appointment.patient_id,
+            Appointment.provider_id,
+            Appointment.operatory_id,
             Patient.first_name,
             Patient.last_name
         ).join(Patient, Appointment.patient_id == Patient.id).filter(
-            Appointment.id == appointment_id
+            Appointment.id == appointment_id,
+            Appointment.not_deleted()
         ).first()
         
         if not appointment:
@@ -96,6 +140,8 @@ def get_appointment(appointment_id):
             'notes': appointment.notes,
             'status': appointment.status,
             'patient_id': appointment.patient_id,
+            'provider_id': appointment.provider_id,
+            'operatory_id': appointment.operatory_id,
             'patient_name': f"{appointment.first_name} {appointment.last_name}"
         }
         
@@ -107,6 +153,7 @@ def get_appointment(appointment_id):
 
 @appointment_bp.route('/appointments', methods=['POST'])
 @login_required
+@idempotent
 def create_appointment():
     """Create a new appointment (DURATION REMOVED)"""
     try:
@@ -120,9 +167,13 @@ def create_appointment():
         
         # Validate patient exists
         patient = Patient.query.get(data['patient_id'])
-        if not patient:
+        if not patient or patient.deleted_at:
             return jsonify({'error': 'Patient not found'}), 404
         
+        resource_error = _resource_errors(data)
+        if resource_error:
+            return jsonify({'error': resource_error}), 404
+        
         # Parse appointment date
         try:
             appointment_date = datetime.fromisoformat(data['appointment_date'].replace('Z', '+00:00'))
@@ -135,7 +186,9 @@ def create_appointment():
             appointment_date=appointment_date,
             treatment_type=data.get('treatment_type'),
             notes=data.get('notes'),
-            status=data.get('status', 'scheduled')
+            status=data.get('status', 'scheduled'),
+            provider_id=data.get('provider_id'),
+            operatory_id=data.get('operatory_id')
         )
         
         db.session.add(appointment)
@@ -153,11 +206,12 @@ def create_appointment():
 
 @appointment_bp.route('/appointments/<int:appointment_id>', methods=['PUT'])
 @login_required
+@idempotent
 def update_appointment(appointment_id):
     """Update an existing appointment (DURATION REMOVED)"""
     try:
         appointment = Appointment.query.get(appointment_id)
-        if not appointment:
+        if not appointment or appointment.deleted_at:
             return jsonify({'error': 'Appointment not found'}), 404
         
         data = request.get_json()
@@ -165,10 +219,14 @@ def update_appointment(appointment_id):
         # Validate patient if provided
         if 'patient_id' in data:
             patient = Patient.query.get(data['patient_id'])
-            if not patient:
+            if not patient or patient.deleted_at:
                 return jsonify({'error': 'Patient not found'}), 404
             appointment.patient_id = data['patient_id']
         
+        resource_error = _resource_errors(data)
+        if resource_error:
+            return jsonify({'error': resource_error}), 404
+        
         # Update appointment date if provided
         if 'appointment_date' in data:
             try:
@@ -183,6 +241,10 @@ def update_appointment(appointment_id):
             appointment.notes = data['notes']
         if 'status' in data:
             appointment.status = data['status']
+        if 'provider_id' in data:
+            appointment.provider_id = data['provider_id']
+        if 'operatory_id' in data:
+            appointment.operatory_id = data['operatory_id']
         
         db.session.commit()
         
@@ -196,13 +258,13 @@ def update_appointment(appointment_id):
 @appointment_bp.route('/appointments/<int:appointment_id>', methods=['DELETE'])
 @login_required
 def delete_appointment(appointment_id):
-    """Delete an appointment"""
+    """Soft-delete an appointment"""
     try:
         appointment = Appointment.query.get(appointment_id)
-        if not appointment:
+        if not appointment or appointment.deleted_at:
             return jsonify({'error': 'Appointment not found'}), 404
         
-        db.session.delete(appointment)
+        appointment.deleted_at = datetime.utcnow()
         db.session.commit()
         
         return jsonify({'message': 'Appointment deleted successfully'})
@@ -212,28 +274,36 @@ def delete_appointment(appointment_id):
         print(f"Error deleting appointment {appointment_id}: {str(e)}")
         return jsonify({'error': 'Failed to delete appointment'}), 500
 
-@appointment_bp.route('/appointments/upcoming', methods=['GET'])
+@appointment_bp.route('/appointments/upcoming', methods=['GET'], defaults={'provider_id': None})
+@appointment_bp.route('/providers/<int:provider_id>/appointments/upcoming', methods=['GET'])
 @login_required
-def get_upcoming_appointments():
-    """Get upcoming appointments (next 7 days)"""
+def get_upcoming_appointments(provider_id):
+    """Get upcoming appointments (next 7 days), of all providers or one"""
     try:
         from datetime import timedelta
         
         today = datetime.now().date()
         next_week = today + timedelta(days=7)
         
-        appointments = db.session.query(
+        query = db.session.query(
             Appointment.id,
             Appointment.appointment_date,
             Appointment.treatment_type,
             Appointment.status,
+            Appointment.provider_id,
+            Appointment.operatory_id,
             Patient.first_name,
             Patient.last_name
         ).join(Patient, Appointment.patient_id == Patient.id).filter(
-            db.func.date(Appointment.appointment_date) > today,
-            db.func.date(Appointment.appointment_date) <= next_week,
-            Appointment.status == 'scheduled'
-        ).order_by(Appointment.appointment_date).all()
+            Appointment.on_days(today + timedelta(days=1), next_week),
+            Appointment.status == 'scheduled',
+            Appointment.not_deleted()
+        )
+        if provider_id is not None:
+            if db.session.get(Provider, provider_id) is None:
+                return jsonify({'error': 'Provider not found'}), 404
+            query = query.filter(Appointment.provider_id == provider_id)
+        appointments = query.order_by(Appointment.appointment_date).all()
         
         result = []
         for apt in appointments:
@@ -242,6 +312,8 @@ def get_upcoming_appointments():
                 'appointment_date': apt.appointment_date.isoformat(),
                 'treatment_type': apt.treatment_type,
                 'status': apt.status,
+                'provider_id': apt.provider_id,
+                'operatory_id': apt.operatory_id,
                 'patient_name': f"{apt.first_name} {apt.last_name}"
             })
         
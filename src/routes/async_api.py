@@ -0,0 +1,208 @@
+import json
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, select
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.routing import Route
+from werkzeug.http import parse_accept_header
+from src.models.appointment import Appointment
+from src.models.patient import Patient
+from src.models.treatment import Treatment
+from src.services.admission import BUSY_ERROR, admission_class, admit, release, retry_after
+from src.services.async_db import read_session, session_user
+from src.services.compression import negotiate, compress_body
+from src.services.metrics import REQUEST_COUNT, REQUEST_LATENCY
+
+# Async handlers for the hottest read endpoints. Each one mirrors the Flask
+# view named in its route, and anything it does not handle itself is passed
+# through to the WSGI app: unauthenticated requests, and the
+# include_archived history view.
+
+
+class Passthrough(Exception):
+    """Raised by a handler to let the mounted Flask app serve the request"""
+
+
+def _error(message, status):
+    return {'error': message}, status
+
+
+def _encode(request, data, min_bytes):
+    # Same bytes as Flask's jsonify, compressed like the Flask responses
+    body = (json.dumps(data, sort_keys=True, separators=(',', ':')) + '\n').encode()
+    headers = {'Vary': 'Accept-Encoding'}
+    encoder = negotiate(parse_accept_header(request.headers.get('accept-encoding')))
+    if encoder is not None and len(body) >= min_bytes:
+        body = compress_body(encoder, body)
+        headers['Content-Encoding'] = encoder.name
+    return body, headers
+
+
+def async_view(endpoint):
+    """Wrap a handler with session auth, admission control, JSON encoding and the Flask request metrics
+
+    Handlers return data or a (data, status) tuple, like Flask views.
+    """
+    blueprint = endpoint.split('.', 1)[0]
+
+    def decorator(handler):
+        async def view(request):
+            start = time.perf_counter()
+            flask_app = request.app.state.flask_app
+            user = await session_user(flask_app, request.cookies)
+            if user is None:
+                # Starlette calls the returned ASGI app as the response
+                return request.app.state.wsgi
+            # Same cost classes and slots as the Flask views; a queued wait blocks a pool thread, not the loop
+            cls = admission_class(endpoint, request.method, request.url.path)
+            if cls is not None and not await run_in_threadpool(admit, cls):
+                body, headers = _encode(request, BUSY_ERROR, request.app.state.compression_min_bytes)
+                headers['Retry-After'] = retry_after(cls)
+                response = Response(body, status_code=503, media_type='application/json', headers=headers)
+            else:
+                try:
+                    result = await handler(request, flask_app)
+                    data, status = result if isinstance(result, tuple) else (result, 200)
+                    body, headers = await run_in_threadpool(
+                        _encode, request, data, request.app.state.compression_min_bytes
+                    )
+                    response = Response(body, status_code=status, media_type='application/json', headers=headers)
+                except Passthrough:
+                    return request.app.state.wsgi
+                finally:
+                    if cls is not None:
+                        release(cls)
+            REQUEST_COUNT.labels(blueprint, endpoint, request.method, str(response.status_code)).inc()
+            REQUEST_LATENCY.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - start)
+            return response
+        return view
+    return decorator
+
+
+@async_view('appointment.get_appointments')
+async def get_appointments(request, flask_app):
+    """Get all appointments with optional filters"""
+    params = request.query_params
+    if params.get('include_archived', 'false').lower() == 'true' and params.get('patient_id'):
+        raise Passthrough()
+
+    query = select(
+        Appointment.id,
+        Appointment.appointment_date,
+        Appointment.treatment_type,
+        Appointment.notes,
+        Appointment.status,
+        Appointment.patient_id,
+        Appointment.provider_id,
+        Appointment.operatory_id,
+        Patient.first_name,
+        Patient.last_name
+    ).join(Patient, Appointment.patient_id == Patient.id).where(Appointment.not_deleted())
+
+    if params.get('date'):
+        try:
+            filter_date = datetime.strptime(params['date'], '%Y-%m-%d').date()
+        except ValueError:
+            return _error('Invalid date format. Use YYYY-MM-DD', 400)
+        query = query.where(Appointment.on_days(filter_date))
+    if params.get('status'):
+        query = query.where(Appointment.status == params['status'])
+    if params.get('patient_id'):
+        try:
+            query = query.where(Appointment.patient_id == int(params['patient_id']))
+        except ValueError:
+            return _error('Invalid patient_id', 400)
+    if params.get('operatory_id'):
+        try:
+            query = query.where(Appointment.operatory_id == int(params['operatory_id']))
+        except ValueError:
+            return _error('Invalid operatory_id', 400)
+
+    try:
+        async with read_session(flask_app, request.cookies) as session:
+            rows = (await session.execute(query.order_by(Appointment.appointment_date.desc()))).all()
+    except Exception as e:
+        print(f"Error getting appointments: {str(e)}")
+        return _error('Failed to retrieve appointments', 500)
+
+    return [{
+        'id': apt.id,
+        'appointment_date': apt.appointment_date.isoformat(),
+        'treatment_type': apt.treatment_type,
+        'notes': apt.notes,
+        'status': apt.status,
+        'patient_id': apt.patient_id,
+        'provider_id': apt.provider_id,
+        'operatory_id': apt.operatory_id,
+        'patient_name': f"{apt.first_name} {apt.last_name}"
+    } for apt in rows]
+
+
+@async_view('patient.search_patients')
+async def search_patients(request, flask_app):
+    """Search patients by name, email, or phone"""
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return []
+
+    async with read_session(flask_app, request.cookies) as session:
+        patients = (await session.execute(select(Patient).where(
+            Patient.not_deleted(),
+            or_(
+                Patient.first_name.ilike(f'%{query}%'),
+                Patient.last_name.ilike(f'%{query}%'),
+                Patient.email.ilike(f'%{query}%'),
+                Patient.phone.ilike(f'%{query}%')
+            )
+        ))).scalars().all()
+    return [patient.to_dict() for patient in patients]
+
+
+@async_view('reports.get_dashboard_stats')
+async def get_dashboard_stats(request, flask_app):
+    """Get dashboard statistics"""
+    today = datetime.now().date()
+    next_week = today + timedelta(days=7)
+
+    async with read_session(flask_app, request.cookies) as session:
+        today_appointments = await session.scalar(
+            select(func.count()).select_from(Appointment).where(Appointment.on_days(today), Appointment.not_deleted())
+        )
+        total_patients = await session.scalar(
+            select(func.count()).select_from(Patient).where(Patient.not_deleted())
+        )
+        upcoming_appointments = await session.scalar(
+            select(func.count()).select_from(Appointment).where(
+                Appointment.on_days(today + timedelta(days=1), next_week), Appointment.not_deleted()
+            )
+        )
+    return {
+        'today_appointments': today_appointments,
+        'total_patients': total_patients,
+        'upcoming_appointments': upcoming_appointments
+    }
+
+
+@async_view('treatment.get_treatments')
+async def get_treatments(request, flask_app):
+    """Get all treatments with optional active filter"""
+    query = select(Treatment)
+    if request.query_params.get('active_only', 'false').lower() == 'true':
+        query = query.where(Treatment.is_active == True)
+
+    try:
+        async with read_session(flask_app, request.cookies) as session:
+            treatments = (await session.execute(query.order_by(Treatment.name))).scalars().all()
+    except Exception as e:
+        print(f"Error getting treatments: {str(e)}")
+        return _error('Failed to retrieve treatments', 500)
+    return [treatment.to_dict() for treatment in treatments]
+
+
+routes = [
+    Route('/api/appointments', get_appointments, methods=['GET']),
+    Route('/api/patients/search', search_patients, methods=['GET']),
+    Route('/api/reports/dashboard', get_dashboard_stats, methods=['GET']),
+    Route('/api/treatments', get_treatments, methods=['GET']),
+]
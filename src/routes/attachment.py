@@ -0,0 +1,145 @@
+import mimetypes
+import os
+from datetime import datetime
+from flask import Blueprint, request, jsonify, redirect, send_file
+from flask_login import login_required, current_user
+from werkzeug.utils import secure_filename
+from src.models.base import db
+from src.models.patient import Patient
+from src.models.attachment import Attachment
+from src.services.blobstore import BlobTooLarge, discard_blob, get_blob_store, lock_blob, max_upload_bytes
+from src.services.idempotency import idempotent
+
+attachments_bp = Blueprint('attachments', __name__)
+
+@attachments_bp.route('/patients/<int:patient_id>/attachments', methods=['POST'])
+@login_required
+@idempotent
+def upload_attachment(patient_id):
+    """Upload a document or X-ray for a patient (multipart `file` field, or raw body with ?filename=)"""
+    Patient.query.filter(Patient.id == patient_id, Patient.not_deleted()).first_or_404()
+    
+    max_bytes = max_upload_bytes()
+    if request.content_length and request.content_length > max_bytes:
+        return jsonify({'error': f'Attachment exceeds {max_bytes} bytes'}), 413
+    
+    if request.mimetype == 'multipart/form-data':
+        # Werkzeug spools multipart parts above 500 KB to a temp file, not memory
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({'error': 'file is required'}), 400
+        stream = upload.stream
+        filename = upload.filename
+        content_type = upload.mimetype
+        description = request.form.get('description')
+    else:
+        # Raw body is read straight from the socket in chunks
+        stream = request.stream
+        filename = request.args.get('filename')
+        content_type = request.mimetype
+        description = request.args.get('description')
+    
+    filename = secure_filename(filename or '')
+    if not filename:
+        return jsonify({'error': 'filename is required'}), 400
+    if not content_type or content_type == 'application/octet-stream':
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    
+    store = get_blob_store()
+    try:
+        sha256, size = store.put(stream, max_bytes=max_bytes)
+    except BlobTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        print(f"Error storing attachment for patient {patient_id}: {str(e)}")
+        return jsonify({'error': 'Failed to store attachment'}), 500
+    
+    attachment = Attachment(
+        patient_id=patient_id,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        sha256=sha256,
+        description=description,
+        uploaded_by=current_user.id
+    )
+    try:
+        # Until commit, a purge cannot delete the blob put() may have reused
+        lock_blob(db.session, sha256)
+        if not store.exists(sha256):
+            db.session.rollback()
+            return jsonify({'error': 'Attachment content was purged while uploading, please retry'}), 503
+        db.session.add(attachment)
+        db.session.commit()
+        return jsonify(attachment.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error saving attachment for patient {patient_id}: {str(e)}")
+        try:
+            discard_blob(sha256)
+        except Exception as cleanup_error:
+            print(f"Error discarding blob {sha256}: {str(cleanup_error)}")
+        return jsonify({'error': 'Failed to save attachment'}), 500
+
+@attachments_bp.route('/patients/<int:patient_id>/attachments', methods=['GET'])
+@login_required
+def get_patient_attachments(patient_id):
+    """Get attachment metadata of a patient, newest first"""
+    Patient.query.filter(Patient.id == patient_id, Patient.not_deleted()).first_or_404()
+    attachments = Attachment.query.filter(
+        Attachment.patient_id == patient_id,
+        Attachment.not_deleted()
+    ).order_by(Attachment.created_at.desc(), Attachment.id.desc()).all()
+    return jsonify([attachment.to_dict() for attachment in attachments])
+
+@attachments_bp.route('/attachments/<int:attachment_id>', methods=['GET'])
+@login_required
+def get_attachment(attachment_id):
+    """Get metadata of an attachment"""
+    attachment = Attachment.query.filter(Attachment.id == attachment_id, Attachment.not_deleted()).first_or_404()
+    return jsonify(attachment.to_dict())
+
+@attachments_bp.route('/attachments/<int:attachment_id>/content', methods=['GET'])
+@login_required
+def download_attachment(attachment_id):
+    """Download an attachment; supports Range requests and conditional GETs"""
+    attachment = Attachment.query.filter(Attachment.id == attachment_id, Attachment.not_deleted()).first_or_404()
+    store = get_blob_store()
+    
+    url = store.download_url(attachment.sha256, attachment.filename, attachment.content_type)
+    if url:
+        return redirect(url)
+    
+    path = store.path(attachment.sha256)
+    if not os.path.exists(path):
+        print(f"Error: blob {attachment.sha256} of attachment {attachment_id} is missing")
+        return jsonify({'error': 'Attachment content is missing'}), 404
+    
+    # send_file streams via the WSGI file wrapper (sendfile where the server
+    # supports it) and answers Range/If-None-Match itself. Content never
+    # changes for a given hash, so the hash is a strong ETag.
+    response = send_file(
+        path,
+        mimetype=attachment.content_type,
+        as_attachment=request.args.get('download') == '1',
+        download_name=attachment.filename,
+        conditional=True,
+        etag=attachment.sha256,
+        max_age=3600
+    )
+    response.cache_control.private = True
+    return response
+
+@attachments_bp.route('/attachments/<int:attachment_id>', methods=['DELETE'])
+@login_required
+def delete_attachment(attachment_id):
+    """Soft-delete an attachment; its content is purged after the retention period"""
+    attachment = Attachment.query.filter(Attachment.id == attachment_id, Attachment.not_deleted()).first_or_404()
+    
+    try:
+        attachment.deleted_at = datetime.utcnow()
+        db.session.commit()
+        return '', 204
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to delete attachment'}), 500
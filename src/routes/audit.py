@@ -0,0 +1,43 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from src.models.audit import AuditEntry
+
+audit_bp = Blueprint('audit', __name__)
+
+AUDITED_ENTITIES = ('patient', 'appointment', 'treatment', 'user', 'attachment')
+MAX_PER_PAGE = 200
+
+@audit_bp.route('/audit/<entity_type>', methods=['GET'])
+@audit_bp.route('/audit/<entity_type>/<int:entity_id>', methods=['GET'])
+@login_required
+def get_audit_log(entity_type, entity_id=None):
+    """Get the change history of an entity type or a single record, newest first"""
+    if entity_type not in AUDITED_ENTITIES:
+        return jsonify({'error': f'entity_type must be one of: {", ".join(AUDITED_ENTITIES)}'}), 400
+    
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 50)), 1), MAX_PER_PAGE)
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+    
+    try:
+        query = AuditEntry.query.filter(AuditEntry.entity_type == entity_type)
+        if entity_id is not None:
+            query = query.filter(AuditEntry.entity_id == entity_id)
+        
+        # Fetch one extra row to know whether another page exists without a COUNT(*)
+        entries = query.order_by(AuditEntry.created_at.desc(), AuditEntry.id.desc()).offset(
+            (page - 1) * per_page
+        ).limit(per_page + 1).all()
+        
+        return jsonify({
+            'items': [entry.to_dict() for entry in entries[:per_page]],
+            'page': page,
+            'per_page': per_page,
+            'has_more': len(entries) > per_page
+        })
+        
+    except Exception as e:
+        print(f"Error getting audit log for {entity_type} {entity_id}: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve audit log'}), 500
@@ -0,0 +1,80 @@
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, url_for
+from flask_login import login_required, current_user
+from src.models.base import db
+from src.models.calendar_feed import CalendarFeed
+from src.models.provider import Provider
+from src.services.calendar import get_feed, hash_token, new_feed_token
+
+calendar_bp = Blueprint('calendar', __name__)
+
+@calendar_bp.route('/calendar/feeds', methods=['GET'])
+@login_required
+def get_calendar_feeds():
+    """Get all active calendar feeds"""
+    feeds = CalendarFeed.query.filter(CalendarFeed.active()).order_by(CalendarFeed.created_at).all()
+    return jsonify([feed.to_dict() for feed in feeds])
+
+@calendar_bp.route('/calendar/feeds', methods=['POST'])
+@login_required
+def create_calendar_feed():
+    """Create a calendar feed of the office, or of one provider; the subscription URL is shown only once
+
+    Not @idempotent: a replayed response would keep the secret URL in idempotency_keys.
+    """
+    data = request.get_json() or {}
+    name = (data.get('name') or '').strip()
+    if not name:
+        return jsonify({'error': 'name is required'}), 400
+    provider_id = data.get('provider_id')
+    if provider_id is not None and db.session.get(Provider, provider_id) is None:
+        return jsonify({'error': 'Provider not found'}), 404
+
+    token, token_hash = new_feed_token()
+    feed = CalendarFeed(name=name, token_hash=token_hash, provider_id=provider_id, created_by=current_user.id)
+    try:
+        db.session.add(feed)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating calendar feed: {str(e)}")
+        return jsonify({'error': 'Failed to create calendar feed'}), 500
+
+    result = feed.to_dict()
+    result['url'] = url_for('calendar.get_calendar_feed', token=token, _external=True)
+    return jsonify(result), 201
+
+@calendar_bp.route('/calendar/feeds/<int:feed_id>', methods=['DELETE'])
+@login_required
+def revoke_calendar_feed(feed_id):
+    """Revoke a calendar feed; its URL stops working immediately"""
+    feed = CalendarFeed.query.filter(CalendarFeed.id == feed_id, CalendarFeed.active()).first_or_404()
+    try:
+        feed.revoked_at = datetime.utcnow()
+        db.session.commit()
+        return jsonify({'message': 'Calendar feed revoked'})
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error revoking calendar feed {feed_id}: {str(e)}")
+        return jsonify({'error': 'Failed to revoke calendar feed'}), 500
+
+@calendar_bp.route('/calendar/<token>.ics', methods=['GET'])
+def get_calendar_feed(token):
+    """iCalendar feed for calendar apps, authenticated by the token in the URL"""
+    feed = CalendarFeed.query.filter(
+        CalendarFeed.token_hash == hash_token(token), CalendarFeed.active()
+    ).first()
+    if feed is None:
+        return jsonify({'error': 'Calendar feed not found'}), 404
+
+    try:
+        entry = get_feed(feed)
+    except Exception as e:
+        print(f"Error rendering calendar feed {feed.id}: {str(e)}")
+        return jsonify({'error': 'Failed to render calendar feed'}), 500
+
+    response = Response(entry.body, mimetype='text/calendar')
+    response.set_etag(entry.etag)
+    # Pollers revalidate every time and usually get a 304 from the cached ETag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
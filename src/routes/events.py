@@ -0,0 +1,33 @@
+import json
+from flask import Blueprint, Response, request, stream_with_context, jsonify
+from flask_login import login_required
+from src.services.events import get_broker
+
+events_bp = Blueprint('events', __name__)
+
+@events_bp.route('/events', methods=['GET'])
+@login_required
+def stream_events():
+    """Stream patient/appointment/treatment changes as Server-Sent Events"""
+    broker = get_broker()
+    if broker is None:
+        return jsonify({'error': 'Change feed is not available'}), 503
+    
+    # Browsers send Last-Event-ID when reconnecting; allow a query param for the first connect
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    def generate():
+        # Ask the browser to reconnect quickly if the stream drops
+        yield 'retry: 3000\n\n'
+        for event_id, payload in broker.listen(last_event_id):
+            if payload is None:
+                yield ': keep-alive\n\n'
+            elif payload == 'reset':
+                yield f'id: {event_id}\nevent: reset\ndata: {{}}\n\n'
+            else:
+                yield f'id: {event_id}\nevent: change\ndata: {json.dumps(payload)}\n\n'
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify
+from flask_login import login_required
+from src.models.job import Job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """Get the status of a background job (and its result once it succeeded)"""
+    try:
+        job = Job.query.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify(job.to_dict())
+        
+    except Exception as e:
+        print(f"Error getting job {job_id}: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve job'}), 500
@@ -0,0 +1,20 @@
+import hmac
+import os
+from flask import Blueprint, Response, request, jsonify
+from src.services.metrics import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose Prometheus metrics to scrapers holding METRICS_TOKEN"""
+    token = os.environ.get('METRICS_TOKEN')
+    if not token:
+        return jsonify({'error': 'Metrics endpoint is disabled'}), 404
+    
+    auth_header = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(auth_header.encode(), f'Bearer {token}'.encode()):
+        return jsonify({'error': 'Invalid metrics token'}), 401
+    
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
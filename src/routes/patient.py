@@ -1,7 +1,13 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required
-from src.models.patient import Patient, db
+from src.models.patient import Patient, db, normalize_email, normalize_phone
+from src.models.appointment import Appointment
+from src.services.archive import restore_archived_appointments
+from src.services.dedup import MATCH_THRESHOLD, MergeError, find_matches, merge_patients
+from src.services.jobs import enqueue
+from src.services.idempotency import idempotent
 from datetime import datetime
+from types import SimpleNamespace
 
 patient_bp = Blueprint('patient', __name__)
 
@@ -9,11 +15,12 @@ patient_bp = Blueprint('patient', __name__)
 @login_required
 def get_patients():
     """Get all patients"""
-    patients = Patient.query.all()
+    patients = Patient.query.filter(Patient.not_deleted()).all()
     return jsonify([patient.to_dict() for patient in patients])
 
 @patient_bp.route('/patients', methods=['POST'])
 @login_required
+@idempotent
 def create_patient():
     """Create a new patient"""
     data = request.json
@@ -56,18 +63,40 @@ def create_patient():
         db.session.rollback()
         return jsonify({'error': f'Failed to create patient: {str(e)}'}), 500
 
+@patient_bp.route('/patients/lookup', methods=['GET'])
+@login_required
+def lookup_patients():
+    """Find patients by exact phone number or email (e.g. caller ID)"""
+    phone = request.args.get('phone', '').strip()
+    email = request.args.get('email', '').strip()
+    if not phone and not email:
+        return jsonify({'error': 'phone or email parameter is required'}), 400
+    
+    query = Patient.query.filter(Patient.not_deleted())
+    if phone:
+        normalized = normalize_phone(phone)
+        if not normalized:
+            return jsonify({'error': 'Invalid phone number'}), 400
+        query = query.filter(Patient.phone_normalized == normalized)
+    if email:
+        query = query.filter(Patient.email_normalized == normalize_email(email))
+    
+    patients = query.order_by(Patient.id).limit(50).all()
+    return jsonify([patient.to_dict() for patient in patients])
+
 @patient_bp.route('/patients/<int:patient_id>', methods=['GET'])
 @login_required
 def get_patient(patient_id):
     """Get a specific patient"""
-    patient = Patient.query.get_or_404(patient_id)
+    patient = Patient.query.filter(Patient.id == patient_id, Patient.not_deleted()).first_or_404()
     return jsonify(patient.to_dict())
 
 @patient_bp.route('/patients/<int:patient_id>', methods=['PUT'])
 @login_required
+@idempotent
 def update_patient(patient_id):
     """Update a patient"""
-    patient = Patient.query.get_or_404(patient_id)
+    patient = Patient.query.filter(Patient.id == patient_id, Patient.not_deleted()).first_or_404()
     data = request.json
     
     # Update fields
@@ -107,17 +136,42 @@ def update_patient(patient_id):
 @patient_bp.route('/patients/<int:patient_id>', methods=['DELETE'])
 @login_required
 def delete_patient(patient_id):
-    """Delete a patient"""
-    patient = Patient.query.get_or_404(patient_id)
+    """Soft-delete a patient together with their appointments"""
+    patient = Patient.query.filter(Patient.id == patient_id, Patient.not_deleted()).first_or_404()
     
     try:
-        db.session.delete(patient)
+        deleted_at = datetime.utcnow()
+        patient.deleted_at = deleted_at
+        # Through the ORM, so the flush hooks audit, publish and re-cube each appointment
+        for appointment in Appointment.query.filter(Appointment.patient_id == patient.id, Appointment.not_deleted()):
+            appointment.deleted_at = deleted_at
         db.session.commit()
         return '', 204
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to delete patient'}), 500
 
+@patient_bp.route('/patients/<int:patient_id>/restore', methods=['POST'])
+@login_required
+@idempotent
+def restore_patient(patient_id):
+    """Undo a soft delete, restoring the appointments removed with the patient"""
+    patient = Patient.query.filter(Patient.id == patient_id, Patient.deleted_at.isnot(None)).first_or_404()
+    
+    try:
+        for appointment in Appointment.query.filter(
+            Appointment.patient_id == patient.id,
+            Appointment.deleted_at == patient.deleted_at
+        ):
+            appointment.deleted_at = None
+        restore_archived_appointments(patient.id, patient.deleted_at)
+        patient.deleted_at = None
+        db.session.commit()
+        return jsonify(patient.to_dict())
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to restore patient'}), 500
+
 @patient_bp.route('/patients/search', methods=['GET'])
 @login_required
 def search_patients():
@@ -127,6 +181,7 @@ def search_patients():
         return jsonify([])
     
     patients = Patient.query.filter(
+        Patient.not_deleted(),
         db.or_(
             Patient.first_name.ilike(f'%{query}%'),
             Patient.last_name.ilike(f'%{query}%'),
@@ -137,3 +192,78 @@ def search_patients():
     
     return jsonify([patient.to_dict() for patient in patients])
 
+@patient_bp.route('/patients/<int:patient_id>/duplicates', methods=['GET'])
+@login_required
+def get_patient_duplicates(patient_id):
+    """Get likely duplicates of a patient, best match first"""
+    patient = Patient.query.filter(Patient.id == patient_id, Patient.not_deleted()).first_or_404()
+    threshold = request.args.get('threshold', MATCH_THRESHOLD, type=float)
+    return jsonify(find_matches(patient, threshold=threshold))
+
+@patient_bp.route('/patients/match', methods=['POST'])
+@login_required
+def match_patient():
+    """Score existing patients against unsaved patient details (e.g. before creating one)"""
+    data = request.json or {}
+    date_of_birth = None
+    if data.get('date_of_birth'):
+        try:
+            date_of_birth = datetime.strptime(data['date_of_birth'], '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    candidate = SimpleNamespace(
+        id=None,
+        first_name=data.get('first_name'),
+        last_name=data.get('last_name'),
+        phone=data.get('phone'),
+        email=data.get('email'),
+        date_of_birth=date_of_birth
+    )
+    try:
+        threshold = float(data.get('threshold', MATCH_THRESHOLD))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid threshold'}), 400
+    return jsonify(find_matches(candidate, threshold=threshold))
+
+@patient_bp.route('/patients/<int:patient_id>/merge', methods=['POST'])
+@login_required
+@idempotent
+def merge_patient(patient_id):
+    """Merge a duplicate patient into this one"""
+    data = request.json or {}
+    if not data.get('duplicate_id'):
+        return jsonify({'error': 'duplicate_id is required'}), 400
+    try:
+        duplicate_id = int(data['duplicate_id'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid duplicate_id'}), 400
+    
+    try:
+        result = merge_patients(patient_id, duplicate_id)
+        db.session.commit()
+        return jsonify({
+            'patient': result['survivor'].to_dict(),
+            'appointments_moved': result['appointments_moved'],
+            'archived_appointments_moved': result['archived_appointments_moved'],
+            'attachments_moved': result['attachments_moved']
+        })
+    except MergeError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error merging patient {duplicate_id} into {patient_id}: {str(e)}")
+        return jsonify({'error': 'Failed to merge patients'}), 500
+
+@patient_bp.route('/patients/duplicates/scan', methods=['POST'])
+@login_required
+@idempotent
+def scan_patient_duplicates():
+    """Start a background scan of the whole patient table for duplicates"""
+    try:
+        threshold = float((request.json or {}).get('threshold', MATCH_THRESHOLD))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid threshold'}), 400
+    job = enqueue('scan_duplicates', {'threshold': threshold}, max_attempts=1)
+    return jsonify({'job_id': job.id, 'status': job.status, 'status_url': f'/api/jobs/{job.id}'}), 202
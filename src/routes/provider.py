@@ -0,0 +1,155 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from src.models.provider import Provider
+from src.models.operatory import Operatory
+from src.models.base import db
+from src.services.idempotency import idempotent
+
+provider_bp = Blueprint('provider', __name__)
+
+@provider_bp.route('/providers', methods=['GET'])
+@login_required
+def get_providers():
+    """Get all providers with optional active filter"""
+    try:
+        query = Provider.query
+        if request.args.get('active_only', 'false').lower() == 'true':
+            query = query.filter(Provider.is_active == True)
+        return jsonify([provider.to_dict() for provider in query.order_by(Provider.name).all()])
+    except Exception as e:
+        print(f"Error getting providers: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve providers'}), 500
+
+@provider_bp.route('/providers/<int:provider_id>', methods=['GET'])
+@login_required
+def get_provider(provider_id):
+    """Get a specific provider"""
+    provider = db.session.get(Provider, provider_id)
+    if not provider:
+        return jsonify({'error': 'Provider not found'}), 404
+    return jsonify(provider.to_dict())
+
+@provider_bp.route('/providers', methods=['POST'])
+@login_required
+@idempotent
+def create_provider():
+    """Create a new provider"""
+    try:
+        data = request.get_json() or {}
+        if not data.get('name'):
+            return jsonify({'error': 'Provider name is required'}), 400
+        role = data.get('role', 'dentist')
+        if role not in Provider.ROLES:
+            return jsonify({'error': f"role must be one of: {', '.join(Provider.ROLES)}"}), 400
+
+        provider = Provider(
+            name=data['name'],
+            role=role,
+            email=data.get('email'),
+            daily_capacity=data.get('daily_capacity'),
+            is_active=data.get('is_active', True)
+        )
+        db.session.add(provider)
+        db.session.commit()
+
+        return jsonify({
+            'id': provider.id,
+            'message': 'Provider created successfully'
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating provider: {str(e)}")
+        return jsonify({'error': 'Failed to create provider'}), 500
+
+@provider_bp.route('/providers/<int:provider_id>', methods=['PUT'])
+@login_required
+@idempotent
+def update_provider(provider_id):
+    """Update an existing provider (set is_active false to retire one)"""
+    try:
+        provider = db.session.get(Provider, provider_id)
+        if not provider:
+            return jsonify({'error': 'Provider not found'}), 404
+
+        data = request.get_json() or {}
+        if 'role' in data and data['role'] not in Provider.ROLES:
+            return jsonify({'error': f"role must be one of: {', '.join(Provider.ROLES)}"}), 400
+
+        for field in ('name', 'role', 'email', 'daily_capacity', 'is_active'):
+            if field in data:
+                setattr(provider, field, data[field])
+        db.session.commit()
+
+        return jsonify({'message': 'Provider updated successfully'})
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating provider {provider_id}: {str(e)}")
+        return jsonify({'error': 'Failed to update provider'}), 500
+
+@provider_bp.route('/operatories', methods=['GET'])
+@login_required
+def get_operatories():
+    """Get all operatories with optional active filter"""
+    try:
+        query = Operatory.query
+        if request.args.get('active_only', 'false').lower() == 'true':
+            query = query.filter(Operatory.is_active == True)
+        return jsonify([operatory.to_dict() for operatory in query.order_by(Operatory.name).all()])
+    except Exception as e:
+        print(f"Error getting operatories: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve operatories'}), 500
+
+@provider_bp.route('/operatories', methods=['POST'])
+@login_required
+@idempotent
+def create_operatory():
+    """Create a new operatory"""
+    try:
+        data = request.get_json() or {}
+        if not data.get('name'):
+            return jsonify({'error': 'Operatory name is required'}), 400
+        if Operatory.query.filter_by(name=data['name']).first():
+            return jsonify({'error': 'Operatory with this name already exists'}), 400
+
+        operatory = Operatory(name=data['name'], is_active=data.get('is_active', True))
+        db.session.add(operatory)
+        db.session.commit()
+
+        return jsonify({
+            'id': operatory.id,
+            'message': 'Operatory created successfully'
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating operatory: {str(e)}")
+        return jsonify({'error': 'Failed to create operatory'}), 500
+
+@provider_bp.route('/operatories/<int:operatory_id>', methods=['PUT'])
+@login_required
+@idempotent
+def update_operatory(operatory_id):
+    """Update an existing operatory (set is_active false to retire one)"""
+    try:
+        operatory = db.session.get(Operatory, operatory_id)
+        if not operatory:
+            return jsonify({'error': 'Operatory not found'}), 404
+
+        data = request.get_json() or {}
+        if 'name' in data and data['name'] != operatory.name:
+            if Operatory.query.filter_by(name=data['name']).first():
+                return jsonify({'error': 'Operatory with this name already exists'}), 400
+
+        for field in ('name', 'is_active'):
+            if field in data:
+                setattr(operatory, field, data[field])
+        db.session.commit()
+
+        return jsonify({'message': 'Operatory updated successfully'})
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating operatory {operatory_id}: {str(e)}")
+        return jsonify({'error': 'Failed to update operatory'}), 500
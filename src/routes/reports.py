@@ -1,34 +1,64 @@
-from flask import Blueprint, request, jsonify
+import json
+import os
+import csv
+import io
+from flask import Blueprint, Response, request, jsonify
 from flask_login import login_required
 from src.models.appointment import Appointment
 from src.models.patient import Patient
 from src.models.treatment import Treatment
+from src.models.provider import Provider
 from src.models.base import db
+from src.services.jobs import enqueue, job_handler
+from src.services.analytics import get_snapshot, snapshot_enabled
+from src.services.no_show import no_show_risk
+from src.services.revenue import GRAINS, month_to_date, revenue_by_period
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract
+from sqlalchemy import case, func, extract
 
 reports_bp = Blueprint('reports', __name__)
 
-@reports_bp.route('/reports/dashboard', methods=['GET'])
+def _iso_date(value):
+    """func.date() yields date objects on PostgreSQL but strings on SQLite"""
+    return value if isinstance(value, str) else value.isoformat()
+
+def _snapshot_facets(start_date, end_date):
+    """Report group-bys from the in-memory snapshot, or None to query the database"""
+    if not snapshot_enabled():
+        return None
+    try:
+        return get_snapshot().facets(start_date, end_date)
+    except Exception as e:
+        print(f"Error reading analytics snapshot, falling back to SQL: {str(e)}")
+        return None
+
+@reports_bp.route('/reports/dashboard', methods=['GET'], defaults={'provider_id': None})
+@reports_bp.route('/providers/<int:provider_id>/dashboard', methods=['GET'])
 @login_required
-def get_dashboard_stats():
-    """Get dashboard statistics"""
+def get_dashboard_stats(provider_id):
+    """Get dashboard statistics, of the whole office or one provider"""
     today = datetime.now().date()
+    appointments = Appointment.query.filter(Appointment.not_deleted())
+    if provider_id is not None:
+        if db.session.get(Provider, provider_id) is None:
+            return jsonify({'error': 'Provider not found'}), 404
+        appointments = appointments.filter(Appointment.provider_id == provider_id)
     
     # Today's appointments
-    today_appointments = Appointment.query.filter(
-        func.date(Appointment.appointment_date) == today
-    ).count()
+    today_appointments = appointments.filter(Appointment.on_days(today)).count()
     
-    # Total patients
-    total_patients = Patient.query.count()
+    # Total patients (a provider's: patients with appointments booked with them)
+    if provider_id is None:
+        total_patients = Patient.query.filter(Patient.not_deleted()).count()
+    else:
+        total_patients = db.session.query(func.count(func.distinct(Appointment.patient_id))).filter(
+            Appointment.provider_id == provider_id,
+            Appointment.not_deleted()
+        ).scalar()
     
     # Upcoming appointments (next 7 days)
     next_week = today + timedelta(days=7)
-    upcoming_appointments = Appointment.query.filter(
-        func.date(Appointment.appointment_date) > today,
-        func.date(Appointment.appointment_date) <= next_week
-    ).count()
+    upcoming_appointments = appointments.filter(Appointment.on_days(today + timedelta(days=1), next_week)).count()
     
     return jsonify({
         'today_appointments': today_appointments,
@@ -52,37 +82,78 @@ def get_unified_reports():
     except ValueError:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
+    # Long ranges run in the background worker; the client polls /api/jobs/<id>
+    if (end_date - start_date).days > int(os.environ.get('REPORTS_ASYNC_MIN_DAYS', 366)):
+        job = enqueue(
+            'unified_report',
+            {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()},
+            dedupe_key=f'unified_report:{start_date.isoformat()}:{end_date.isoformat()}'
+        )
+        if job.status == 'succeeded':
+            # Served from the cached result of an identical recent request
+            return jsonify(json.loads(job.result))
+        return jsonify({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/jobs/{job.id}'
+        }), 202
+    
     try:
+        return jsonify(build_unified_report(start_date, end_date))
+        
+    except Exception as e:
+        # Log the error and return a safe response
+        print(f"Error in unified reports: {str(e)}")
+        return jsonify({
+            'appointments': {
+                'by_status': [],
+                'by_treatment': [],
+                'daily_counts': []
+            },
+            'revenue': {
+                'by_treatment': []
+            }
+        })
+
+def build_unified_report(start_date, end_date):
+    """Appointment and revenue facets behind the unified reports endpoint"""
+    facets = _snapshot_facets(start_date, end_date)
+    if facets is not None:
+        appointments_by_status = facets['by_status']
+        appointments_by_treatment = [(treatment, count) for treatment, count in facets['by_treatment'] if treatment]
+        daily_counts = facets['daily_counts']
+        revenue_by_treatment = [row for row in facets['revenue'] if row[0]]
+    else:
         # APPOINTMENTS DATA
         # Appointments by status
         appointments_by_status = db.session.query(
             Appointment.status,
             func.count(Appointment.id).label('count')
         ).filter(
-            func.date(Appointment.appointment_date) >= start_date,
-            func.date(Appointment.appointment_date) <= end_date
+            Appointment.on_days(start_date, end_date),
+            Appointment.not_deleted()
         ).group_by(Appointment.status).all()
-        
+    
         # Appointments by treatment type
         appointments_by_treatment = db.session.query(
             Appointment.treatment_type,
             func.count(Appointment.id).label('count')
         ).filter(
-            func.date(Appointment.appointment_date) >= start_date,
-            func.date(Appointment.appointment_date) <= end_date,
+            Appointment.on_days(start_date, end_date),
+            Appointment.not_deleted(),
             Appointment.treatment_type.isnot(None),
             Appointment.treatment_type != ''
         ).group_by(Appointment.treatment_type).all()
-        
+    
         # Daily appointment counts
         daily_counts = db.session.query(
             func.date(Appointment.appointment_date).label('date'),
             func.count(Appointment.id).label('count')
         ).filter(
-            func.date(Appointment.appointment_date) >= start_date,
-            func.date(Appointment.appointment_date) <= end_date
+            Appointment.on_days(start_date, end_date),
+            Appointment.not_deleted()
         ).group_by(func.date(Appointment.appointment_date)).order_by('date').all()
-        
+    
         # REVENUE DATA (Simplified)
         # Revenue by treatment type (for all appointments, not just completed)
         revenue_by_treatment = db.session.query(
@@ -92,45 +163,37 @@ def get_unified_reports():
         ).outerjoin(
             Treatment, Appointment.treatment_type == Treatment.name
         ).filter(
-            func.date(Appointment.appointment_date) >= start_date,
-            func.date(Appointment.appointment_date) <= end_date,
+            Appointment.on_days(start_date, end_date),
+            Appointment.not_deleted(),
             Appointment.treatment_type.isnot(None),
             Appointment.treatment_type != ''
         ).group_by(Appointment.treatment_type).all()
-        
-        # Build response in expected format
-        response_data = {
-            'appointments': {
-                'by_status': [{'status': status or 'Unknown', 'count': count} for status, count in appointments_by_status],
-                'by_treatment': [{'treatment_type': treatment or 'No Treatment', 'count': count} for treatment, count in appointments_by_treatment],
-                'daily_counts': [{'date': date.isoformat(), 'count': count} for date, count in daily_counts]
-            },
-            'revenue': {
-                'by_treatment': [
-                    {
-                        'treatment_type': treatment or 'No Treatment',
-                        'appointment_count': count,
-                        'total_revenue': float(revenue) if revenue else 0
-                    } for treatment, count, revenue in revenue_by_treatment
-                ]
-            }
+    
+    # Build response in expected format
+    return {
+        'appointments': {
+            'by_status': [{'status': status or 'Unknown', 'count': count} for status, count in appointments_by_status],
+            'by_treatment': [{'treatment_type': treatment or 'No Treatment', 'count': count} for treatment, count in appointments_by_treatment],
+            'daily_counts': [{'date': _iso_date(date), 'count': count} for date, count in daily_counts]
+        },
+        'revenue': {
+            'by_treatment': [
+                {
+                    'treatment_type': treatment or 'No Treatment',
+                    'appointment_count': count,
+                    'total_revenue': float(revenue) if revenue else 0
+                } for treatment, count, revenue in revenue_by_treatment
+            ]
         }
-        
-        return jsonify(response_data)
-        
-    except Exception as e:
-        # Log the error and return a safe response
-        print(f"Error in unified reports: {str(e)}")
-        return jsonify({
-            'appointments': {
-                'by_status': [],
-                'by_treatment': [],
-                'daily_counts': []
-            },
-            'revenue': {
-                'by_treatment': []
-            }
-        })
+    }
+
+@job_handler('unified_report')
+def unified_report_job(payload):
+    """Build a long-range unified report in the background worker"""
+    return build_unified_report(
+        datetime.strptime(payload['start_date'], '%Y-%m-%d').date(),
+        datetime.strptime(payload['end_date'], '%Y-%m-%d').date()
+    )
 
 @reports_bp.route('/reports/appointments', methods=['GET'])
 @login_required
@@ -148,37 +211,43 @@ def get_appointment_reports():
     except ValueError:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
-    # Appointments by status
-    appointments_by_status = db.session.query(
-        Appointment.status,
-        func.count(Appointment.id).label('count')
-    ).filter(
-        func.date(Appointment.appointment_date) >= start_date,
-        func.date(Appointment.appointment_date) <= end_date
-    ).group_by(Appointment.status).all()
-    
-    # Appointments by treatment type
-    appointments_by_treatment = db.session.query(
-        Appointment.treatment_type,
-        func.count(Appointment.id).label('count')
-    ).filter(
-        func.date(Appointment.appointment_date) >= start_date,
-        func.date(Appointment.appointment_date) <= end_date
-    ).group_by(Appointment.treatment_type).all()
-    
-    # Daily appointment counts
-    daily_counts = db.session.query(
-        func.date(Appointment.appointment_date).label('date'),
-        func.count(Appointment.id).label('count')
-    ).filter(
-        func.date(Appointment.appointment_date) >= start_date,
-        func.date(Appointment.appointment_date) <= end_date
-    ).group_by(func.date(Appointment.appointment_date)).order_by('date').all()
+    facets = _snapshot_facets(start_date, end_date)
+    if facets is not None:
+        appointments_by_status = facets['by_status']
+        appointments_by_treatment = facets['by_treatment']
+        daily_counts = facets['daily_counts']
+    else:
+        # Appointments by status
+        appointments_by_status = db.session.query(
+            Appointment.status,
+            func.count(Appointment.id).label('count')
+        ).filter(
+            Appointment.on_days(start_date, end_date),
+            Appointment.not_deleted()
+        ).group_by(Appointment.status).all()
+    
+        # Appointments by treatment type
+        appointments_by_treatment = db.session.query(
+            Appointment.treatment_type,
+            func.count(Appointment.id).label('count')
+        ).filter(
+            Appointment.on_days(start_date, end_date),
+            Appointment.not_deleted()
+        ).group_by(Appointment.treatment_type).all()
+    
+        # Daily appointment counts
+        daily_counts = db.session.query(
+            func.date(Appointment.appointment_date).label('date'),
+            func.count(Appointment.id).label('count')
+        ).filter(
+            Appointment.on_days(start_date, end_date),
+            Appointment.not_deleted()
+        ).group_by(func.date(Appointment.appointment_date)).order_by('date').all()
     
     return jsonify({
         'by_status': [{'status': status, 'count': count} for status, count in appointments_by_status],
         'by_treatment': [{'treatment_type': treatment, 'count': count} for treatment, count in appointments_by_treatment],
-        'daily_counts': [{'date': date.isoformat(), 'count': count} for date, count in daily_counts]
+        'daily_counts': [{'date': _iso_date(date), 'count': count} for date, count in daily_counts]
     })
 
 @reports_bp.route('/reports/revenue', methods=['GET'])
@@ -197,17 +266,21 @@ def get_revenue_reports():
     except ValueError:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
-    # Revenue by treatment type (simplified - all appointments)
-    revenue_by_treatment = db.session.query(
-        Appointment.treatment_type,
-        func.count(Appointment.id).label('appointment_count'),
-        func.coalesce(func.sum(Treatment.price), 0).label('total_revenue')
-    ).outerjoin(
-        Treatment, Appointment.treatment_type == Treatment.name
-    ).filter(
-        func.date(Appointment.appointment_date) >= start_date,
-        func.date(Appointment.appointment_date) <= end_date
-    ).group_by(Appointment.treatment_type).all()
+    facets = _snapshot_facets(start_date, end_date)
+    if facets is not None:
+        revenue_by_treatment = facets['revenue']
+    else:
+        # Revenue by treatment type (simplified - all appointments)
+        revenue_by_treatment = db.session.query(
+            Appointment.treatment_type,
+            func.count(Appointment.id).label('appointment_count'),
+            func.coalesce(func.sum(Treatment.price), 0).label('total_revenue')
+        ).outerjoin(
+            Treatment, Appointment.treatment_type == Treatment.name
+        ).filter(
+            Appointment.on_days(start_date, end_date),
+            Appointment.not_deleted()
+        ).group_by(Appointment.treatment_type).all()
     
     return jsonify({
         'by_treatment': [
@@ -219,3 +292,136 @@ def get_revenue_reports():
         ]
     })
 
+@reports_bp.route('/reports/utilization', methods=['GET'])
+@login_required
+def get_provider_utilization():
+    """Get per-provider daily appointment counts and utilization for a date range"""
+    start_date_str = request.args.get('start_date')
+    end_date_str = request.args.get('end_date')
+    
+    if not start_date_str or not end_date_str:
+        return jsonify({'error': 'start_date and end_date parameters are required'}), 400
+    
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    providers = Provider.query.order_by(Provider.name)
+    if request.args.get('provider_id'):
+        try:
+            providers = providers.filter(Provider.id == int(request.args['provider_id']))
+        except ValueError:
+            return jsonify({'error': 'Invalid provider_id'}), 400
+    else:
+        providers = providers.filter(Provider.is_active == True)
+    
+    try:
+        result = []
+        for provider in providers.all():
+            # One (provider_id, appointment_date) index range scan per provider
+            daily = db.session.query(
+                func.date(Appointment.appointment_date).label('date'),
+                func.count(Appointment.id).label('booked'),
+                func.sum(case((Appointment.status == 'completed', 1), else_=0)).label('completed'),
+                func.sum(case((Appointment.status == 'no-show', 1), else_=0)).label('no_show')
+            ).filter(
+                Appointment.provider_id == provider.id,
+                Appointment.on_days(start_date, end_date),
+                Appointment.status != 'cancelled',
+                Appointment.not_deleted()
+            ).group_by(func.date(Appointment.appointment_date)).order_by('date').all()
+            
+            result.append({
+                'provider_id': provider.id,
+                'provider_name': provider.name,
+                'role': provider.role,
+                'daily_capacity': provider.daily_capacity,
+                'days': [{
+                    'date': _iso_date(day),
+                    'booked': booked,
+                    'completed': int(completed or 0),
+                    'no_show': int(no_show or 0),
+                    'utilization': round(booked / provider.daily_capacity, 3) if provider.daily_capacity else None
+                } for day, booked, completed, no_show in daily]
+            })
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error computing provider utilization: {str(e)}")
+        return jsonify({'error': 'Failed to compute provider utilization'}), 500
+
+@reports_bp.route('/reports/no-show-risk', methods=['GET'])
+@login_required
+def get_no_show_risk():
+    """Get no-show risk of a day's scheduled appointments (default: today)"""
+    date_str = request.args.get('date')
+    try:
+        day = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else datetime.now().date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    try:
+        return jsonify(no_show_risk(day))
+    except Exception as e:
+        print(f"Error computing no-show risk: {str(e)}")
+        return jsonify({'error': 'Failed to compute no-show risk'}), 500
+
+@reports_bp.route('/reports/snapshot', methods=['GET'])
+@login_required
+def get_snapshot_stats():
+    """Get size and staleness of the in-memory analytics snapshot"""
+    if not snapshot_enabled():
+        return jsonify({'enabled': False})
+    return jsonify(dict(get_snapshot().stats(), enabled=True))
+
+@reports_bp.route('/reports/revenue/periods', methods=['GET'])
+@login_required
+def get_revenue_by_period():
+    """Get completed-appointment revenue per day/week/month (JSON or CSV)"""
+    grain = request.args.get('grain', 'month')
+    if grain not in GRAINS:
+        return jsonify({'error': f"grain must be one of: {', '.join(GRAINS)}"}), 400
+    
+    start_date_str = request.args.get('start_date')
+    end_date_str = request.args.get('end_date')
+    if not start_date_str or not end_date_str:
+        return jsonify({'error': 'start_date and end_date parameters are required'}), 400
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    compare = request.args.get('compare') == 'yoy'
+    periods = revenue_by_period(grain, start_date, end_date, request.args.get('treatment_type'), compare)
+    
+    if request.args.get('format') == 'csv':
+        output = io.StringIO()
+        writer = csv.writer(output)
+        header = ['period_start', 'treatment_type', 'appointment_count', 'revenue']
+        writer.writerow(header + (['previous_year_revenue', 'yoy_change'] if compare else []))
+        for period in periods:
+            for row in period['by_treatment']:
+                writer.writerow([period['period_start'], row['treatment_type'], row['appointment_count'], row['revenue']]
+                                + (['', ''] if compare else []))
+            totals = [period['period_start'], 'TOTAL', period['appointment_count'], period['revenue']]
+            if compare:
+                totals += [period['previous_year_revenue'], '' if period['yoy_change'] is None else period['yoy_change']]
+            writer.writerow(totals)
+        return Response(output.getvalue(), mimetype='text/csv', headers={
+            'Content-Disposition': f'attachment; filename=revenue-{grain}-{start_date}-{end_date}.csv'
+        })
+    
+    return jsonify({'grain': grain, 'periods': periods})
+
+@reports_bp.route('/reports/revenue/mtd', methods=['GET'])
+@login_required
+def get_revenue_month_to_date():
+    """Get month-to-date revenue compared with last month and last year"""
+    date_str = request.args.get('date')
+    try:
+        as_of = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else datetime.now().date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    return jsonify(month_to_date(as_of))
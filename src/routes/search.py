@@ -0,0 +1,29 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from src.services.search import search
+
+search_bp = Blueprint('search', __name__)
+
+SEARCH_TYPES = {'patients': ('patients',), 'appointments': ('appointments',), 'all': ('patients', 'appointments')}
+
+@search_bp.route('/search', methods=['GET'])
+@login_required
+def full_text_search():
+    """Ranked full-text search over patient records and appointment notes"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q parameter is required'}), 400
+    search_type = request.args.get('type', 'all')
+    if search_type not in SEARCH_TYPES:
+        return jsonify({'error': f"type must be one of: {', '.join(SEARCH_TYPES)}"}), 400
+    
+    try:
+        return jsonify(search(
+            query,
+            types=SEARCH_TYPES[search_type],
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 20, type=int)
+        ))
+    except Exception as e:
+        print(f"Error searching for {query!r}: {str(e)}")
+        return jsonify({'error': 'Search failed'}), 500
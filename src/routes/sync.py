@@ -0,0 +1,24 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from src.services.sync import changes_since, InvalidSyncToken
+
+sync_bp = Blueprint('sync', __name__)
+
+MAX_LIMIT = 5000
+
+@sync_bp.route('/sync', methods=['GET'])
+@login_required
+def sync_changes():
+    """Get patients, appointments and treatments changed since a sync token"""
+    try:
+        limit = min(max(int(request.args.get('limit', 1000)), 1), MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    try:
+        return jsonify(changes_since(request.args.get('since'), limit=limit))
+    except InvalidSyncToken as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error building sync response: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve changes'}), 500
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required
 from src.models.treatment import Treatment
 from src.models.base import db
+from src.services.idempotency import idempotent
 from datetime import datetime
 
 treatment_bp = Blueprint('treatment', __name__)
@@ -64,6 +65,7 @@ def get_treatment(treatment_id):
 
 @treatment_bp.route('/treatments', methods=['POST'])
 @login_required
+@idempotent
 def create_treatment():
     """Create a new treatment (DURATION REMOVED)"""
     try:
@@ -102,6 +104,7 @@ def create_treatment():
 
 @treatment_bp.route('/treatments/<int:treatment_id>', methods=['PUT'])
 @login_required
+@idempotent
 def update_treatment(treatment_id):
     """Update an existing treatment (DURATION REMOVED)"""
     try:
@@ -149,7 +152,10 @@ def delete_treatment(treatment_id):
         
         # Check if treatment is used in any appointments
         from src.models.appointment import Appointment
-        appointments_count = Appointment.query.filter_by(treatment_type=treatment.name).count()
+        appointments_count = Appointment.query.filter(
+            Appointment.treatment_type == treatment.name,
+            Appointment.not_deleted()
+        ).count()
         
         if appointments_count > 0:
             return jsonify({
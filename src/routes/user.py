@@ -1,7 +1,9 @@
-from flask import Blueprint, jsonify, request, render_template_string
+from flask import Blueprint, jsonify, request, render_template_string, session
 from flask_login import login_user, logout_user, login_required, current_user
 from src.models.user import User
 from src.models.base import db
+from src.services.sessions import refresh_login, revoke_user_sessions, user_snapshot, SNAPSHOT_KEY
+from src.services.idempotency import idempotent
 
 user_bp = Blueprint('user', __name__)
 
@@ -158,7 +160,10 @@ def login():
     
     if user and user.check_password(data['password']) and user.is_active:
         remember = data.get('remember', False)
+        # New session id on login so a planted session cookie cannot be hijacked
+        session.regenerate()
         login_user(user, remember=remember)
+        session[SNAPSHOT_KEY] = user_snapshot(user)
         return jsonify({
             'message': 'Login successful',
             'user': user.to_dict()
@@ -171,6 +176,7 @@ def login():
 def logout():
     """Handle logout requests."""
     logout_user()
+    session.pop(SNAPSHOT_KEY, None)
     return jsonify({'message': 'Logout successful'}), 200
 
 @user_bp.route('/current-user', methods=['GET'])
@@ -217,6 +223,7 @@ def get_users():
 
 @user_bp.route('/users', methods=['POST'])
 @login_required
+@idempotent
 def create_user():
     """Create a new user"""
     data = request.get_json()
@@ -261,6 +268,7 @@ def get_user(user_id):
 
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
 @login_required
+@idempotent
 def update_user(user_id):
     """Update a user"""
     user = User.query.get_or_404(user_id)
@@ -287,6 +295,13 @@ def update_user(user_id):
             user.set_password(data['password'])
         
         db.session.commit()
+        
+        # Drop cached snapshots everywhere; keep (and refresh) our own session when editing ourselves
+        is_self = current_user.id == user.id
+        revoke_user_sessions(user.id, keep_current=is_self)
+        if is_self:
+            refresh_login(user)
+        
         return jsonify({
             'message': 'User updated successfully',
             'user': user.to_dict()
@@ -310,6 +325,7 @@ def delete_user(user_id):
     try:
         db.session.delete(user)
         db.session.commit()
+        revoke_user_sessions(user_id)
         return jsonify({'message': 'User deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -324,15 +340,20 @@ def change_password():
     if not data or not all(k in data for k in ['current_password', 'new_password']):
         return jsonify({'error': 'Current password and new password are required'}), 400
     
-    if not current_user.check_password(data['current_password']):
+    # current_user is a session snapshot; load the row so the change is persisted
+    user = User.query.get_or_404(current_user.id)
+    
+    if not user.check_password(data['current_password']):
         return jsonify({'error': 'Current password is incorrect'}), 400
     
     if len(data['new_password']) < 6:
         return jsonify({'error': 'New password must be at least 6 characters long'}), 400
     
     try:
-        current_user.set_password(data['new_password'])
+        user.set_password(data['new_password'])
         db.session.commit()
+        revoke_user_sessions(user.id, keep_current=True)
+        refresh_login(user)
         
         return jsonify({'message': 'Password changed successfully'}), 200
     except Exception as e:
@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+from datetime import datetime
+from flask import g, jsonify, request
+from src.services.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED, ADMISSION_WAIT
+
+# Priority: front-desk writes (booking) are never queued or shed; lookups
+# and lists come next; reports and exports get the smallest share. Limits
+# are per process and, with the default 8 gunicorn threads, leave threads
+# free for writes even when search and reports are saturated and queueing.
+EXEMPT_BLUEPRINTS = {'events', 'metrics', 'user', 'jobs'}
+ENDPOINT_CLASSES = {
+    'reports.get_dashboard_stats': 'search',
+    'patient.match_patient': 'search',
+    'patient.scan_patient_duplicates': 'reports',
+}
+RETRY_AFTER = {'search': 1, 'reports': 5}
+BUSY_ERROR = {'error': 'Server is busy, please retry shortly'}
+
+_classes = {}
+
+
+class CostClass:
+    """Bounded concurrency with a short, bounded wait queue"""
+
+    def __init__(self, name, limit, max_queue, queue_seconds):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_seconds = queue_seconds
+        self.semaphore = threading.BoundedSemaphore(limit) if limit else None
+        self.lock = threading.Lock()
+        self.waiting = 0
+
+    def acquire(self):
+        """Take a slot, returning None on success or the reason the request is shed"""
+        if self.semaphore is None or self.semaphore.acquire(blocking=False):
+            return None
+        with self.lock:
+            if self.waiting >= self.max_queue:
+                return 'queue_full'
+            self.waiting += 1
+        ADMISSION_QUEUE_DEPTH.labels(self.name).inc()
+        start = time.perf_counter()
+        try:
+            acquired = self.semaphore.acquire(timeout=self.queue_seconds)
+        finally:
+            with self.lock:
+                self.waiting -= 1
+            ADMISSION_QUEUE_DEPTH.labels(self.name).dec()
+            ADMISSION_WAIT.labels(self.name).observe(time.perf_counter() - start)
+        return None if acquired else 'timeout'
+
+    def release(self):
+        if self.semaphore is not None:
+            self.semaphore.release()
+
+
+def _classify(endpoint, blueprint, method, path):
+    if endpoint is None or blueprint in EXEMPT_BLUEPRINTS or method == 'OPTIONS':
+        return None
+    if not path.startswith('/api/'):
+        return None  # pages and static assets
+    if endpoint in ENDPOINT_CLASSES:
+        return ENDPOINT_CLASSES[endpoint]
+    if method not in ('GET', 'HEAD'):
+        return 'critical'
+    if blueprint == 'reports':
+        return 'reports'
+    return 'search'
+
+
+def cost_class(req):
+    """Cost class of a request, or None when it is not admission-controlled"""
+    return _classify(req.endpoint, req.blueprint, req.method, req.path)
+
+
+def _max_report_days():
+    return int(os.environ.get('REPORTS_MAX_DAYS', 3653))
+
+
+def _check_date_range():
+    """Reject report ranges beyond REPORTS_MAX_DAYS before they take a slot"""
+    start, end = request.args.get('start_date'), request.args.get('end_date')
+    if not start or not end:
+        return None
+    try:
+        days = (datetime.strptime(end, '%Y-%m-%d') - datetime.strptime(start, '%Y-%m-%d')).days
+    except ValueError:
+        return None  # the view reports the format error
+    if days > _max_report_days():
+        ADMISSION_SHED.labels('reports', 'range').inc()
+        return jsonify({'error': f'Date range too long: at most {_max_report_days()} days'}), 400
+    return None
+
+
+def _admit():
+    name = cost_class(request)
+    if name is None:
+        return None
+    if name == 'reports':
+        rejected = _check_date_range()
+        if rejected is not None:
+            return rejected
+
+    cls = _classes[name]
+    if not admit(cls):
+        response = jsonify(BUSY_ERROR)
+        response.headers['Retry-After'] = retry_after(cls)
+        return response, 503
+    g.admission_class = cls
+    return None
+
+
+def _release(exc=None):
+    cls = g.pop('admission_class', None)
+    if cls is not None:
+        release(cls)
+
+
+def admission_class(endpoint, method, path):
+    """CostClass for a request served outside Flask (the ASGI handlers), or None
+
+    The ASGI handlers share the Flask app's slots, so limits hold across both.
+    """
+    name = _classify(endpoint, endpoint.split('.', 1)[0], method, path)
+    return _classes.get(name) if name is not None else None
+
+
+def admit(cls):
+    """Take a slot of cls, waiting in its queue; False when the request is shed"""
+    reason = cls.acquire()
+    if reason is not None:
+        ADMISSION_SHED.labels(cls.name, reason).inc()
+        return False
+    ADMISSION_IN_FLIGHT.labels(cls.name).inc()
+    return True
+
+
+def release(cls):
+    cls.release()
+    ADMISSION_IN_FLIGHT.labels(cls.name).dec()
+
+
+def retry_after(cls):
+    return str(RETRY_AFTER.get(cls.name, 1))
+
+
+def init_admission(app):
+    """Install per-class concurrency limits (ADMISSION=off disables)"""
+    if os.environ.get('ADMISSION', 'on') == 'off':
+        return
+    max_queue = int(os.environ.get('ADMISSION_QUEUE_DEPTH', 1))
+    queue_seconds = float(os.environ.get('ADMISSION_QUEUE_SECONDS', 2))
+    _classes.update({
+        'critical': CostClass('critical', 0, 0, 0),
+        'search': CostClass('search', int(os.environ.get('ADMISSION_SEARCH_LIMIT', 3)), max_queue, queue_seconds),
+        'reports': CostClass('reports', int(os.environ.get('ADMISSION_REPORTS_LIMIT', 1)), max_queue, queue_seconds),
+    })
+    app.before_request(_admit)
+    app.teardown_request(_release)
@@ -0,0 +1,273 @@
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from sqlalchemy import and_, or_, select
+from src.models.appointment import Appointment
+from src.models.archive import ArchivedAppointment
+from src.models.base import db
+from src.models.tombstone import DeletedRecord
+from src.models.treatment import Treatment
+from src.services.sync import EPOCH, _safety_lag
+
+COLUMN_TYPES = {
+    'id': np.int64,
+    'patient_id': np.int64,
+    'start': 'datetime64[m]',
+    'status': np.int16,  # code into snapshot.statuses
+    'treatment': np.int16,  # code into snapshot.treatments
+    'live': np.bool_,  # False once soft- or hard-deleted
+    'archived': np.bool_,  # row lives in appointments_archive
+}
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+class Dictionary:
+    """Dictionary encoding of a low-cardinality string column"""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def encode(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def code(self, value, default=None):
+        """Code of an already seen value, without adding it"""
+        return self._codes.get(value, default)
+
+
+class AppointmentSnapshot:
+    """Columnar in-memory copy of appointment history (hot table plus archive)
+
+    Serves the report facets and the no-show model without touching the
+    OLTP tables. Rows are kept sorted by id in NumPy arrays. refresh() only reads rows
+    whose updated_at/archived_at moved past the last seen (timestamp, id)
+    keyset cursor, plus new hard-delete tombstones, and patches them in.
+    Listeners registered with add_listener(fn) receive fn(old, new) column
+    dicts for every patched batch, so rollups can be maintained by deltas.
+    """
+
+    def __init__(self, refresh_interval=None, chunk_size=50000):
+        if refresh_interval is None:
+            refresh_interval = float(os.environ.get('ANALYTICS_REFRESH_SECONDS', 30))
+        self.refresh_interval = refresh_interval
+        self.chunk_size = chunk_size
+        self.columns = {name: np.empty(0, dtype) for name, dtype in COLUMN_TYPES.items()}
+        self.statuses = Dictionary()
+        self.treatments = Dictionary()
+        self.prices = np.zeros(0)  # current price per treatment code
+        self.lock = threading.RLock()
+        self.refreshed_at = None
+        self._refreshed_monotonic = None
+        self._listeners = []
+        self._cursors = {'appointments': (EPOCH, 0), 'archive': (EPOCH, 0), 'deleted': (EPOCH, 0)}
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def add_listener(self, listener):
+        """Register listener(old, new) and seed it with the rows loaded so far"""
+        with self.lock:
+            self._listeners.append(listener)
+            if len(self):
+                listener(None, self.columns)
+
+    def refresh(self, force=False):
+        """Pull changes since the last refresh (at most once per refresh_interval)"""
+        with self.lock:
+            if (not force and self._refreshed_monotonic is not None
+                    and time.monotonic() - self._refreshed_monotonic < self.refresh_interval):
+                return False
+            horizon = datetime.utcnow() - _safety_lag()
+            hot = Appointment.__table__
+            archive = ArchivedAppointment.__table__
+            for source, table, stamp in (('archive', archive, archive.c.archived_at),
+                                         ('appointments', hot, hot.c.updated_at)):
+                self._pull(source, stamp, horizon, select(
+                    table.c.id, table.c.patient_id, table.c.appointment_date,
+                    table.c.status, table.c.treatment_type, table.c.deleted_at, stamp
+                ))
+            tombstones = DeletedRecord.__table__
+            self._pull('deleted', tombstones.c.deleted_at, horizon, select(
+                tombstones.c.entity_id.label('id'), tombstones.c.deleted_at
+            ).where(tombstones.c.entity_type == 'appointments'))
+            self._load_prices()
+            self.refreshed_at = datetime.utcnow()
+            self._refreshed_monotonic = time.monotonic()
+            return True
+
+    def _pull(self, source, stamp, horizon, query):
+        id_column = query.selected_columns.id
+        while True:
+            timestamp, last_id = self._cursors[source]
+            with db.engine.connect() as conn:
+                rows = conn.execute(query.where(
+                    or_(stamp > timestamp, and_(stamp == timestamp, id_column > last_id)),
+                    stamp <= horizon
+                ).order_by(stamp, id_column).limit(self.chunk_size)).all()
+            if not rows:
+                return
+            if source == 'deleted':
+                self._delete(np.unique(np.fromiter((row.id for row in rows), np.int64, len(rows))))
+            else:
+                self._upsert(rows, archived=source == 'archive')
+            self._cursors[source] = (rows[-1][-1], rows[-1].id)
+            if len(rows) < self.chunk_size:
+                return
+
+    def _load_prices(self):
+        # Revenue joins appointments to treatments by name at query time, so a
+        # repriced treatment applies to all history; the table is tiny
+        with db.engine.connect() as conn:
+            prices = conn.execute(select(Treatment.name, Treatment.price)).all()
+        for name, _ in prices:
+            self.treatments.encode(name)
+        self.prices = np.zeros(len(self.treatments.values))
+        for name, price in prices:
+            self.prices[self.treatments.code(name)] = float(price or 0)
+
+    def _upsert(self, rows, archived=False):
+        count = len(rows)
+        new = {
+            'id': np.fromiter((row.id for row in rows), np.int64, count),
+            'patient_id': np.fromiter((row.patient_id for row in rows), np.int64, count),
+            'start': np.array([row.appointment_date for row in rows], dtype='datetime64[m]'),
+            'status': np.fromiter((self.statuses.encode(row.status) for row in rows), np.int16, count),
+            'treatment': np.fromiter(
+                (self.treatments.encode(row.treatment_type) for row in rows), np.int16, count
+            ),
+            'live': np.fromiter((row.deleted_at is None for row in rows), np.bool_, count),
+            'archived': np.full(count, archived),
+        }
+        positions, found = self._locate(new['id'])
+        old = {name: column[positions[found]] for name, column in self.columns.items()}
+        for listener in self._listeners:
+            listener(old, new)
+
+        for name, column in self.columns.items():
+            column[positions[found]] = new[name][found]
+        if not found.all():
+            merged = {name: np.concatenate([column, new[name][~found]]) for name, column in self.columns.items()}
+            ids = merged['id']
+            if len(ids) > 1 and not (ids[1:] > ids[:-1]).all():
+                order = np.argsort(ids, kind='stable')
+                merged = {name: column[order] for name, column in merged.items()}
+            self.columns = merged
+
+    def _delete(self, ids):
+        positions, found = self._locate(ids)
+        positions = positions[found]
+        old = {name: column[positions] for name, column in self.columns.items()}
+        new = dict(old, live=np.zeros(len(positions), np.bool_))
+        for listener in self._listeners:
+            listener(old, new)
+        self.columns['live'][positions] = False
+
+    def _locate(self, ids):
+        """Positions of ids in the sorted id column and a mask of which exist"""
+        current = self.columns['id']
+        positions = np.searchsorted(current, ids)
+        if not len(current):
+            return positions, np.zeros(len(ids), np.bool_)
+        found = current[np.minimum(positions, len(current) - 1)] == ids
+        return positions, found
+
+    def nbytes(self):
+        return int(sum(column.nbytes for column in self.columns.values()) + self.prices.nbytes)
+
+    def facets(self, start_date, end_date):
+        """Report group-bys over live, non-archived appointments dated start_date..end_date
+
+        Returns the same row shapes as the SQL queries in src/routes/reports.py:
+        by_status [(status, count)], by_treatment [(treatment_type, count)],
+        daily_counts [(iso date, count)] and revenue [(treatment_type, count, revenue)].
+        """
+        with self.lock:
+            days = self.columns['start'].astype('datetime64[D]')
+            mask = (
+                self.columns['live'] & ~self.columns['archived']
+                & (days >= np.datetime64(start_date, 'D')) & (days <= np.datetime64(end_date, 'D'))
+            )
+            statuses = np.bincount(self.columns['status'][mask], minlength=len(self.statuses.values))
+            treatment_codes = self.columns['treatment'][mask]
+            treatments = np.bincount(treatment_codes, minlength=len(self.treatments.values))
+            prices = np.pad(self.prices, (0, len(self.treatments.values) - len(self.prices)))
+            revenue = np.bincount(treatment_codes, weights=prices[treatment_codes],
+                                  minlength=len(self.treatments.values))
+            dates, date_counts = np.unique(days[mask], return_counts=True)
+            return {
+                'by_status': [(self.statuses.values[code], int(count))
+                              for code, count in enumerate(statuses) if count],
+                'by_treatment': [(self.treatments.values[code], int(count))
+                                 for code, count in enumerate(treatments) if count],
+                'daily_counts': [(str(day), int(count)) for day, count in zip(dates, date_counts)],
+                'revenue': [(self.treatments.values[code], int(count), float(revenue[code]))
+                            for code, count in enumerate(treatments) if count],
+            }
+
+    def stats(self):
+        """Size and freshness of the snapshot"""
+        with self.lock:
+            age = (datetime.utcnow() - self.refreshed_at).total_seconds() if self.refreshed_at else None
+            return {
+                'rows': len(self),
+                'live_rows': int(self.columns['live'].sum()),
+                'archived_rows': int(self.columns['archived'].sum()),
+                'memory_bytes': self.nbytes(),
+                'refreshed_at': self.refreshed_at.isoformat() if self.refreshed_at else None,
+                'staleness_seconds': round(age, 3) if age is not None else None,
+                'refresh_interval_seconds': self.refresh_interval,
+            }
+
+
+def weekday_hour(start):
+    """Monday=0 weekday and hour arrays of a datetime64[m] array"""
+    days = start.astype('datetime64[D]')
+    # 1970-01-01 was a Thursday
+    weekday = (days.astype(np.int64) + 3) % 7
+    hour = (start - days).astype('timedelta64[h]').astype(np.int64)
+    return weekday, hour
+
+
+def snapshot_enabled():
+    return os.environ.get('ANALYTICS_SNAPSHOT', 'on') != 'off'
+
+
+def get_snapshot():
+    """Process-wide appointment snapshot, refreshed if older than its interval"""
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = AppointmentSnapshot()
+    _snapshot.refresh()
+    return _snapshot
+
+
+def init_analytics(app):
+    """Load the appointment snapshot in the background and keep it fresh
+
+    Call once the tables exist: the first load runs right away.
+    """
+    if not snapshot_enabled():
+        return
+    threading.Thread(target=_refresh_forever, args=(app,), name='analytics-refresher', daemon=True).start()
+
+
+def _refresh_forever(app):
+    while True:
+        try:
+            with app.app_context():
+                snapshot = get_snapshot()
+            interval = snapshot.refresh_interval
+        except Exception as e:
+            print(f"Error refreshing analytics snapshot: {str(e)}")
+            interval = 30
+        time.sleep(max(interval, 1))
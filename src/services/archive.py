@@ -0,0 +1,113 @@
+import os
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import delete, insert, literal, select, update
+from src.models.appointment import Appointment
+from src.models.archive import ArchivedAppointment
+from src.models.base import db
+from src.services.audit import record_changes
+from src.services.jobs import job_handler
+from src.services.revenue import record_bulk_change
+
+ARCHIVED_STATUSES = ('completed', 'cancelled')
+DEFAULT_HORIZON_DAYS = 730
+
+
+def archive_appointments(horizon_days=None, batch_size=1000):
+    """Move finished appointments older than the horizon to the archive
+
+    Works in small batches, each in its own transaction, so front-desk writes
+    are never blocked for long. Returns the number of rows moved.
+    """
+    if horizon_days is None:
+        horizon_days = int(os.environ.get('ARCHIVE_HORIZON_DAYS', DEFAULT_HORIZON_DAYS))
+    cutoff = datetime.utcnow() - timedelta(days=horizon_days)
+
+    source = Appointment.__table__
+    target = ArchivedAppointment.__table__
+    columns = [source.c[name] for name in ArchivedAppointment.COPIED_COLUMNS]
+
+    moved = 0
+    while True:
+        with db.engine.begin() as conn:
+            ids = conn.execute(
+                select(source.c.id).where(
+                    source.c.appointment_date < cutoff,
+                    source.c.status.in_(ARCHIVED_STATUSES)
+                ).order_by(source.c.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+
+            # The date bound lets a partitioned table skip partitions newer than the cutoff
+            in_batch = (source.c.id.in_(ids), source.c.appointment_date < cutoff)
+            archived_at = datetime.utcnow()
+            conn.execute(insert(target).from_select(
+                list(ArchivedAppointment.COPIED_COLUMNS) + ['archived_at'],
+                select(*columns, literal(archived_at)).where(*in_batch)
+            ))
+            conn.execute(delete(source).where(*in_batch))
+        record_changes('appointment', 'archive', {
+            appointment_id: {'archived_at': [None, archived_at]} for appointment_id in ids
+        })
+        moved += len(ids)
+    return moved
+
+
+@job_handler('archive_appointments')
+def archive_appointments_job(payload):
+    """Run the archival from the background worker"""
+    return {'archived': archive_appointments(horizon_days=payload.get('horizon_days'))}
+
+
+def restore_archived_appointments(patient_id, deleted_at):
+    """Undo the soft delete of a patient's archived appointments deleted at deleted_at
+
+    Archived rows have no ORM hooks, so the audit entries and revenue cube
+    deltas are written here. archived_at is bumped as well: it is the change
+    stamp the analytics snapshot follows. Runs in the caller's session; the
+    caller commits. Returns the number of appointments restored.
+    """
+    archive = ArchivedAppointment.__table__
+    matching = (archive.c.patient_id == patient_id, archive.c.deleted_at == deleted_at)
+    rows = db.session.execute(
+        select(archive.c.id, archive.c.status, archive.c.appointment_date, archive.c.treatment_type).where(*matching)
+    ).all()
+    if not rows:
+        return 0
+    now = datetime.utcnow()
+    db.session.execute(update(archive).where(*matching).values(deleted_at=None, updated_at=now, archived_at=now))
+    record_changes('appointment', 'update', {row.id: {'deleted_at': [deleted_at, None]} for row in rows},
+                   session=db.session)
+    record_bulk_change(db.session.connection(), rows, 1)
+    return len(rows)
+
+
+def archived_appointments_for_patient(patient_id):
+    """Archived history rows of one patient, in the get_appointments result shape"""
+    rows = ArchivedAppointment.query.filter(
+        ArchivedAppointment.patient_id == patient_id,
+        ArchivedAppointment.deleted_at.is_(None)
+    ).order_by(ArchivedAppointment.appointment_date.desc()).all()
+    return [{
+        'id': row.id,
+        'appointment_date': row.appointment_date.isoformat(),
+        'treatment_type': row.treatment_type,
+        'notes': row.notes,
+        'status': row.status,
+        'patient_id': row.patient_id,
+        'archived': True
+    } for row in rows]
+
+
+def init_archive(app):
+    """Register the `flask archive-appointments` command"""
+
+    @app.cli.command('archive-appointments')
+    @click.option('--horizon-days', type=int, default=None,
+                  help='Archive finished appointments older than this (default ARCHIVE_HORIZON_DAYS or 730)')
+    @click.option('--batch-size', type=int, default=1000)
+    def archive_appointments_command(horizon_days, batch_size):
+        """Move old completed/cancelled appointments to appointments_archive"""
+        moved = archive_appointments(horizon_days=horizon_days, batch_size=batch_size)
+        print(f"📦 Archived {moved} appointments")
@@ -0,0 +1,110 @@
+import os
+from datetime import datetime
+from itsdangerous import BadSignature, Signer
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from starlette.concurrency import run_in_threadpool
+from src.models.session import UserSession
+from src.models.user import User
+from src.services.replicas import read_bind_for
+from src.services.sessions import SNAPSHOT_KEY, ServerSideSessionInterface, SqlSessionStore, session_user_id
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+_engines = {}
+
+
+def async_database_url(url):
+    """The async-driver equivalent of a sync SQLAlchemy URL (aiosqlite / asyncpg)"""
+    url = make_url(url.replace('postgres://', 'postgresql://', 1))
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {backend}')
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if 'sslmode' in url.query:
+        # asyncpg spells libpq's sslmode as ssl
+        url = url.update_query_dict({'ssl': url.query['sslmode']}).difference_update_query(['sslmode'])
+    return url
+
+
+def get_async_engine(flask_app, bind=None):
+    """Async engine for the primary (bind None) or a replica bind, created once per process"""
+    engine = _engines.get(bind)
+    if engine is None:
+        if bind is None:
+            url = os.environ.get('ASYNC_DATABASE_URL') or flask_app.config['SQLALCHEMY_DATABASE_URI']
+        else:
+            url = flask_app.config['SQLALCHEMY_BINDS'][bind]
+        url = async_database_url(url)
+        options = {}
+        if url.get_backend_name() != 'sqlite':
+            options = {
+                'pool_size': int(os.environ.get('ASYNC_DB_POOL_SIZE', 10)),
+                'max_overflow': int(os.environ.get('ASYNC_DB_MAX_OVERFLOW', 20)),
+                'pool_pre_ping': True
+            }
+        engine = _engines[bind] = create_async_engine(url, **options)
+    return engine
+
+
+def read_session(flask_app, cookies):
+    """AsyncSession for a read-only request, on a replica when one is healthy"""
+    bind = read_bind_for(cookies) if flask_app.config.get('SQLALCHEMY_BINDS') else None
+    return AsyncSession(get_async_engine(flask_app, bind), expire_on_commit=False)
+
+
+async def dispose_async_engines():
+    for engine in list(_engines.values()):
+        await engine.dispose()
+    _engines.clear()
+
+
+async def session_user(flask_app, cookies):
+    """Snapshot dict of the user logged in through the Flask session cookie, or None
+
+    Reads the same server-side session the WSGI app writes. Anything it
+    cannot settle by itself (remember-me cookies, inactive users) is left to
+    Flask-Login by returning None.
+    """
+    cookie = cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not cookie:
+        return None
+    try:
+        sid = Signer(flask_app.secret_key, salt=ServerSideSessionInterface.salt).unsign(cookie).decode()
+    except BadSignature:
+        return None
+
+    store = flask_app.extensions['session_store']
+    if isinstance(store, SqlSessionStore):
+        async with AsyncSession(get_async_engine(flask_app)) as session:
+            row = (await session.execute(
+                select(UserSession.data, UserSession.expires_at).where(UserSession.id == sid)
+            )).first()
+        stored = None
+        if row is not None and row.expires_at > datetime.utcnow():
+            stored = (flask_app.json.loads(row.data), row.expires_at)
+    else:
+        stored = await run_in_threadpool(store.get, sid)
+    if stored is None:
+        return None
+    data, expires_at = stored
+
+    user_id = session_user_id(data.get('_user_id'))
+    if not user_id:
+        return None
+    fingerprint = str(data['_user_id']).partition(':')[2]
+    # Slide the expiry forward like ServerSideSessionInterface does
+    lifetime = flask_app.permanent_session_lifetime
+    now = datetime.utcnow()
+    if expires_at - now < lifetime / 2:
+        await run_in_threadpool(store.save, sid, data, user_id, now + lifetime)
+
+    snapshot = data.get(SNAPSHOT_KEY)
+    if snapshot and snapshot.get('id') == user_id and snapshot.get('fingerprint') == fingerprint:
+        return snapshot if snapshot.get('is_active') else None
+    async with AsyncSession(get_async_engine(flask_app)) as session:
+        user = await session.get(User, user_id)
+    if user is None or not user.is_active or user.password_fingerprint() != fingerprint:
+        return None
+    return {'id': user.id, 'username': user.username}
@@ -0,0 +1,232 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import event, insert, inspect, text
+from sqlalchemy.orm import Session
+from src.models.audit import AuditEntry
+from src.models.base import db
+
+# Columns never worth an audit row on their own, and values never written to the log
+IGNORED_FIELDS = {'created_at', 'updated_at'}
+MASKED_FIELDS = {'password_hash'}
+MASK = '***'
+
+_writer = None
+
+
+def _audited_models():
+    from src.models.appointment import Appointment
+    from src.models.attachment import Attachment
+    from src.models.patient import Patient
+    from src.models.treatment import Treatment
+    from src.models.user import User
+    return {Patient: 'patient', Appointment: 'appointment', Treatment: 'treatment', User: 'user',
+            Attachment: 'attachment'}
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _column_keys(obj):
+    return [attr.key for attr in inspect(obj).mapper.column_attrs]
+
+
+def _diff(obj, action):
+    """Field-level changes of obj as {field: [old, new]}"""
+    state = inspect(obj)
+    changes = {}
+    for key in _column_keys(obj):
+        if key in IGNORED_FIELDS:
+            continue
+        if action == 'create':
+            old, new = None, getattr(obj, key)
+        elif action == 'delete':
+            old, new = getattr(obj, key), None
+        else:
+            history = state.attrs[key].history
+            if not history.has_changes():
+                continue
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            if old == new:
+                continue
+        if old is None and new is None:
+            continue
+        if key in MASKED_FIELDS:
+            old, new = (MASK if old is not None else None), (MASK if new is not None else None)
+        changes[key] = [_json_value(old), _json_value(new)]
+    return changes
+
+
+def _acting_user_id():
+    from flask import has_request_context
+    from flask_login import current_user
+
+    if not has_request_context():
+        return None
+    try:
+        return current_user.id if current_user.is_authenticated else None
+    except Exception:
+        return None
+
+
+def _after_flush(session, flush_context):
+    models = _audited_models()
+    pending = session.info.setdefault('audit_pending', [])
+    now = datetime.utcnow()
+    user_id = None
+    for objects, action in ((session.new, 'create'), (session.dirty, 'update'), (session.deleted, 'delete')):
+        for obj in objects:
+            entity_type = models.get(type(obj))
+            if entity_type is None:
+                continue
+            if action == 'update' and not session.is_modified(obj, include_collections=False):
+                continue
+            changes = _diff(obj, action)
+            if not changes:
+                continue
+            if user_id is None:
+                user_id = _acting_user_id()
+            pending.append(audit_entry(entity_type, obj.id, action, changes, user_id, now))
+
+
+def audit_entry(entity_type, entity_id, action, changes, user_id=None, now=None):
+    """One audit_log row; changes is {field: [old, new]}"""
+    now = now or datetime.utcnow()
+    return {
+        'id': uuid.uuid4().hex,
+        'log_date': now.date(),
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'action': action,
+        'changes': json.dumps({key: [_json_value(old), _json_value(new)] for key, (old, new) in changes.items()}),
+        'user_id': user_id,
+        'created_at': now,
+    }
+
+
+def record_changes(entity_type, action, changes_by_id, session=None):
+    """Log rows changed by Core or bulk statements, which the flush hook never sees
+
+    changes_by_id maps each entity id to its {field: [old, new]}. With a
+    session the entries are written when it commits and dropped if it rolls
+    back, like ORM changes; without one, call this after the statement's
+    transaction has committed.
+    """
+    if not changes_by_id:
+        return
+    now = datetime.utcnow()
+    user_id = _acting_user_id()
+    entries = [audit_entry(entity_type, entity_id, action, changes, user_id, now)
+               for entity_id, changes in changes_by_id.items()]
+    if session is not None:
+        session.info.setdefault('audit_pending', []).extend(entries)
+    elif _writer is not None:
+        _writer.submit(entries)
+
+
+def _after_commit(session):
+    pending = session.info.pop('audit_pending', None)
+    if pending and _writer is not None:
+        _writer.submit(pending)
+
+
+def _after_rollback(session):
+    session.info.pop('audit_pending', None)
+
+
+class AuditWriter:
+    """Batches audit entries off the request path into the audit_log table"""
+
+    def __init__(self, app, batch_size=500, flush_interval=1.0, max_queue=10000):
+        with app.app_context():
+            self.engine = db.engine
+        self.table = AuditEntry.__table__
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._partitions = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, entries):
+        for entry in entries:
+            try:
+                self.queue.put_nowait(entry)
+            except queue.Full:
+                # Never drop audit records: fall back to writing on the caller's thread
+                self.write([entry])
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+            try:
+                self.write(batch)
+            except Exception as e:
+                print(f"Error writing {len(batch)} audit entries: {str(e)}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def write(self, entries):
+        with self._lock, self.engine.begin() as conn:
+            if conn.dialect.name == 'postgresql':
+                for day in {entry['log_date'].replace(day=1) for entry in entries}:
+                    self._ensure_partition(conn, day)
+            conn.execute(insert(self.table), entries)
+
+    def _ensure_partition(self, conn, month_start):
+        if month_start in self._partitions:
+            return
+        next_month = (month_start.replace(day=28).toordinal() + 4)
+        next_month = date.fromordinal(next_month).replace(day=1)
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS audit_log_{month_start:%Y_%m} PARTITION OF audit_log "
+            f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{next_month.isoformat()}')"
+        ))
+        self._partitions.add(month_start)
+
+    def flush(self):
+        """Drain everything queued so far (used at shutdown)"""
+        pending = []
+        while True:
+            try:
+                pending.append(self.queue.get_nowait())
+                self.queue.task_done()
+            except queue.Empty:
+                break
+        if pending:
+            self.write(pending)
+
+
+def init_audit(app):
+    """Start the audit writer and capture changes from every ORM session"""
+    global _writer
+    if _writer is not None:
+        return _writer
+    _writer = AuditWriter(
+        app,
+        batch_size=int(os.environ.get('AUDIT_BATCH_SIZE', 500)),
+        flush_interval=float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0)),
+    )
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _after_rollback)
+    atexit.register(_writer.flush)
+    return _writer
@@ -0,0 +1,626 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import tarfile
+import tempfile
+from contextlib import closing
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import make_url
+from src.models.attachment import Attachment
+from src.models.base import db
+from src.services.blobstore import CHUNK_SIZE, get_blob_store
+from src.services.jobs import enqueue, job_handler
+
+try:
+    import zstandard
+except ImportError:  # exports fall back to gzip
+    zstandard = None
+
+BACKUP_PREFIX = 'dental'
+EXPORT_FORMAT = 'dental-office-export'
+EXPORT_VERSION = 1
+MANIFEST_NAME = 'MANIFEST.json'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# The only member names an export may contain; anything else is rejected on import
+EXPORT_MEMBER = re.compile(r'^(database\.(sqlite|pgdump)|attachments/[0-9a-f]{64}|MANIFEST\.json)$')
+
+
+class BackupError(RuntimeError):
+    pass
+
+
+class _HashingFile:
+    """Wraps a binary file, hashing and counting the bytes read or written through it"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.digest.update(data)
+        self.size += len(data)
+        return data
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.fileobj.write(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+
+def backup_dir():
+    return os.environ.get(
+        'BACKUP_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'backups')
+    )
+
+
+def _copy(source, target):
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        target.write(chunk)
+
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        hashed = _HashingFile(f)
+        while hashed.read(CHUNK_SIZE):
+            pass
+    return hashed.size, hashed.digest.hexdigest()
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _sqlite_snapshot(source_path, target_path):
+    """Consistent copy of a live SQLite database through the online backup API
+
+    Pages are copied BACKUP_SQLITE_PAGES at a time and the source is unlocked
+    between batches, so writers wait for one batch at most rather than the
+    whole copy. A write from another connection restarts the copy; after
+    BACKUP_SQLITE_RESTARTS restarts the rest is copied in one step, holding
+    the read lock (and making writers wait) until it is done, so a busy
+    database cannot keep the backup from ever finishing.
+    """
+    restarts = int(os.environ.get('BACKUP_SQLITE_RESTARTS', 3))
+    progress = {'remaining': None, 'restarts': 0}
+
+    def on_progress(status, remaining, total):
+        if progress['remaining'] is not None and remaining > progress['remaining']:
+            progress['restarts'] += 1
+            if progress['restarts'] > restarts:
+                raise _Restarted()
+        progress['remaining'] = remaining
+
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        try:
+            source.backup(
+                target,
+                pages=int(os.environ.get('BACKUP_SQLITE_PAGES', 1024)),
+                progress=on_progress,
+                sleep=float(os.environ.get('BACKUP_SQLITE_SLEEP', 0.05))
+            )
+        except _Restarted:
+            source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def _sqlite_counts(path):
+    """Row count of every model table present in a SQLite file"""
+    with closing(sqlite3.connect(path)) as conn:
+        present = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return {
+            table.name: conn.execute(f'SELECT count(*) FROM "{table.name}"').fetchone()[0]
+            for table in db.metadata.sorted_tables if table.name in present
+        }
+
+
+def _sqlite_blobs(path):
+    """(sha256, size) of every attachment blob a SQLite snapshot references"""
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute(
+            f'SELECT sha256, max(size) FROM "{Attachment.__tablename__}" GROUP BY sha256'
+        ).fetchall()
+
+
+def _libpq(url):
+    """(libpq URL without the password, environment carrying it) for pg_dump/pg_restore"""
+    url = make_url(url).set(drivername='postgresql')
+    env = dict(os.environ)
+    if url.password:
+        # Kept off the command line, where other users could read it
+        env['PGPASSWORD'] = url.password
+    return url.set(password=None).render_as_string(hide_password=False), env
+
+
+def _run_pg(args, url=None, stdout=None):
+    """Run a PostgreSQL client tool (against url, if given), streaming its stdout into a file object"""
+    dsn, env = _libpq(url) if url else (None, None)
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            args + ['--dbname', dsn] if dsn else args, env=env,
+            stdout=subprocess.PIPE if stdout is not None else subprocess.DEVNULL, stderr=stderr
+        )
+        if stdout is not None:
+            _copy(process.stdout, stdout)
+            process.stdout.close()
+        if process.wait() != 0:
+            stderr.seek(0)
+            raise BackupError(f'{args[0]} failed: {stderr.read().decode(errors="replace").strip()}')
+
+
+def _database_url():
+    return db.engine.url.render_as_string(hide_password=False)
+
+
+def _write_database(dialect, target_path):
+    """Snapshot the live database into target_path (raw SQLite file or pg_dump archive)"""
+    if dialect == 'sqlite':
+        _sqlite_snapshot(db.engine.url.database, target_path)
+        return _sqlite_counts(target_path)
+    _pg_dump(target_path)
+    return None
+
+
+def _pg_dump(target_path, snapshot_id=None):
+    args = ['pg_dump', '--format=custom', '--compress=6', '--no-owner', '--no-privileges']
+    if snapshot_id is not None:
+        args.append(f'--snapshot={snapshot_id}')
+    with open(target_path, 'wb') as out:
+        # Custom format: compressed, and restorable table by table with pg_restore
+        _run_pg(args, _database_url(), stdout=out)
+
+
+def _pg_dump_with_blobs(target_path):
+    """pg_dump into target_path; returns the attachment blobs the dump references
+
+    The blob list is read in the transaction whose snapshot pg_dump exports,
+    so it matches the dumped attachments table exactly.
+    """
+    with db.engine.connect() as conn:
+        conn.execution_options(isolation_level='REPEATABLE READ')
+        with conn.begin():
+            snapshot_id = conn.execute(text('SELECT pg_export_snapshot()')).scalar()
+            blobs = conn.execute(
+                select(Attachment.sha256, func.max(Attachment.size)).group_by(Attachment.sha256)
+            ).all()
+            _pg_dump(target_path, snapshot_id)
+    return blobs
+
+
+def _check_dialect():
+    dialect = db.engine.dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        raise BackupError(f'Backups are not supported for {dialect}')
+    return dialect
+
+
+def backup_database():
+    """Write a snapshot of the database to BACKUP_DIR; returns its manifest
+
+    SQLite snapshots are gzipped copies taken with the online backup API;
+    PostgreSQL snapshots are pg_dump custom-format archives. A <file>.json
+    manifest next to each one records its size, SHA-256 and row counts.
+    """
+    dialect = _check_dialect()
+    directory = backup_dir()
+    os.makedirs(directory, exist_ok=True)
+    created_at = datetime.utcnow()
+    name = f"{BACKUP_PREFIX}-{created_at.strftime('%Y%m%dT%H%M%SZ')}.{'sqlite.gz' if dialect == 'sqlite' else 'pgdump'}"
+    path = os.path.join(directory, name)
+
+    with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+        partial = os.path.join(temp_dir, name)
+        if dialect == 'sqlite':
+            snapshot = os.path.join(temp_dir, 'snapshot.db')
+            counts = _write_database(dialect, snapshot)
+            with open(snapshot, 'rb') as source, open(partial, 'wb') as out:
+                with gzip.GzipFile(fileobj=out, mode='wb', compresslevel=6, mtime=0) as compressed:
+                    _copy(source, compressed)
+        else:
+            counts = _write_database(dialect, partial)
+        size, sha256 = _file_digest(partial)
+        # Only complete backups ever appear under their final name
+        os.replace(partial, path)
+
+    manifest = {
+        'file': name,
+        'dialect': dialect,
+        'created_at': created_at.isoformat(),
+        'size': size,
+        'sha256': sha256,
+        'tables': counts
+    }
+    with open(path + '.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return dict(manifest, path=path)
+
+
+def list_backups():
+    """Manifests of the backups in BACKUP_DIR, newest first"""
+    directory = backup_dir()
+    if not os.path.isdir(directory):
+        return []
+    backups = []
+    for name in os.listdir(directory):
+        if not name.startswith(BACKUP_PREFIX) or not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipping unreadable backup manifest {name}: {str(e)}")
+            continue
+        backups.append(dict(manifest, path=os.path.join(directory, manifest['file'])))
+    return sorted(backups, key=lambda manifest: manifest['created_at'], reverse=True)
+
+
+def rotate_backups(retention_days=None, keep_min=None):
+    """Delete backups older than the retention, always keeping the newest keep_min"""
+    if retention_days is None:
+        retention_days = int(os.environ.get('BACKUP_RETENTION_DAYS', 14))
+    if keep_min is None:
+        keep_min = int(os.environ.get('BACKUP_KEEP_MIN', 3))
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+    removed = []
+    for manifest in list_backups()[keep_min:]:
+        if manifest['created_at'] < cutoff:
+            for path in (manifest['path'], manifest['path'] + '.json'):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            removed.append(manifest['file'])
+    return removed
+
+
+def _gunzip(source_path, target_path):
+    with gzip.open(source_path, 'rb') as source, open(target_path, 'wb') as target:
+        _copy(source, target)
+
+
+def _check_sqlite_file(path, expected_counts=None):
+    """Problems found in a SQLite file: failed integrity check or row counts off"""
+    with closing(sqlite3.connect(path)) as conn:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    problems = [] if result == 'ok' else [f'integrity_check: {result}']
+    if expected_counts:
+        counts = _sqlite_counts(path)
+        problems += [
+            f'{table}: {counts.get(table)} rows, expected {count}'
+            for table, count in expected_counts.items() if counts.get(table) != count
+        ]
+    return problems
+
+
+def _find_backup(path):
+    manifest_path = path if path.endswith('.json') else path + '.json'
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BackupError(f'No readable manifest for {path}: {str(e)}')
+    return dict(manifest, path=os.path.join(os.path.dirname(manifest_path), manifest['file']))
+
+
+def verify_backup(path):
+    """Check a backup against its manifest and make sure it restores; returns the problems found"""
+    manifest = _find_backup(path)
+    if not os.path.exists(manifest['path']):
+        return [f"{manifest['file']} is missing"]
+    size, sha256 = _file_digest(manifest['path'])
+    if (size, sha256) != (manifest['size'], manifest['sha256']):
+        return [f"{manifest['file']} does not match its checksum"]
+
+    if manifest['dialect'] == 'sqlite':
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(manifest['path'])) as temp_dir:
+            restored = os.path.join(temp_dir, 'verify.db')
+            try:
+                _gunzip(manifest['path'], restored)
+            except (OSError, EOFError) as e:
+                return [f'Cannot decompress: {str(e)}']
+            return _check_sqlite_file(restored, manifest.get('tables'))
+    try:
+        # Reads the whole archive table of contents without touching a database
+        _run_pg(['pg_restore', '--list', manifest['path']])
+    except BackupError as e:
+        return [str(e)]
+    return []
+
+
+def _restore_sqlite_file(source_path):
+    """Replace the live SQLite database with source_path, page by page under one lock"""
+    db.engine.dispose()
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(db.engine.url.database, timeout=30)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    db.engine.dispose()
+
+
+def _restore_pgdump(path):
+    _run_pg(['pg_restore', '--clean', '--if-exists', '--no-owner', '--no-privileges',
+             '--single-transaction', path], _database_url())
+    db.engine.dispose()
+
+
+def restore_backup(path):
+    """Verify a backup, then replace the current database with it"""
+    manifest = _find_backup(path)
+    if manifest['dialect'] != _check_dialect():
+        raise BackupError(f"{manifest['file']} is a {manifest['dialect']} backup, the database is {db.engine.dialect.name}")
+    problems = verify_backup(manifest['path'])
+    if problems:
+        raise BackupError(f"{manifest['file']} failed verification: {'; '.join(problems)}")
+
+    if manifest['dialect'] == 'sqlite':
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(manifest['path'])) as temp_dir:
+            restored = os.path.join(temp_dir, 'restore.db')
+            _gunzip(manifest['path'], restored)
+            _restore_sqlite_file(restored)
+    else:
+        _restore_pgdump(manifest['path'])
+    return manifest
+
+
+def _add_member(archive, name, fileobj, size, files):
+    """Append fileobj to the tar stream, recording its size and SHA-256 for the manifest"""
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(datetime.utcnow().timestamp())
+    hashed = _HashingFile(fileobj)
+    archive.addfile(info, hashed)
+    if hashed.size != size:
+        raise BackupError(f'{name} changed size while exporting')
+    files[name] = {'size': size, 'sha256': hashed.digest.hexdigest()}
+
+
+def export_clinic(target_path):
+    """Write the database and every attachment blob to one compressed, checksummed archive
+
+    The archive is a tar stream (zstd-compressed when zstandard is installed,
+    gzip otherwise) ending in a MANIFEST.json with the SHA-256 of every
+    member, so an import can prove it received everything intact.
+    """
+    dialect = _check_dialect()
+    database_name = 'database.sqlite' if dialect == 'sqlite' else 'database.pgdump'
+    files, missing = {}, []
+    temp_root = os.path.dirname(os.path.abspath(target_path))
+
+    with tempfile.TemporaryDirectory(dir=temp_root) as temp_dir:
+        snapshot = os.path.join(temp_dir, database_name)
+        # The blob list comes from the snapshot, not the live tables, so the
+        # export carries exactly the attachments its database refers to
+        if dialect == 'sqlite':
+            counts = _write_database(dialect, snapshot)
+            blobs = _sqlite_blobs(snapshot)
+        else:
+            counts, blobs = None, _pg_dump_with_blobs(snapshot)
+        partial = os.path.join(temp_dir, 'export.partial')
+        with open(partial, 'wb') as out:
+            if zstandard is not None:
+                stream = zstandard.ZstdCompressor(level=6, write_checksum=True, threads=-1).stream_writer(out)
+                archive = tarfile.open(fileobj=stream, mode='w|')
+            else:
+                stream = None
+                archive = tarfile.open(fileobj=out, mode='w|gz')
+            with archive:
+                with open(snapshot, 'rb') as f:
+                    _add_member(archive, database_name, f, os.path.getsize(snapshot), files)
+                store = get_blob_store()
+                for sha256, size in blobs:
+                    if not store.exists(sha256):
+                        missing.append(sha256)
+                        continue
+                    with closing(store.open(sha256)) as f:
+                        _add_member(archive, f'attachments/{sha256}', f, size, files)
+
+                manifest = json.dumps({
+                    'format': EXPORT_FORMAT,
+                    'version': EXPORT_VERSION,
+                    'dialect': dialect,
+                    'created_at': datetime.utcnow().isoformat(),
+                    'tables': counts,
+                    'missing_blobs': missing,
+                    'files': files
+                }, indent=2).encode()
+                info = tarfile.TarInfo(MANIFEST_NAME)
+                info.size = len(manifest)
+                info.mtime = int(datetime.utcnow().timestamp())
+                archive.addfile(info, io.BytesIO(manifest))
+            if stream is not None:
+                stream.close()
+        os.replace(partial, target_path)
+    return {'path': target_path, 'files': len(files), 'bytes': os.path.getsize(target_path),
+            'missing_blobs': missing}
+
+
+def _open_export(path):
+    """Tar stream reader for an export, whichever compression it was written with"""
+    f = open(path, 'rb')
+    magic = f.read(4)
+    f.seek(0)
+    if magic == ZSTD_MAGIC:
+        if zstandard is None:
+            f.close()
+            raise BackupError('This export is zstd-compressed; install the zstandard package to import it')
+        return tarfile.open(fileobj=zstandard.ZstdDecompressor().stream_reader(f, closefd=True), mode='r|')
+    return tarfile.open(fileobj=f, mode='r|*')
+
+
+def _unpack_export(path, temp_dir):
+    """Extract and checksum every member; returns the verified manifest"""
+    received = {}
+    try:
+        with _open_export(path) as archive:
+            for member in archive:
+                if not member.isfile() or not EXPORT_MEMBER.match(member.name):
+                    raise BackupError(f'Unexpected member in export: {member.name}')
+                target = os.path.join(temp_dir, member.name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.extractfile(member) as source, open(target, 'wb') as out:
+                    hashed = _HashingFile(out)
+                    _copy(source, hashed)
+                received[member.name] = {'size': hashed.size, 'sha256': hashed.digest.hexdigest()}
+    except (tarfile.TarError, EOFError) + ((zstandard.ZstdError,) if zstandard else ()) as e:
+        raise BackupError(f'Export is damaged or truncated: {str(e)}')
+
+    try:
+        with open(os.path.join(temp_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        raise BackupError('Export has no readable manifest (truncated?)')
+    if manifest.get('format') != EXPORT_FORMAT or manifest.get('version') != EXPORT_VERSION:
+        raise BackupError('Not a supported dental office export')
+    received.pop(MANIFEST_NAME)
+    if received != manifest['files']:
+        bad = sorted(set(received) ^ set(manifest['files']) |
+                     {name for name in received if received[name] != manifest['files'].get(name)})
+        raise BackupError(f"Export is damaged: {', '.join(bad[:5])}{' …' if len(bad) > 5 else ''}")
+    return manifest
+
+
+def import_clinic(path):
+    """Verify an export completely, then replace the database and add its attachment blobs"""
+    dialect = _check_dialect()
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as temp_dir:
+        manifest = _unpack_export(path, temp_dir)
+        if manifest['dialect'] != dialect:
+            raise BackupError(f"Export is from a {manifest['dialect']} database, this one is {dialect}")
+
+        if dialect == 'sqlite':
+            database = os.path.join(temp_dir, 'database.sqlite')
+            problems = _check_sqlite_file(database, manifest.get('tables'))
+            if problems:
+                raise BackupError(f"Exported database failed verification: {'; '.join(problems)}")
+            _restore_sqlite_file(database)
+        else:
+            _restore_pgdump(os.path.join(temp_dir, 'database.pgdump'))
+
+        store = get_blob_store()
+        added = 0
+        blob_dir = os.path.join(temp_dir, 'attachments')
+        for sha256 in (os.listdir(blob_dir) if os.path.isdir(blob_dir) else []):
+            if not store.exists(sha256):
+                with open(os.path.join(blob_dir, sha256), 'rb') as f:
+                    store.put(f)
+                added += 1
+    return {'tables': manifest.get('tables'), 'blobs_added': added, 'missing_blobs': manifest['missing_blobs']}
+
+
+def _interval_hours():
+    return float(os.environ.get('BACKUP_INTERVAL_HOURS', 24))
+
+
+def _schedule_next():
+    """Queue the backup for the next interval boundary; every worker computes the same slot"""
+    interval = _interval_hours() * 3600
+    if interval <= 0:
+        return None
+    now = datetime.utcnow().timestamp()
+    run_at = datetime.utcfromtimestamp((now // interval + 1) * interval)
+    return enqueue('backup_database', run_at=run_at, max_attempts=3,
+                   dedupe_key=f"backup_database:{run_at.isoformat(timespec='minutes')}")
+
+
+def ensure_backup_schedule():
+    """Queue the next scheduled backup unless BACKUP_INTERVAL_HOURS is 0"""
+    try:
+        return _schedule_next()
+    except Exception as e:
+        print(f"Error scheduling database backups: {str(e)}")
+        return None
+
+
+@job_handler('backup_database')
+def backup_database_job(payload):
+    """Scheduled backup and rotation, run by the background worker"""
+    # Queue the next run first, so a failing backup does not end the schedule
+    _schedule_next()
+    manifest = backup_database()
+    return {'file': manifest['file'], 'size': manifest['size'], 'rotated': rotate_backups()}
+
+
+def init_backups(app):
+    """Register the backup, verify, restore, export and import commands"""
+
+    @app.cli.command('backup-database')
+    @click.option('--no-rotate', is_flag=True, help='Keep every existing backup')
+    def backup_database_command(no_rotate):
+        """Snapshot the database into BACKUP_DIR without stopping the app"""
+        manifest = backup_database()
+        print(f"💾 Backed up to {manifest['path']} ({manifest['size']} bytes)")
+        for name in ([] if no_rotate else rotate_backups()):
+            print(f"🗑️  Rotated out {name}")
+
+    @app.cli.command('list-backups')
+    def list_backups_command():
+        """List backups, newest first"""
+        for manifest in list_backups():
+            print(f"{manifest['created_at']}  {manifest['size']:>12}  {manifest['path']}")
+
+    @app.cli.command('verify-backup')
+    @click.argument('path', required=False)
+    def verify_backup_command(path):
+        """Check a backup (default: the newest) against its checksum and restore it to a scratch copy"""
+        if path is None:
+            backups = list_backups()
+            if not backups:
+                raise click.ClickException('No backups found')
+            path = backups[0]['path']
+        problems = verify_backup(path)
+        if problems:
+            raise click.ClickException(f"{path} is not restorable: {'; '.join(problems)}")
+        print(f"✅ {path} verified")
+
+    @app.cli.command('restore-backup')
+    @click.argument('path')
+    @click.confirmation_option(prompt='This replaces the current database. Stop the app first. Continue?')
+    def restore_backup_command(path):
+        """Replace the database with a verified backup"""
+        try:
+            manifest = restore_backup(path)
+        except BackupError as e:
+            raise click.ClickException(str(e))
+        print(f"♻️  Restored the database from {manifest['file']} ({manifest['created_at']})")
+
+    @app.cli.command('export-clinic')
+    @click.argument('path', required=False)
+    def export_clinic_command(path):
+        """Export the database and attachments to one archive for moving to another host"""
+        path = path or f"dental-export-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.tar.{'zst' if zstandard else 'gz'}"
+        result = export_clinic(path)
+        print(f"📦 Exported {result['files']} files to {result['path']} ({result['bytes']} bytes)")
+        if result['missing_blobs']:
+            print(f"⚠️  {len(result['missing_blobs'])} attachment blobs were missing from storage")
+
+    @app.cli.command('import-clinic')
+    @click.argument('path')
+    @click.confirmation_option(prompt='This replaces the current database. Stop the app first. Continue?')
+    def import_clinic_command(path):
+        """Import an export-clinic archive after verifying every checksum"""
+        try:
+            result = import_clinic(path)
+        except BackupError as e:
+            raise click.ClickException(str(e))
+        print(f"📥 Imported the database and {result['blobs_added']} attachment blobs")
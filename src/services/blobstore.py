@@ -0,0 +1,214 @@
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import delete, select, text
+from src.models.attachment import Attachment
+from src.models.base import db
+from src.services.audit import record_changes
+from src.services.jobs import job_handler
+
+CHUNK_SIZE = 1024 * 1024
+
+_store = None
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+def _spool(stream, directory, max_bytes):
+    """Copy a stream to a temp file chunk by chunk, hashing as it goes
+
+    Returns (temp path, sha256 hex, size). Only one chunk is ever in memory.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise BlobTooLarge(f'Attachment exceeds {max_bytes} bytes')
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), size
+
+
+class LocalBlobStore:
+    """Content-addressed blobs on local disk: <root>/<sha[:2]>/<sha[2:4]>/<sha>"""
+
+    def __init__(self, root):
+        self.root = root
+        self.temp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def put(self, stream, max_bytes=None):
+        """Store a stream; identical content is kept once. Returns (sha256, size)"""
+        temp_path, sha256, size = _spool(stream, self.temp_dir, max_bytes)
+        target = self.path(sha256)
+        if os.path.exists(target):
+            os.unlink(temp_path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Atomic on the same filesystem: readers never see a partial blob
+            os.replace(temp_path, target)
+        return sha256, size
+
+    def exists(self, sha256):
+        return os.path.exists(self.path(sha256))
+
+    def open(self, sha256):
+        """Readable binary stream of a blob"""
+        return open(self.path(sha256), 'rb')
+
+    def delete(self, sha256):
+        try:
+            os.unlink(self.path(sha256))
+        except FileNotFoundError:
+            pass
+
+    def download_url(self, sha256, filename, content_type):
+        # Served by the app with send_file (range requests, sendfile)
+        return None
+
+
+class S3BlobStore:
+    """Content-addressed blobs in an S3-compatible bucket (AWS, MinIO, ...)
+
+    Uploads are spooled to a local temp file first (the key is the hash of
+    the content, known only at the end), then sent as a multipart upload.
+    Downloads are redirected to short-lived presigned URLs, so the bucket
+    serves the bytes and range requests.
+    """
+
+    def __init__(self, bucket, endpoint_url=None, temp_dir=None):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError('ATTACHMENT_STORAGE=s3 requires the boto3 package')
+        self.bucket = bucket
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.temp_dir = temp_dir or tempfile.gettempdir()
+
+    def _key(self, sha256):
+        return f'blobs/{sha256[:2]}/{sha256}'
+
+    def put(self, stream, max_bytes=None):
+        temp_path, sha256, size = _spool(stream, self.temp_dir, max_bytes)
+        try:
+            if not self.exists(sha256):
+                self.client.upload_file(temp_path, self.bucket, self._key(sha256))
+        finally:
+            os.unlink(temp_path)
+        return sha256, size
+
+    def exists(self, sha256):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(sha256))
+            return True
+        except ClientError:
+            return False
+
+    def open(self, sha256):
+        """Readable binary stream of a blob, streamed from the bucket"""
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(sha256))['Body']
+
+    def delete(self, sha256):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(sha256))
+
+    def download_url(self, sha256, filename, content_type):
+        return self.client.generate_presigned_url('get_object', Params={
+            'Bucket': self.bucket,
+            'Key': self._key(sha256),
+            'ResponseContentType': content_type,
+            'ResponseContentDisposition': f'inline; filename="{filename}"',
+        }, ExpiresIn=300)
+
+
+def max_upload_bytes():
+    return int(os.environ.get('ATTACHMENT_MAX_BYTES', 200 * 1024 * 1024))
+
+
+def get_blob_store():
+    global _store
+    if _store is None:
+        if os.environ.get('ATTACHMENT_STORAGE', 'local') == 's3':
+            _store = S3BlobStore(os.environ['ATTACHMENT_S3_BUCKET'], os.environ.get('ATTACHMENT_S3_ENDPOINT'))
+        else:
+            _store = LocalBlobStore(os.environ.get(
+                'ATTACHMENT_DIR',
+                os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'attachments')
+            ))
+    return _store
+
+
+def lock_blob(conn, sha256):
+    """Hold a lock on one blob until the transaction of conn (a connection or session) ends
+
+    Uploads take it between storing a blob and committing the attachment that
+    references it, and the purge between checking references and deleting, so
+    the purge never removes content an upload has just reused.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        conn.execute(text('SELECT pg_advisory_xact_lock(hashtext(:sha256))'), {'sha256': sha256})
+    else:
+        # SQLite has a single writer: starting a write transaction serializes with every other one
+        conn.execute(text('UPDATE attachments SET sha256 = sha256 WHERE 0'))
+
+
+def discard_blob(sha256):
+    """Delete a blob unless an attachment (deleted or not) still references it"""
+    with db.engine.begin() as conn:
+        lock_blob(conn, sha256)
+        if conn.execute(select(Attachment.id).where(Attachment.sha256 == sha256).limit(1)).first():
+            return False
+        get_blob_store().delete(sha256)
+        return True
+
+
+def purge_attachments(retention_days=None):
+    """Drop attachments deleted longer ago than the retention, and blobs nobody references"""
+    if retention_days is None:
+        retention_days = int(os.environ.get('ATTACHMENT_RETENTION_DAYS', 30))
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    table = Attachment.__table__
+    with db.engine.begin() as conn:
+        # Locked so a restore cannot slip between the read (for the audit log) and the delete
+        purged = conn.execute(select(table).where(table.c.deleted_at < cutoff).with_for_update()).all()
+        conn.execute(delete(table).where(table.c.deleted_at < cutoff))
+    record_changes('attachment', 'delete', {
+        row.id: {key: [value, None] for key, value in row._mapping.items() if value is not None and key != 'created_at'}
+        for row in purged
+    })
+    candidates = {row.sha256 for row in purged}
+    # One short transaction per blob, re-checking references under its lock
+    return sum(1 for sha256 in candidates if discard_blob(sha256))
+
+
+@job_handler('purge_attachments')
+def purge_attachments_job(payload):
+    """Purge deleted attachments from the background worker"""
+    return {'blobs_removed': purge_attachments(payload.get('retention_days'))}
+
+
+def init_attachments(app):
+    """Register `flask purge-attachments`"""
+
+    @app.cli.command('purge-attachments')
+    @click.option('--retention-days', type=int, default=None, help='Keep deleted attachments this long')
+    def purge_attachments_command(retention_days):
+        """Permanently remove deleted attachments and their unreferenced blobs"""
+        print(f"🗑️  Removed {purge_attachments(retention_days)} attachment blobs")
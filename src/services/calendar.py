@@ -0,0 +1,191 @@
+import hashlib
+import os
+import secrets
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, time as day_start, timedelta
+from sqlalchemy import select
+from src.models.appointment import Appointment
+from src.models.base import db
+from src.models.patient import Patient
+from src.models.provider import Provider
+from src.services.events import get_broker
+from src.services.metrics import CALENDAR_FEED_CACHE
+
+PRODID = '-//Dental Office App//Schedule//EN'
+UID_DOMAIN = 'dental-office-app'
+# Entities whose changes can alter a rendered feed (patient names give the initials,
+# provider names the calendar name)
+FEED_ENTITIES = {'appointment', 'patient', 'provider'}
+
+CachedFeed = namedtuple('CachedFeed', ['body', 'etag', 'day', 'built_at'])
+
+
+def new_feed_token():
+    """A fresh URL token and the hash stored for it"""
+    token = secrets.token_urlsafe(32)
+    return token, hash_token(token)
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _window(today):
+    past = int(os.environ.get('ICS_PAST_DAYS', 30))
+    future = int(os.environ.get('ICS_FUTURE_DAYS', 180))
+    return (datetime.combine(today - timedelta(days=past), day_start()),
+            datetime.combine(today + timedelta(days=future + 1), day_start()))
+
+
+def _escape(value):
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Content line as CRLF-terminated bytes, folded at 75 octets (RFC 5545 3.1)"""
+    data = line.encode()
+    if len(data) <= 75:
+        return data + b'\r\n'
+    parts, start = [], 0
+    while start < len(data):
+        end = min(start + (75 if not parts else 74), len(data))
+        # Never split a UTF-8 sequence: back off continuation bytes
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end])
+        start = end
+    return b'\r\n '.join(parts) + b'\r\n'
+
+
+def _initials(first_name, last_name):
+    return ''.join(f'{name.strip()[0].upper()}.' for name in (first_name, last_name) if name and name.strip())
+
+
+def _event_lines(apt, minutes):
+    summary = _initials(apt.first_name, apt.last_name)
+    if apt.treatment_type:
+        summary = f'{summary} {apt.treatment_type}'.strip()
+    if apt.status and apt.status not in ('scheduled', 'cancelled'):
+        summary = f'{summary} ({apt.status})'
+    stamp = apt.updated_at or apt.appointment_date
+    yield 'BEGIN:VEVENT'
+    yield f'UID:appointment-{apt.id}@{UID_DOMAIN}'
+    yield f"DTSTAMP:{stamp.strftime('%Y%m%dT%H%M%SZ')}"
+    # Floating local time: appointments are stored in office-local time
+    yield f"DTSTART:{apt.appointment_date.strftime('%Y%m%dT%H%M%S')}"
+    yield f'DURATION:PT{minutes}M'
+    yield f'SUMMARY:{_escape(summary or "Appointment")}'
+    yield f"STATUS:{'CANCELLED' if apt.status == 'cancelled' else 'CONFIRMED'}"
+    yield 'END:VEVENT'
+
+
+def render_feed(calendar_name, provider_id=None, today=None):
+    """iCalendar body of the appointments in the visible window
+
+    Rows are streamed from the database in batches and only carry what the
+    feed shows (patient initials, never names or notes), so the size of the
+    appointment history does not matter. A provider's feed is a range scan
+    of the (provider_id, appointment_date) index.
+    """
+    start, end = _window(today or date.today())
+    minutes = int(os.environ.get('ICS_APPOINTMENT_MINUTES', 60))
+    query = select(
+        Appointment.id,
+        Appointment.appointment_date,
+        Appointment.treatment_type,
+        Appointment.status,
+        Appointment.updated_at,
+        Patient.first_name,
+        Patient.last_name
+    ).join(Patient, Appointment.patient_id == Patient.id).where(
+        Appointment.not_deleted(),
+        Appointment.appointment_date >= start,
+        Appointment.appointment_date < end
+    )
+    if provider_id is not None:
+        query = query.where(Appointment.provider_id == provider_id)
+    query = query.order_by(Appointment.appointment_date, Appointment.id).execution_options(yield_per=1000)
+
+    chunks = [_fold(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(calendar_name)}', 'REFRESH-INTERVAL;VALUE=DURATION:PT15M',
+    )]
+    for apt in db.session.execute(query):
+        chunks.extend(_fold(line) for line in _event_lines(apt, minutes))
+    chunks.append(_fold('END:VCALENDAR'))
+    return b''.join(chunks)
+
+
+class FeedCache:
+    """Rendered feed bodies by cache key, dropped whenever the schedule changes
+
+    Entries also expire at midnight (the window moves) and after
+    ICS_CACHE_SECONDS, which bounds staleness for changes this process is not
+    told about (other workers with the in-memory change broker, bulk archiving).
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._generation = 0
+
+    def _fresh(self, entry):
+        max_age = float(os.environ.get('ICS_CACHE_SECONDS', 900))
+        return entry is not None and entry.day == date.today() and time.monotonic() - entry.built_at < max_age
+
+    def get(self, key, build):
+        """Cached entry for key, calling build() -> body bytes on a miss"""
+        entry = self._entries.get(key)
+        if self._fresh(entry):
+            CALENDAR_FEED_CACHE.labels('hit').inc()
+            return entry
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        # One render per key; pollers arriving meanwhile wait for it
+        with build_lock:
+            entry = self._entries.get(key)
+            if self._fresh(entry):
+                CALENDAR_FEED_CACHE.labels('hit').inc()
+                return entry
+            CALENDAR_FEED_CACHE.labels('miss').inc()
+            generation = self._generation
+            body = build()
+            entry = CachedFeed(body, hashlib.sha256(body).hexdigest()[:32], date.today(), time.monotonic())
+            with self._lock:
+                # A change that arrived while rendering may be missing from body
+                if generation == self._generation:
+                    self._entries[key] = entry
+            return entry
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+_cache = FeedCache()
+
+
+def get_feed(feed):
+    """Cached (body, etag) entry of a feed"""
+    calendar_name = os.environ.get('OFFICE_NAME', 'Dental Office')
+    if feed.provider_id is not None:
+        provider = db.session.get(Provider, feed.provider_id)
+        calendar_name = f'{provider.name} - {calendar_name}' if provider else calendar_name
+    return _cache.get(feed.cache_key(), lambda: render_feed(calendar_name, feed.provider_id))
+
+
+def _invalidate_on_change(event):
+    if isinstance(event, dict) and event.get('entity') in FEED_ENTITIES:
+        _cache.invalidate()
+
+
+def init_calendar(app):
+    """Drop cached feeds on appointment and patient changes (call after init_events)"""
+    broker = get_broker()
+    if broker is not None:
+        broker.subscribe(_invalidate_on_change)
@@ -0,0 +1,163 @@
+import os
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Levels tuned for latency rather than ratio: on repetitive JSON these get
+# within a few percent of the maximum ratio at a fraction of the CPU
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+# Never compressed: live event streams must reach the client unbuffered, and
+# attachments are mostly already-compressed images served with Range support
+SKIPPED_BLUEPRINTS = {'events', 'attachments'}
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encoders():
+    """Encoders usable in this process, in server preference order"""
+    encoders = []
+    if zstandard is not None:
+        encoders.append(ZstdEncoder)
+    if brotli is not None:
+        encoders.append(BrotliEncoder)
+    encoders.append(GzipEncoder)
+    return encoders
+
+
+def negotiate(accept_encodings):
+    """Pick the encoder the client rates highest; ties go to the server's preference"""
+    best, best_quality = None, 0
+    for encoder in available_encoders():
+        quality = accept_encodings[encoder.name]
+        if quality > best_quality:
+            best, best_quality = encoder, quality
+    return best
+
+
+def compress_body(encoder, data):
+    compressor = encoder()
+    return compressor.compress(data) + compressor.finish()
+
+
+def _compress_stream(compressor, chunks):
+    """Compress a streamed body chunk by chunk, flushing so each chunk reaches the client"""
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if not chunk:
+                continue
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def _min_bytes():
+    return int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+
+
+def _compressible(response):
+    if request.method == 'HEAD' or not request.path.startswith('/api/'):
+        return False
+    if request.blueprint in SKIPPED_BLUEPRINTS or response.direct_passthrough:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers or 'no-transform' in response.headers.get('Cache-Control', ''):
+        return False
+    return (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+
+
+def _compress_response(response):
+    if not _compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoder = negotiate(request.accept_encodings)
+    if encoder is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(encoder(), response.response)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < _min_bytes():
+            return response
+        response.set_data(compress_body(encoder, data))
+
+    response.headers['Content-Encoding'] = encoder.name
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The encoded bytes differ from the identity representation
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Compress /api responses with the best encoding the client accepts (COMPRESSION=off disables)"""
+    if os.environ.get('COMPRESSION', 'on') == 'off':
+        return
+    app.after_request(_compress_response)
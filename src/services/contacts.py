@@ -0,0 +1,63 @@
+from sqlalchemy import bindparam, select, update
+from src.models.base import db
+from src.models.patient import Patient, normalize_email, normalize_phone
+from src.services.audit import record_changes
+from src.services.jobs import job_handler
+
+
+def backfill_contact_columns(batch_size=1000):
+    """Fill phone_normalized/email_normalized for rows written before they existed
+
+    Walks the table by id in batches, each in its own short transaction.
+    Returns the number of rows updated.
+    """
+    table = Patient.__table__
+    statement = update(table).where(table.c.id == bindparam('row_id')).values(
+        phone_normalized=bindparam('phone_value'), email_normalized=bindparam('email_value')
+    )
+    updated = 0
+    last_id = 0
+    while True:
+        with db.engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.phone, table.c.email, table.c.phone_normalized, table.c.email_normalized)
+                .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            stale = [
+                row for row in rows
+                if (row.phone_normalized, row.email_normalized) != (normalize_phone(row.phone), normalize_email(row.email))
+            ]
+            if stale:
+                conn.execute(statement, [
+                    {'row_id': row.id, 'phone_value': normalize_phone(row.phone), 'email_value': normalize_email(row.email)}
+                    for row in stale
+                ])
+        record_changes('patient', 'update', {row.id: _contact_changes(row) for row in stale})
+        updated += len(stale)
+    return updated
+
+
+def _contact_changes(row):
+    changes = {}
+    for column, value in (('phone_normalized', normalize_phone(row.phone)), ('email_normalized', normalize_email(row.email))):
+        if getattr(row, column) != value:
+            changes[column] = [getattr(row, column), value]
+    return changes
+
+
+@job_handler('backfill_contact_columns')
+def backfill_contact_columns_job(payload):
+    """Run the normalized phone/email backfill from the background worker"""
+    return {'updated': backfill_contact_columns()}
+
+
+def init_contacts(app):
+    """Register `flask backfill-contacts`"""
+
+    @app.cli.command('backfill-contacts')
+    def backfill_contacts_command():
+        """Recompute normalized phone/email lookup columns of all patients"""
+        print(f"☎️  Normalized contact details of {backfill_contact_columns()} patients")
@@ -0,0 +1,339 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from difflib import SequenceMatcher
+import click
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session, aliased
+from src.models.appointment import Appointment
+from src.models.archive import ArchivedAppointment
+from src.models.attachment import Attachment
+from src.models.base import db
+from src.models.blocking_key import PatientBlockingKey
+from src.models.patient import Patient, normalize_email, normalize_phone
+from src.services.audit import record_changes
+from src.services.jobs import enqueue, job_handler
+
+KEYED_ATTRIBUTES = ('first_name', 'last_name', 'phone', 'email', 'date_of_birth', 'deleted_at')
+# Fields copied onto the surviving record when it has no value of its own
+MERGED_FIELDS = (
+    'email', 'date_of_birth', 'address', 'medical_history', 'insurance_provider', 'insurance_id',
+    'emergency_contact_name', 'emergency_contact_phone'
+)
+MATCH_THRESHOLD = 0.6
+MAX_BLOCK_SIZE = 50  # keys shared by more patients (placeholder phones etc.) say nothing
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('BFPV', '1'), **dict.fromkeys('CGJKQSXZ', '2'), **dict.fromkeys('DT', '3'),
+    'L': '4', **dict.fromkeys('MN', '5'), 'R': '6'
+}
+
+
+def soundex(name):
+    """American Soundex code (e.g. Robert -> R163), or None for names without letters"""
+    letters = re.sub(r'[^A-Z]', '', (name or '').upper())
+    if not letters:
+        return None
+    code = letters[0]
+    previous = _SOUNDEX_CODES.get(letters[0])
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter)
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W do not separate letters with the same code; vowels do
+        if letter not in 'HW':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def blocking_keys(first_name, last_name, phone, email, date_of_birth):
+    """Keys under which a patient is filed; sharing any one makes two patients candidates"""
+    keys = set()
+    phone = normalize_phone(phone)
+    if phone:
+        keys.add(f'phone:{phone}')
+    email = normalize_email(email)
+    if email:
+        keys.add(f'email:{email}')
+    last = soundex(last_name)
+    if last and date_of_birth:
+        keys.add(f'sdx_dob:{last}|{date_of_birth.isoformat()}')
+    first = soundex(first_name)
+    if last and first:
+        keys.add(f'sdx_name:{last}|{first}')
+    return keys
+
+
+def _keys_for(patient):
+    if patient.deleted_at is not None:
+        return set()
+    return blocking_keys(patient.first_name, patient.last_name, patient.phone, patient.email, patient.date_of_birth)
+
+
+def _after_flush(session, flush_context):
+    changed = {}
+    for obj in session.new:
+        if isinstance(obj, Patient):
+            changed[obj.id] = _keys_for(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Patient) and any(
+            getattr(inspect(obj).attrs, attribute).history.has_changes() for attribute in KEYED_ATTRIBUTES
+        ):
+            changed[obj.id] = _keys_for(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Patient):
+            changed[obj.id] = set()
+    if not changed:
+        return
+
+    conn = session.connection()
+    conn.execute(delete(PatientBlockingKey.__table__).where(PatientBlockingKey.patient_id.in_(list(changed))))
+    rows = [{'patient_id': patient_id, 'key': key} for patient_id, keys in changed.items() for key in keys]
+    if rows:
+        conn.execute(insert(PatientBlockingKey.__table__), rows)
+
+
+def _similarity(a, b):
+    a, b = (a or '').strip().lower(), (b or '').strip().lower()
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def score_pair(a, b):
+    """Match score in [0, 1] of two patient-like objects, with the evidence behind it"""
+    score = 0.0
+    reasons = []
+
+    phone_a, phone_b = normalize_phone(a.phone), normalize_phone(b.phone)
+    if phone_a and phone_a == phone_b:
+        score += 0.3
+        reasons.append('same phone')
+    email_a, email_b = normalize_email(a.email), normalize_email(b.email)
+    if email_a and email_a == email_b:
+        score += 0.3
+        reasons.append('same email')
+
+    if a.date_of_birth and b.date_of_birth:
+        if a.date_of_birth == b.date_of_birth:
+            score += 0.2
+            reasons.append('same date of birth')
+        else:
+            # Different birthdays are strong evidence of different people (e.g. family members)
+            score -= 0.3
+            reasons.append('different date of birth')
+
+    last = _similarity(a.last_name, b.last_name)
+    if last < 0.85 and soundex(a.last_name) and soundex(a.last_name) == soundex(b.last_name):
+        last = 0.85
+    score += 0.2 * last
+    first = _similarity(a.first_name, b.first_name)
+    score += 0.2 * first
+    if last >= 0.85 and first >= 0.85:
+        reasons.append('similar name')
+
+    return round(max(0.0, min(score, 1.0)), 3), reasons
+
+
+def _match(patient, candidate):
+    score, reasons = score_pair(patient, candidate)
+    return {'patient': candidate.to_dict(), 'score': score, 'reasons': reasons}
+
+
+def find_matches(patient, threshold=MATCH_THRESHOLD, limit=20):
+    """Existing patients likely to be the same person as `patient` (a Patient or any object
+    with first_name, last_name, phone, email and date_of_birth), best first"""
+    keys = blocking_keys(patient.first_name, patient.last_name, patient.phone, patient.email, patient.date_of_birth)
+    if not keys:
+        return []
+    query = db.session.query(PatientBlockingKey.patient_id).filter(PatientBlockingKey.key.in_(keys)).distinct()
+    if getattr(patient, 'id', None):
+        query = query.filter(PatientBlockingKey.patient_id != patient.id)
+    candidate_ids = [row.patient_id for row in query.limit(limit * 10).all()]
+    if not candidate_ids:
+        return []
+    candidates = Patient.query.filter(Patient.id.in_(candidate_ids), Patient.not_deleted()).all()
+    matches = [_match(patient, candidate) for candidate in candidates]
+    matches = [match for match in matches if match['score'] >= threshold]
+    matches.sort(key=lambda match: match['score'], reverse=True)
+    return matches[:limit]
+
+
+class MergeError(ValueError):
+    pass
+
+
+def merge_patients(survivor_id, duplicate_id):
+    """Fold the duplicate into the survivor and soft-delete the duplicate
+
+    Appointments (including archived ones) and attachments are re-pointed to the survivor
+    and empty fields of the survivor are filled from the duplicate. Runs in
+    the caller's session; the caller commits.
+    """
+    if survivor_id == duplicate_id:
+        raise MergeError('Cannot merge a patient into itself')
+    survivor = Patient.query.filter(Patient.id == survivor_id, Patient.not_deleted()).first()
+    duplicate = Patient.query.filter(Patient.id == duplicate_id, Patient.not_deleted()).first()
+    if survivor is None or duplicate is None:
+        raise MergeError('Both patients must exist and not be deleted')
+
+    # Through the ORM so audit, change feed and sync see every moved appointment and attachment
+    moved = 0
+    for appointment in Appointment.query.filter(Appointment.patient_id == duplicate.id).all():
+        appointment.patient_id = survivor.id
+        moved += 1
+    attachments = 0
+    for attachment in Attachment.query.filter(Attachment.patient_id == duplicate.id).all():
+        attachment.patient_id = survivor.id
+        attachments += 1
+    # Archived rows have no ORM hooks: one UPDATE, logged under their appointment ids
+    archived_ids = db.session.execute(
+        select(ArchivedAppointment.id).where(ArchivedAppointment.patient_id == duplicate.id)
+    ).scalars().all()
+    if archived_ids:
+        db.session.execute(
+            update(ArchivedAppointment).where(ArchivedAppointment.id.in_(archived_ids))
+            .values(patient_id=survivor.id)
+        )
+        record_changes('appointment', 'update', {
+            archived_id: {'patient_id': [duplicate.id, survivor.id]} for archived_id in archived_ids
+        }, session=db.session)
+
+    for field in MERGED_FIELDS:
+        if not getattr(survivor, field) and getattr(duplicate, field):
+            setattr(survivor, field, getattr(duplicate, field))
+    note = f'Merged duplicate record #{duplicate.id} on {datetime.utcnow().date().isoformat()}'
+    survivor.notes = f'{survivor.notes}\n{note}' if survivor.notes else note
+    if duplicate.notes:
+        survivor.notes += f'\n{duplicate.notes}'
+    duplicate.deleted_at = datetime.utcnow()
+    return {
+        'survivor': survivor,
+        'appointments_moved': moved,
+        'archived_appointments_moved': len(archived_ids),
+        'attachments_moved': attachments
+    }
+
+
+def _candidate_pairs(conn, low, high):
+    """Distinct (a, b) patient pairs with a < b sharing a usable key, for a in [low, high)"""
+    left = aliased(PatientBlockingKey)
+    right = aliased(PatientBlockingKey)
+    usable = select(PatientBlockingKey.key).group_by(PatientBlockingKey.key).having(
+        func.count() <= MAX_BLOCK_SIZE
+    )
+    return conn.execute(
+        select(left.patient_id, right.patient_id).distinct().join(
+            right, (left.key == right.key) & (left.patient_id < right.patient_id)
+        ).where(left.patient_id >= low, left.patient_id < high, left.key.in_(usable))
+    ).all()
+
+
+def _scan_chunk(app, low, high, threshold):
+    with app.app_context():
+        with db.engine.connect() as conn:
+            pairs = _candidate_pairs(conn, low, high)
+            if not pairs:
+                return []
+            ids = {patient_id for pair in pairs for patient_id in pair}
+            patients = {
+                patient.id: patient
+                for patient in conn.execute(select(Patient).where(Patient.id.in_(ids), Patient.deleted_at.is_(None)))
+            }
+        results = []
+        for a, b in pairs:
+            if a in patients and b in patients:
+                score, reasons = score_pair(patients[a], patients[b])
+                if score >= threshold:
+                    results.append({'patient_id': a, 'duplicate_id': b, 'score': score, 'reasons': reasons})
+        return results
+
+
+def scan_duplicates(app, threshold=MATCH_THRESHOLD, chunk_size=2000, workers=4, limit=1000):
+    """Scan the whole patient table for likely duplicate pairs, best first
+
+    The id range is split into chunks scanned in parallel; each chunk joins
+    the blocking-key index against itself, so work grows with block sizes
+    rather than with the square of the table.
+    """
+    with app.app_context():
+        max_id = db.session.query(func.max(Patient.id)).scalar() or 0
+    ranges = [(low, low + chunk_size) for low in range(1, max_id + 1, chunk_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        chunks = pool.map(lambda bounds: _scan_chunk(app, bounds[0], bounds[1], threshold), ranges)
+        pairs = [pair for chunk in chunks for pair in chunk]
+    pairs.sort(key=lambda pair: pair['score'], reverse=True)
+    return {'pairs_found': len(pairs), 'pairs': pairs[:limit]}
+
+
+def rebuild_blocking_keys(batch_size=1000):
+    """Recompute the blocking keys of every patient"""
+    table = PatientBlockingKey.__table__
+    with db.engine.begin() as conn:
+        conn.execute(delete(table))
+        last_id = 0
+        while True:
+            patients = conn.execute(
+                select(Patient.id, Patient.first_name, Patient.last_name, Patient.phone, Patient.email,
+                       Patient.date_of_birth)
+                .where(Patient.id > last_id, Patient.deleted_at.is_(None))
+                .order_by(Patient.id).limit(batch_size)
+            ).all()
+            if not patients:
+                break
+            rows = [
+                {'patient_id': patient.id, 'key': key}
+                for patient in patients
+                for key in blocking_keys(patient.first_name, patient.last_name, patient.phone,
+                                         patient.email, patient.date_of_birth)
+            ]
+            if rows:
+                conn.execute(insert(table), rows)
+            last_id = patients[-1].id
+    return db.session.query(func.count(PatientBlockingKey.id)).scalar()
+
+
+def ensure_blocking_keys():
+    """Queue a key rebuild when patients exist but the index is empty (first deploy)"""
+    if db.session.query(PatientBlockingKey.id).first() is not None:
+        return None
+    if db.session.query(Patient.id).first() is None:
+        return None
+    return enqueue('rebuild_blocking_keys', dedupe_key='rebuild_blocking_keys')
+
+
+@job_handler('rebuild_blocking_keys')
+def rebuild_blocking_keys_job(payload):
+    """Rebuild the duplicate-detection index from the background worker"""
+    return {'keys': rebuild_blocking_keys()}
+
+
+@job_handler('scan_duplicates')
+def scan_duplicates_job(payload):
+    """Scan for duplicate patients from the background worker"""
+    from flask import current_app
+    return scan_duplicates(current_app._get_current_object(),
+                           threshold=float(payload.get('threshold', MATCH_THRESHOLD)))
+
+
+def init_dedup(app):
+    """Keep the blocking keys in step with patient changes and register the CLI commands"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+
+    @app.cli.command('rebuild-blocking-keys')
+    def rebuild_blocking_keys_command():
+        """Recompute the duplicate-detection index of all patients"""
+        print(f"🔎 Indexed {rebuild_blocking_keys()} patient blocking keys")
+
+    @app.cli.command('scan-duplicates')
+    @click.option('--threshold', type=float, default=MATCH_THRESHOLD, help='Minimum match score')
+    @click.option('--workers', type=int, default=4, help='Chunks scanned in parallel')
+    def scan_duplicates_command(threshold, workers):
+        """List likely duplicate patient pairs"""
+        result = scan_duplicates(app, threshold=threshold, workers=workers)
+        for pair in result['pairs']:
+            print(f"{pair['patient_id']}\t{pair['duplicate_id']}\t{pair['score']}\t{', '.join(pair['reasons'])}")
+        print(f"🔎 {result['pairs_found']} likely duplicate pairs")
@@ -0,0 +1,213 @@
+import json
+import os
+import select
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from src.models.base import db
+
+CHANNEL = 'dental_changes'
+BUFFER_SIZE = 1000
+
+_broker = None
+
+
+class ChangeBroker:
+    """In-process fan-out of change events with a replay buffer for resuming clients
+
+    Event ids are "<epoch>-<seq>"; the epoch changes on every process start, so
+    a client resuming with an id this process never issued is told to reset
+    (re-fetch) instead of silently missing events.
+    """
+
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._callbacks = []
+
+    def publish(self, events):
+        self._deliver(events)
+
+    def _deliver(self, events):
+        with self._condition:
+            for payload in events:
+                self._seq += 1
+                self._buffer.append((self._seq, payload))
+            self._condition.notify_all()
+        for callback in list(self._callbacks):
+            for payload in events:
+                try:
+                    callback(payload)
+                except Exception as e:
+                    print(f"Error in change event subscriber: {str(e)}")
+
+    def subscribe(self, callback):
+        """Call callback(event) in-process for every change (e.g. cache invalidation)"""
+        self._callbacks.append(callback)
+
+    def event_id(self, seq):
+        return f'{self.epoch}-{seq}'
+
+    def _resume_seq(self, last_event_id):
+        """Sequence number to resume after, or None when the client must reset"""
+        if not last_event_id:
+            return self._seq
+        epoch, _, seq = last_event_id.partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        oldest = self._buffer[0][0] if self._buffer else self._seq + 1
+        if seq < oldest - 1 or seq > self._seq:
+            return None
+        return seq
+
+    def listen(self, last_event_id=None, heartbeat=15.0):
+        """Yield (event_id, payload) tuples; payload None means heartbeat, 'reset' means re-fetch"""
+        with self._condition:
+            seq = self._resume_seq(last_event_id)
+            reset = seq is None
+            if reset:
+                seq = self._seq
+        if reset:
+            yield self.event_id(seq), 'reset'
+        while True:
+            # Never yield while holding the lock: the consumer may block on the socket
+            with self._condition:
+                if self._seq == seq:
+                    self._condition.wait(timeout=heartbeat)
+                pending = [(s, payload) for s, payload in self._buffer if s > seq]
+                reset = bool(pending) and pending[0][0] > seq + 1
+                if reset:
+                    # Client fell further behind than the buffer holds
+                    seq = self._seq
+            if reset:
+                yield self.event_id(seq), 'reset'
+            elif not pending:
+                yield None, None
+            else:
+                for s, payload in pending:
+                    seq = s
+                    yield self.event_id(s), payload
+
+
+class PostgresChangeBroker(ChangeBroker):
+    """Fans events out to every worker/host through PostgreSQL LISTEN/NOTIFY"""
+
+    def __init__(self, engine, buffer_size=BUFFER_SIZE):
+        super().__init__(buffer_size)
+        self.engine = engine
+        threading.Thread(target=self._listen_forever, name='change-listener', daemon=True).start()
+
+    def publish(self, events):
+        # Delivered back to this process (and all others) by the listener thread
+        with self.engine.begin() as conn:
+            for payload in events:
+                conn.execute(text('SELECT pg_notify(:channel, :payload)'),
+                             {'channel': CHANNEL, 'payload': json.dumps(payload)})
+
+    def _listen_forever(self):
+        while True:
+            try:
+                raw = self.engine.raw_connection()
+                # A dedicated autocommit connection that never goes back to the pool
+                raw.detach()
+                try:
+                    connection = raw.driver_connection
+                    connection.autocommit = True
+                    connection.cursor().execute(f'LISTEN {CHANNEL}')
+                    while True:
+                        if select.select([connection], [], [], 30) == ([], [], []):
+                            continue
+                        connection.poll()
+                        events = []
+                        while connection.notifies:
+                            events.append(json.loads(connection.notifies.pop(0).payload))
+                        if events:
+                            self._deliver(events)
+                finally:
+                    raw.close()
+            except Exception as e:
+                print(f"Change listener lost its connection, retrying: {str(e)}")
+                time.sleep(5)
+
+
+def _change_payload(obj, action):
+    from src.models.appointment import Appointment
+    from src.models.patient import Patient
+    from src.models.provider import Provider
+    from src.models.treatment import Treatment
+
+    if isinstance(obj, Appointment):
+        payload = {
+            'entity': 'appointment',
+            'patient_id': obj.patient_id,
+            'provider_id': obj.provider_id,
+            'appointment_date': obj.appointment_date.isoformat() if obj.appointment_date else None,
+        }
+    elif isinstance(obj, Patient):
+        payload = {'entity': 'patient'}
+    elif isinstance(obj, Treatment):
+        payload = {'entity': 'treatment'}
+    elif isinstance(obj, Provider):
+        payload = {'entity': 'provider'}
+    else:
+        return None
+    payload.update({'id': obj.id, 'action': action, 'at': datetime.utcnow().isoformat()})
+    return payload
+
+
+def _after_flush(session, flush_context):
+    pending = session.info.setdefault('change_events', [])
+    for objects, action in ((session.new, 'created'), (session.dirty, 'updated'), (session.deleted, 'deleted')):
+        for obj in objects:
+            event_action = action
+            if action == 'updated':
+                if not session.is_modified(obj, include_collections=False):
+                    continue
+                # Soft deletes and restores look like plain updates to the ORM
+                if hasattr(obj, 'deleted_at') and inspect(obj).attrs.deleted_at.history.added:
+                    event_action = 'deleted' if obj.deleted_at else 'created'
+            payload = _change_payload(obj, event_action)
+            if payload is not None:
+                pending.append(payload)
+
+
+def _after_commit(session):
+    pending = session.info.pop('change_events', None)
+    if pending and _broker is not None:
+        try:
+            _broker.publish(pending)
+        except Exception as e:
+            print(f"Error publishing change events: {str(e)}")
+
+
+def _after_rollback(session):
+    session.info.pop('change_events', None)
+
+
+def get_broker():
+    return _broker
+
+
+def init_events(app):
+    """Create the change broker (LISTEN/NOTIFY on PostgreSQL) and hook ORM commits"""
+    global _broker
+    if _broker is not None:
+        return _broker
+    with app.app_context():
+        engine = db.engine
+    backend = os.environ.get('CHANGE_FEED_BACKEND', 'auto')
+    if backend == 'postgres' or (backend == 'auto' and engine.dialect.name == 'postgresql'):
+        _broker = PostgresChangeBroker(engine)
+    else:
+        _broker = ChangeBroker()
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _after_rollback)
+    return _broker
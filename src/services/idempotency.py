@@ -0,0 +1,173 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import Response, current_app, jsonify, request
+from flask_login import current_user
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.base import db
+from src.models.idempotency import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+_table = IdempotencyKey.__table__
+
+
+def _ttl():
+    return timedelta(hours=float(os.environ.get('IDEMPOTENCY_TTL_HOURS', 24)))
+
+
+def _lock_timeout():
+    # A 'processing' key older than this belongs to a crashed request and is taken over
+    return timedelta(seconds=float(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60)))
+
+
+def _wait_seconds():
+    return float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 10))
+
+
+def _request_hash():
+    digest = hashlib.sha256(f'{request.method} {request.full_path}\n'.encode())
+    if request.is_json:
+        digest.update(request.get_data(cache=True))
+    # Uploads are identified by their URL only: reading them here would consume the stream
+    return digest.hexdigest()
+
+
+def _claim(conn, user_id, key, request_hash, now):
+    """Insert the key as 'processing'; True if this request now owns it"""
+    dialect = postgresql if conn.dialect.name == 'postgresql' else sqlite
+    result = conn.execute(dialect.insert(_table).values(
+        user_id=user_id, key=key, request_hash=request_hash, status='processing',
+        created_at=now, expires_at=now + _ttl()
+    ).on_conflict_do_nothing(index_elements=['user_id', 'key']))
+    return result.rowcount == 1
+
+
+def _take_over(conn, row, request_hash, now):
+    """Compare-and-set a stale 'processing' key (or an expired one) to this request"""
+    stale = (
+        (row.status == 'processing' and row.created_at < now - _lock_timeout())
+        or row.expires_at <= now
+    )
+    if not stale:
+        return False
+    result = conn.execute(update(_table).where(
+        _table.c.user_id == row.user_id, _table.c.key == row.key, _table.c.created_at == row.created_at
+    ).values(
+        request_hash=request_hash, status='processing',
+        response_status=None, response_body=None, response_content_type=None,
+        created_at=now, expires_at=now + _ttl()
+    ))
+    return result.rowcount == 1
+
+
+def _replay(row):
+    response = Response(row.response_body, status=row.response_status, content_type=row.response_content_type)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _acquire(user_id, key, request_hash):
+    """Own the key, or return the response to send instead (replay, mismatch or still busy)"""
+    deadline = time.monotonic() + _wait_seconds()
+    delay = 0.02
+    while True:
+        now = datetime.utcnow()
+        with db.engine.begin() as conn:
+            if _claim(conn, user_id, key, request_hash, now):
+                return None
+            row = conn.execute(
+                select(_table).where(_table.c.user_id == user_id, _table.c.key == key)
+            ).first()
+            if row is None:
+                continue  # swept between the insert and the read
+            if row.expires_at > now and row.request_hash != request_hash:
+                return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+            if row.status == 'completed' and row.expires_at > now:
+                return _replay(row)
+            if _take_over(conn, row, request_hash, now):
+                return None
+        # Another request with this key is in flight: wait for its outcome instead of racing it
+        if time.monotonic() >= deadline:
+            response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+            response.headers['Retry-After'] = '1'
+            return response, 409
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def _release(user_id, key, response):
+    """Store a final response for replay, or forget the key so the client can retry"""
+    with db.engine.begin() as conn:
+        where = (_table.c.user_id == user_id) & (_table.c.key == key)
+        if response is None or response.status_code >= 500 or response.is_streamed:
+            conn.execute(delete(_table).where(where))
+        else:
+            now = datetime.utcnow()
+            conn.execute(update(_table).where(where).values(
+                status='completed',
+                response_status=response.status_code,
+                response_body=response.get_data(),
+                response_content_type=response.content_type,
+                expires_at=now + _ttl()
+            ))
+
+
+def idempotent(view):
+    """Make a create/update view safe to retry with an Idempotency-Key header
+
+    The first request runs the view; retries with the same key (per user)
+    get its stored response back without running the view again, and
+    concurrent duplicates wait for the first one to finish. Server errors
+    are not stored, so those can be retried for real.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        user_id = current_user.id
+        outcome = _acquire(user_id, key, _request_hash())
+        if outcome is not None:
+            return outcome
+
+        response = None
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+            return response
+        finally:
+            _release(user_id, key, response)
+    return wrapper
+
+
+def sweep_idempotency_keys():
+    with db.engine.begin() as conn:
+        return conn.execute(delete(_table).where(_table.c.expires_at <= datetime.utcnow())).rowcount
+
+
+def init_idempotency(app):
+    """Periodically drop expired idempotency keys"""
+    interval = int(os.environ.get('IDEMPOTENCY_SWEEP_INTERVAL', 600))
+    if interval > 0:
+        threading.Thread(target=_sweep_forever, args=(app, interval),
+                         name='idempotency-sweeper', daemon=True).start()
+
+
+def _sweep_forever(app, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with app.app_context():
+                removed = sweep_idempotency_keys()
+            if removed:
+                print(f"Removed {removed} expired idempotency keys")
+        except Exception as e:
+            print(f"Error sweeping idempotency keys: {str(e)}")
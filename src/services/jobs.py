@@ -0,0 +1,178 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+from src.models.base import db
+from src.models.job import Job
+
+HANDLERS = {}
+
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 3600
+
+
+def job_handler(kind):
+    """Register fn(payload) -> JSON-serializable result as the handler for a job kind"""
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+def _result_ttl():
+    return timedelta(seconds=int(os.environ.get('JOB_RESULT_TTL', 3600)))
+
+
+def _lock_timeout():
+    # A running job older than this is assumed to belong to a dead worker
+    return timedelta(seconds=int(os.environ.get('JOB_LOCK_TIMEOUT', 900)))
+
+
+def enqueue(kind, payload=None, max_attempts=5, run_at=None, dedupe_key=None):
+    """Queue a job, reusing a pending or recently finished one with the same dedupe_key
+
+    The job is written and committed in its own session on the primary, so
+    it is queued at once whatever becomes of the caller's transaction, and
+    the caller's pending changes are neither committed nor rolled back here.
+    The returned Job is detached, with its columns loaded. On SQLite, do not
+    call this while the caller's session has flushed writes: the job's
+    insert would wait for the caller's own write lock.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f'No handler registered for job kind {kind}')
+
+    with Session(db.engine, expire_on_commit=False) as session:
+        if dedupe_key:
+            existing = session.execute(
+                select(Job).where(
+                    Job.dedupe_key == dedupe_key,
+                    or_(
+                        Job.status.in_(('queued', 'running')),
+                        db.and_(Job.status == 'succeeded', Job.finished_at >= datetime.utcnow() - _result_ttl())
+                    )
+                ).order_by(Job.id.desc()).limit(1)
+            ).scalar_one_or_none()
+            if existing:
+                return existing
+
+        job = Job(
+            kind=kind,
+            payload=json.dumps(payload or {}),
+            max_attempts=max_attempts,
+            run_at=run_at or datetime.utcnow(),
+            dedupe_key=dedupe_key
+        )
+        session.add(job)
+        session.commit()
+        return job
+
+
+def claim_next(worker_id):
+    """Atomically take the next due job, or return None
+
+    PostgreSQL uses SELECT ... FOR UPDATE SKIP LOCKED so workers never wait on
+    each other; SQLite has no row locks, so the claim is a compare-and-set
+    UPDATE serialized by the database write lock.
+    """
+    now = datetime.utcnow()
+    due = or_(
+        db.and_(Job.status == 'queued', Job.run_at <= now),
+        db.and_(Job.status == 'running', Job.locked_at < now - _lock_timeout())
+    )
+    claim = {'status': 'running', 'locked_at': now, 'locked_by': worker_id, 'attempts': Job.attempts + 1}
+
+    if db.engine.dialect.name == 'postgresql':
+        job = db.session.execute(
+            select(Job).where(due).order_by(Job.run_at, Job.id).limit(1).with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if job is None:
+            db.session.rollback()
+            return None
+        db.session.execute(update(Job).where(Job.id == job.id).values(**claim))
+        db.session.commit()
+        return Job.query.get(job.id)
+
+    for job_id in db.session.execute(
+        select(Job.id).where(due).order_by(Job.run_at, Job.id).limit(5)
+    ).scalars().all():
+        claimed = db.session.execute(update(Job).where(Job.id == job_id, due).values(**claim))
+        db.session.commit()
+        if claimed.rowcount == 1:
+            return Job.query.get(job_id)
+    db.session.rollback()
+    return None
+
+
+def _heartbeat(engine, job_id, worker_id, stop):
+    """Refresh a running job's locked_at until stop is set, so a long handler is not claimed twice"""
+    interval = _lock_timeout().total_seconds() / 3
+    while not stop.wait(interval):
+        try:
+            with engine.begin() as conn:
+                conn.execute(update(Job).where(
+                    Job.id == job_id, Job.locked_by == worker_id, Job.status == 'running'
+                ).values(locked_at=datetime.utcnow()))
+        except Exception as e:
+            print(f"Error refreshing the lock of job {job_id}: {str(e)}")
+
+
+def run_job(job):
+    """Execute a claimed job and record its outcome (with retry backoff on failure)"""
+    handler = HANDLERS.get(job.kind)
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(db.engine, job.id, job.locked_by, stop),
+                     name=f'job-{job.id}-heartbeat', daemon=True).start()
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {job.kind}')
+        result = handler(json.loads(job.payload or '{}'))
+        job.result = json.dumps(result)
+        job.status = 'succeeded'
+        job.error = None
+        job.finished_at = datetime.utcnow()
+    except Exception as e:
+        db.session.rollback()
+        job = Job.query.get(job.id)
+        job.error = str(e)
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        else:
+            delay = min(BACKOFF_BASE_SECONDS * 2 ** (job.attempts - 1), BACKOFF_MAX_SECONDS)
+            job.status = 'queued'
+            job.run_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+        print(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}: {str(e)}")
+    finally:
+        stop.set()
+    job.locked_at = None
+    job.locked_by = None
+    db.session.commit()
+    return job
+
+
+def run_worker(app, poll_interval=None, once=False):
+    """Process jobs until interrupted (or until the queue is empty when once=True)"""
+    poll_interval = poll_interval or float(os.environ.get('JOB_POLL_INTERVAL', 2))
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    print(f"👷 Job worker {worker_id} started ({', '.join(sorted(HANDLERS))})")
+    while True:
+        with app.app_context():
+            try:
+                job = claim_next(worker_id)
+                if job is not None:
+                    run_job(job)
+            except Exception as e:
+                db.session.rollback()
+                job = None
+                print(f"Error in job worker loop: {str(e)}")
+            finally:
+                db.session.remove()
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
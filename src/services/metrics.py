@@ -0,0 +1,167 @@
+import os
+import time
+from flask import g, request
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+# List endpoints whose payload size grows with the practice and is worth tracking
+SIZED_ENDPOINTS = {
+    'patient.get_patients',
+    'appointment.get_appointments',
+}
+
+REQUEST_LATENCY = Histogram(
+    'dental_http_request_duration_seconds',
+    'Request latency by blueprint and endpoint',
+    ['blueprint', 'endpoint', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUEST_COUNT = Counter(
+    'dental_http_requests_total',
+    'Requests by blueprint, endpoint and status code',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'dental_http_requests_in_flight',
+    'Requests currently being handled',
+    multiprocess_mode='livesum'
+)
+RESPONSE_SIZE = Histogram(
+    'dental_http_response_size_bytes',
+    'Response body size of the large list endpoints',
+    ['endpoint'],
+    buckets=(1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7)
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'dental_db_pool_checked_out',
+    'Database connections currently checked out of the pool',
+    ['bind'],
+    multiprocess_mode='livesum'
+)
+DB_POOL_OVERFLOW = Gauge(
+    'dental_db_pool_overflow',
+    'Connections opened beyond the configured pool size',
+    ['bind'],
+    multiprocess_mode='livesum'
+)
+DB_POOL_SIZE = Gauge(
+    'dental_db_pool_size',
+    'Configured pool size',
+    ['bind'],
+    multiprocess_mode='livesum'
+)
+DB_REPLICA_LAG = Gauge(
+    'dental_db_replica_lag_seconds',
+    'Replication lag of each read replica at the last check',
+    ['bind'],
+    multiprocess_mode='max'
+)
+DB_REPLICA_HEALTHY = Gauge(
+    'dental_db_replica_healthy',
+    'Whether a read replica is serving reads (1) or bypassed for lag or errors (0)',
+    ['bind'],
+    multiprocess_mode='min'
+)
+DB_READ_ROUTING = Counter(
+    'dental_db_read_requests_total',
+    'GET requests by the bind serving their reads',
+    ['bind']
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    'dental_admission_in_flight',
+    'Admitted requests currently running, by cost class',
+    ['cost_class'],
+    multiprocess_mode='livesum'
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'dental_admission_queue_depth',
+    'Requests waiting for a slot, by cost class',
+    ['cost_class'],
+    multiprocess_mode='livesum'
+)
+ADMISSION_SHED = Counter(
+    'dental_admission_shed_total',
+    'Requests rejected by admission control (queue_full, timeout, range)',
+    ['cost_class', 'reason']
+)
+ADMISSION_WAIT = Histogram(
+    'dental_admission_wait_seconds',
+    'Time queued requests waited for a slot',
+    ['cost_class'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+)
+CALENDAR_FEED_CACHE = Counter(
+    'dental_calendar_feed_cache_total',
+    'Calendar feed requests served from the rendered-feed cache (hit) or rendered (miss)',
+    ['result']
+)
+BCRYPT_VERIFY_SECONDS = Histogram(
+    'dental_bcrypt_verify_duration_seconds',
+    'Time spent verifying bcrypt password hashes',
+    buckets=(0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2)
+)
+
+
+def init_metrics(app):
+    """Register the request hooks that feed the metrics"""
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_finish_request)
+
+
+def render_metrics():
+    """Render all metrics in the Prometheus text exposition format"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # Aggregate the values written by every gunicorn worker
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def _start_request():
+    g._metrics_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+    _sample_pool()
+
+
+def _record_response(response):
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_COUNT.labels(
+        request.blueprint or 'app', endpoint, request.method, str(response.status_code)
+    ).inc()
+    if endpoint in SIZED_ENDPOINTS and not response.is_streamed:
+        RESPONSE_SIZE.labels(endpoint).observe(response.calculate_content_length() or 0)
+    return response
+
+
+def _finish_request(exc=None):
+    start = g.pop('_metrics_start', None)
+    if start is None:
+        return
+    REQUESTS_IN_FLIGHT.dec()
+    REQUEST_LATENCY.labels(
+        request.blueprint or 'app', request.endpoint or 'unmatched', request.method
+    ).observe(time.perf_counter() - start)
+
+
+def _sample_pool():
+    """Record pool saturation for every configured engine"""
+    from src.models.base import db
+
+    try:
+        engines = db.engines
+    except RuntimeError:
+        return
+    for bind, engine in engines.items():
+        pool = engine.pool
+        if not hasattr(pool, 'checkedout'):
+            # SQLite in-memory/static pools have no saturation to report
+            continue
+        label = bind or 'default'
+        DB_POOL_CHECKED_OUT.labels(label).set(pool.checkedout())
+        DB_POOL_OVERFLOW.labels(label).set(max(pool.overflow(), 0))
+        DB_POOL_SIZE.labels(label).set(pool.size())
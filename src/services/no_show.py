@@ -0,0 +1,176 @@
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from src.models.appointment import Appointment
+from src.models.patient import Patient
+from src.models.base import db
+from src.services.analytics import get_snapshot, weekday_hour
+
+SLOTS = 7 * 24  # weekday x hour
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _prior_weight(name, default):
+    # Pseudo-observations pulling a sparse estimate towards the level above it
+    return float(os.environ.get(name, default))
+
+
+class NoShowModel:
+    """No-show counts per patient and per weekday x hour x treatment slot
+
+    Only appointments with a known outcome (completed or no-show) count. The
+    counts are maintained from the snapshot's change deltas, so a refresh
+    costs time proportional to the rows that changed, not to all history.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.completed = snapshot.statuses.encode('completed')
+        self.no_show = snapshot.statuses.encode('no-show')
+        self.patient_total = np.zeros(1, np.int64)
+        self.patient_no_shows = np.zeros(1, np.int64)
+        self.slot_total = np.zeros((SLOTS, 1), np.int64)
+        self.slot_no_shows = np.zeros((SLOTS, 1), np.int64)
+        snapshot.add_listener(self._apply)
+
+    def _apply(self, old, new):
+        if old is not None:
+            self._count(old, -1)
+        self._count(new, 1)
+
+    def _count(self, rows, sign):
+        outcome = rows['live'] & ((rows['status'] == self.completed) | (rows['status'] == self.no_show))
+        if not outcome.any():
+            return
+        patient_ids = rows['patient_id'][outcome]
+        treatments = rows['treatment'][outcome].astype(np.int64)
+        no_shows = (rows['status'][outcome] == self.no_show).astype(np.int64) * sign
+        weekday, hour = weekday_hour(rows['start'][outcome])
+        slots = weekday * 24 + hour
+
+        self._grow(int(patient_ids.max()) + 1, int(treatments.max()) + 1)
+        np.add.at(self.patient_total, patient_ids, sign)
+        np.add.at(self.patient_no_shows, patient_ids, no_shows)
+        np.add.at(self.slot_total, (slots, treatments), sign)
+        np.add.at(self.slot_no_shows, (slots, treatments), no_shows)
+
+    def _grow(self, patients, treatments):
+        if patients > len(self.patient_total):
+            extra = max(patients, len(self.patient_total) * 2) - len(self.patient_total)
+            self.patient_total = np.pad(self.patient_total, (0, extra))
+            self.patient_no_shows = np.pad(self.patient_no_shows, (0, extra))
+        if treatments > self.slot_total.shape[1]:
+            extra = treatments - self.slot_total.shape[1]
+            self.slot_total = np.pad(self.slot_total, ((0, 0), (0, extra)))
+            self.slot_no_shows = np.pad(self.slot_no_shows, ((0, 0), (0, extra)))
+
+    def risk(self, patient_ids, starts, treatments):
+        """Smoothed no-show probabilities for the given appointments
+
+        Each level is a Beta-Binomial estimate shrunk towards the one above:
+        overall rate -> weekday/hour -> weekday/hour/treatment -> patient.
+        Returns (risk, slot_rate, patient_total, patient_no_shows, overall_rate).
+        """
+        with self.snapshot.lock:
+            total = self.slot_total.sum()
+            no_shows = self.slot_no_shows.sum()
+            # Laplace prior until there is any history at all
+            overall = (no_shows + 1) / (total + 2)
+
+            weekday, hour = weekday_hour(starts)
+            slots = weekday * 24 + hour
+            hour_total = self.slot_total.sum(axis=1)[slots]
+            hour_no_shows = self.slot_no_shows.sum(axis=1)[slots]
+            weight = _prior_weight('NO_SHOW_SLOT_PRIOR', 20)
+            hour_rate = (hour_no_shows + weight * overall) / (hour_total + weight)
+
+            known = treatments < self.slot_total.shape[1]
+            codes = np.where(known, treatments, 0)
+            slot_total = np.where(known, self.slot_total[slots, codes], 0)
+            slot_no_shows = np.where(known, self.slot_no_shows[slots, codes], 0)
+            slot_rate = (slot_no_shows + weight * hour_rate) / (slot_total + weight)
+
+            known = patient_ids < len(self.patient_total)
+            ids = np.where(known, patient_ids, 0)
+            patient_total = np.where(known, self.patient_total[ids], 0)
+            patient_no_shows = np.where(known, self.patient_no_shows[ids], 0)
+            weight = _prior_weight('NO_SHOW_PATIENT_PRIOR', 5)
+            risk = (patient_no_shows + weight * slot_rate) / (patient_total + weight)
+            return risk, slot_rate, patient_total, patient_no_shows, float(overall)
+
+
+def get_model():
+    """Process-wide no-show model over the shared appointment snapshot"""
+    global _model
+    snapshot = get_snapshot()
+    with _model_lock:
+        if _model is None:
+            _model = NoShowModel(snapshot)
+    return _model
+
+
+def no_show_risk(day):
+    """Per-appointment no-show risk for a day's schedule, with hourly overbooking hints"""
+    model = get_model()
+    day_start = datetime.combine(day, datetime.min.time())
+    schedule = db.session.query(
+        Appointment.id, Appointment.patient_id, Appointment.appointment_date, Appointment.treatment_type,
+        Patient.first_name, Patient.last_name
+    ).join(Patient, Appointment.patient_id == Patient.id).filter(
+        Appointment.appointment_date >= day_start,
+        Appointment.appointment_date < day_start + timedelta(days=1),
+        Appointment.status == 'scheduled',
+        Appointment.not_deleted(),
+        Patient.not_deleted()
+    ).order_by(Appointment.appointment_date).all()
+
+    snapshot = model.snapshot
+    with snapshot.lock:
+        # Treatments never seen in history get an out-of-range code (no slot data)
+        codes = np.array([
+            snapshot.treatments.code(row.treatment_type, default=len(snapshot.treatments.values))
+            for row in schedule
+        ], dtype=np.int64)
+        risk, slot_rate, patient_total, patient_no_shows, overall = model.risk(
+            np.array([row.patient_id for row in schedule], dtype=np.int64),
+            np.array([row.appointment_date for row in schedule], dtype='datetime64[m]'),
+            codes
+        )
+
+    appointments = []
+    by_hour = {}
+    for i, row in enumerate(schedule):
+        appointments.append({
+            'id': row.id,
+            'patient_id': row.patient_id,
+            'patient_name': f'{row.first_name} {row.last_name}',
+            'appointment_date': row.appointment_date.isoformat(),
+            'treatment_type': row.treatment_type,
+            'risk': round(float(risk[i]), 4),
+            'slot_rate': round(float(slot_rate[i]), 4),
+            'patient_history': {'appointments': int(patient_total[i]), 'no_shows': int(patient_no_shows[i])}
+        })
+        hour = by_hour.setdefault(row.appointment_date.hour, {'appointments': 0, 'expected_no_shows': 0.0})
+        hour['appointments'] += 1
+        hour['expected_no_shows'] += float(risk[i])
+
+    return {
+        'date': day.isoformat(),
+        'overall_rate': round(overall, 4),
+        'expected_no_shows': round(float(risk.sum()), 2),
+        'appointments': appointments,
+        'by_hour': [
+            {
+                'hour': hour,
+                'appointments': stats['appointments'],
+                'expected_no_shows': round(stats['expected_no_shows'], 2),
+                # Conservative: only whole expected no-shows free up a chair
+                'suggested_overbook': math.floor(stats['expected_no_shows'])
+            } for hour, stats in sorted(by_hour.items())
+        ],
+        'snapshot_refreshed_at': snapshot.refreshed_at.isoformat() if snapshot.refreshed_at else None
+    }
@@ -0,0 +1,380 @@
+import os
+import re
+from datetime import date, datetime, time, timedelta
+import click
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from src.models.base import db
+from src.services.jobs import enqueue, job_handler
+
+MODES = ('yearly', 'monthly')
+TABLE = 'appointments'
+# Names used while migrating: the new partitioned table, and the old table once swapped out
+STAGING_TABLE = 'appointments_partitioned'
+RETIRED_TABLE = 'appointments_unpartitioned'
+DEFAULT_PARTITION = 'appointments_default'
+MIRROR = 'appointments_partition_mirror'
+BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+class PartitioningError(Exception):
+    """The appointments table cannot be partitioned as asked"""
+
+
+def partitioning_mode():
+    """'yearly', 'monthly' or None, from APPOINTMENT_PARTITIONING"""
+    mode = os.environ.get('APPOINTMENT_PARTITIONING', 'off').strip().lower()
+    if mode in ('', 'off'):
+        return None
+    if mode not in MODES:
+        raise PartitioningError(f"APPOINTMENT_PARTITIONING must be off, yearly or monthly, not {mode!r}")
+    return mode
+
+
+def _horizon_days():
+    return int(os.environ.get('APPOINTMENT_PARTITION_HORIZON_DAYS', 400))
+
+
+def _period_start(day, mode):
+    return date(day.year, 1, 1) if mode == 'yearly' else date(day.year, day.month, 1)
+
+
+def _next_period(start, mode):
+    if mode == 'yearly':
+        return date(start.year + 1, 1, 1)
+    return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def _partition_name(start, mode):
+    return f'{TABLE}_y{start.year}' if mode == 'yearly' else f'{TABLE}_m{start.year}_{start.month:02d}'
+
+
+def _is_partitioned(conn, table=TABLE):
+    return conn.execute(text(
+        'SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)'
+    ), {'table': table}).scalar() == 'p'
+
+
+def _partitions(conn, parent):
+    """Partition name -> (low, high) bounds, or None for the default partition"""
+    partitions = {}
+    for name, bound in conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:parent)
+    """), {'parent': parent}):
+        match = BOUNDS.search(bound)
+        partitions[name] = tuple(datetime.fromisoformat(value) for value in match.groups()) if match else None
+    return partitions
+
+
+def _columns(conn, table):
+    return [column['name'] for column in inspect(conn).get_columns(table)]
+
+
+def _create_partition(conn, parent, start, mode, existing):
+    """Add the partition for the period starting at start; returns its name, or None if covered"""
+    name = _partition_name(start, mode)
+    if name in existing:
+        return None
+    low = datetime.combine(start, time())
+    high = datetime.combine(_next_period(start, mode), time())
+    # After switching yearly <-> monthly, only the part of the period not covered yet
+    for bounds in existing.values():
+        if bounds and bounds[0] < high and low < bounds[1]:
+            low = max(low, bounds[1])
+    if low >= high:
+        return None
+
+    bounds = {'low': low, 'high': high}
+    values = f"FOR VALUES FROM ('{low}') TO ('{high}')"
+    default = next((partition for partition, value in existing.items() if value is None), None)
+    if default and conn.execute(text(
+        f'SELECT EXISTS (SELECT 1 FROM {default} WHERE appointment_date >= :low AND appointment_date < :high)'
+    ), bounds).scalar():
+        # Rows already in the default partition must move before the range can be attached
+        columns = ', '.join(_columns(conn, parent))
+        conn.execute(text(f'CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+        conn.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE appointment_date >= :low AND appointment_date < :high
+                RETURNING {columns}
+            )
+            INSERT INTO {name} ({columns}) SELECT {columns} FROM moved
+        """), bounds)
+        conn.execute(text(f'ALTER TABLE {parent} ATTACH PARTITION {name} {values}'))
+    else:
+        conn.execute(text(f'CREATE TABLE {name} PARTITION OF {parent} {values}'))
+    existing[name] = (low, high)
+    return name
+
+
+def ensure_partitions(conn, mode, parent=TABLE, starts=(), today=None):
+    """Create the default partition and those from this period to the horizon
+
+    starts adds further periods (the migration passes those holding existing
+    rows). Returns the names of the partitions created.
+    """
+    # Workers starting together would otherwise race to create the same partitions
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('appointment_partitions'))"))
+    existing = _partitions(conn, parent)
+    created = []
+    if None not in existing.values():
+        conn.execute(text(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {parent} DEFAULT'))
+        existing[DEFAULT_PARTITION] = None
+        created.append(DEFAULT_PARTITION)
+
+    today = today or date.today()
+    periods = {_period_start(day, mode) for day in starts}
+    start = _period_start(today, mode)
+    while start <= today + timedelta(days=_horizon_days()):
+        periods.add(start)
+        start = _next_period(start, mode)
+    for start in sorted(periods):
+        name = _create_partition(conn, parent, start, mode, existing)
+        if name:
+            created.append(name)
+    return created
+
+
+def _indexes(conn, table):
+    """(name, definition, is_primary, is_unique) of each index on table"""
+    return conn.execute(text("""
+        SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisprimary, i.indisunique
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = to_regclass(:table)
+    """), {'table': table}).all()
+
+
+def _staged(name):
+    return f'{name[:56]}_staged'
+
+
+def _set_lock_timeout(conn, seconds):
+    # Waiting behind a long transaction would queue every other query on the table
+    conn.execute(text(f"SET LOCAL lock_timeout = '{int(seconds * 1000)}ms'"))
+
+
+def _prepare(mode, lock_timeout):
+    """Create the partitioned copy with its indexes and start mirroring writes into it"""
+    with db.engine.begin() as conn:
+        _set_lock_timeout(conn, lock_timeout)
+        # Leftovers of an interrupted run; the mirror trigger goes first as it writes to them
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {MIRROR} ON {TABLE}'))
+        conn.execute(text(f'DROP TABLE IF EXISTS {STAGING_TABLE}'))
+        referencing = conn.execute(text(
+            "SELECT conrelid::regclass::text FROM pg_constraint WHERE confrelid = to_regclass(:table) AND contype = 'f'"
+        ), {'table': TABLE}).scalars().all()
+        if referencing:
+            raise PartitioningError(f"Foreign keys from {', '.join(referencing)} reference appointments.id alone")
+
+    # A full scan, so kept out of the transactions that lock the table
+    with db.engine.connect() as conn:
+        unit = 'year' if mode == 'yearly' else 'month'
+        periods = conn.execute(text(
+            f"SELECT DISTINCT date_trunc('{unit}', appointment_date)::date FROM {TABLE}"
+        )).scalars().all()
+
+    with db.engine.begin() as conn:
+        _set_lock_timeout(conn, lock_timeout)
+        conn.execute(text(
+            f'CREATE TABLE {STAGING_TABLE} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) '
+            f'PARTITION BY RANGE (appointment_date)'
+        ))
+        # The partition key has to be part of the primary key
+        conn.execute(text(
+            f'ALTER TABLE {STAGING_TABLE} ADD CONSTRAINT {_staged(TABLE)}_pkey PRIMARY KEY (id, appointment_date)'
+        ))
+        for name, definition, primary, unique in _indexes(conn, TABLE):
+            if primary:
+                continue
+            if unique:
+                raise PartitioningError(f'Unique index {name} does not include appointment_date')
+            conn.execute(text(re.sub(
+                r' INDEX \S+ ON (ONLY )?\S+ ', f' INDEX {_staged(name)} ON {STAGING_TABLE} ', definition, count=1
+            )))
+        for name, definition in conn.execute(text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(:table) AND contype = 'f'"
+        ), {'table': TABLE}).all():
+            conn.execute(text(f'ALTER TABLE {STAGING_TABLE} ADD CONSTRAINT {name} {definition}'))
+        created = ensure_partitions(conn, mode, parent=STAGING_TABLE, starts=periods)
+
+        columns = _columns(conn, TABLE)
+        new_values = ', '.join(f'NEW.{column}' for column in columns)
+        columns = ', '.join(columns)
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {MIRROR}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP <> 'INSERT' THEN
+                    DELETE FROM {STAGING_TABLE} WHERE id = OLD.id;
+                END IF;
+                IF TG_OP <> 'DELETE' THEN
+                    INSERT INTO {STAGING_TABLE} ({columns}) VALUES ({new_values});
+                END IF;
+                RETURN NULL;
+            END $$ LANGUAGE plpgsql
+        """))
+        # Last, as writers wait on the lock this takes until commit
+        conn.execute(text(
+            f'CREATE TRIGGER {MIRROR} AFTER INSERT OR UPDATE OR DELETE ON {TABLE} '
+            f'FOR EACH ROW EXECUTE FUNCTION {MIRROR}()'
+        ))
+    return created
+
+
+def _copy_batch(low, high):
+    with db.engine.begin() as conn:
+        columns = ', '.join(_columns(conn, TABLE))
+        # FOR UPDATE: a row changed meanwhile is copied as its mirrored (latest) version
+        return conn.execute(text(f"""
+            WITH batch AS (
+                SELECT {columns} FROM {TABLE} WHERE id >= :low AND id < :high FOR UPDATE
+            )
+            INSERT INTO {STAGING_TABLE} ({columns}) SELECT {columns} FROM batch
+            ON CONFLICT (id, appointment_date) DO NOTHING
+        """), {'low': low, 'high': high}).rowcount
+
+
+def _swap(conn, lock_timeout):
+    """Put the partitioned table in place of the old one under a brief exclusive lock"""
+    _set_lock_timeout(conn, lock_timeout)
+    conn.execute(text(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE'))
+    triggers = conn.execute(text(
+        'SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = to_regclass(:table) '
+        'AND NOT tgisinternal AND tgname <> :mirror'
+    ), {'table': TABLE, 'mirror': MIRROR}).scalars().all()
+    indexes = _indexes(conn, TABLE)
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': TABLE}).scalar()
+
+    conn.execute(text(f'DROP TRIGGER {MIRROR} ON {TABLE}'))
+    conn.execute(text(f'DROP FUNCTION {MIRROR}()'))
+    conn.execute(text(f'ALTER TABLE {TABLE} RENAME TO {RETIRED_TABLE}'))
+    for name, definition, primary, unique in indexes:
+        conn.execute(text(f'ALTER INDEX {name} RENAME TO {name[:49]}_unpartitioned'))
+    conn.execute(text(f'ALTER TABLE {STAGING_TABLE} RENAME TO {TABLE}'))
+    for name, definition, primary, unique in indexes:
+        staged = f'{_staged(TABLE)}_pkey' if primary else _staged(name)
+        conn.execute(text(f'ALTER INDEX {staged} RENAME TO {name}'))
+    if sequence:
+        # Dropping the retired table must not take the id sequence with it
+        conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id'))
+    # Definitions name the table appointments, which is now the partitioned one
+    for definition in triggers:
+        conn.execute(text(definition))
+
+
+def partition_appointments(mode, batch_size=5000, lock_timeout=5.0):
+    """Partition appointments by appointment_date online, or top up partitions if already done
+
+    The partitioned copy is filled in id-range batches, each its own short
+    transaction, while a trigger mirrors concurrent writes into it; only
+    creating the trigger and the final rename take a table lock. The old
+    table is kept as appointments_unpartitioned. Requires PostgreSQL 13+.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        raise PartitioningError('Table partitioning needs PostgreSQL')
+    with db.engine.connect() as lock_conn:
+        if int(lock_conn.execute(text('SHOW server_version_num')).scalar()) < 130000:
+            raise PartitioningError('Row triggers on partitioned tables need PostgreSQL 13 or newer')
+        # Session-level lock: held across the many transactions below
+        if not lock_conn.execute(text("SELECT pg_try_advisory_lock(hashtext('appointment_partitioning'))")).scalar():
+            raise PartitioningError('Another process is partitioning appointments')
+        # Do not sit idle in a transaction while holding it
+        lock_conn.commit()
+        try:
+            with db.engine.begin() as conn:
+                if _is_partitioned(conn):
+                    return {'migrated': False, 'copied': 0, 'created': ensure_partitions(conn, mode)}
+            try:
+                created = _prepare(mode, lock_timeout)
+                with db.engine.connect() as conn:
+                    low, high = conn.execute(text(f'SELECT min(id), max(id) FROM {TABLE}')).first()
+                copied = 0
+                # Rows inserted after this point are mirrored by the trigger
+                for start in range(low or 0, (high or -1) + 1, batch_size):
+                    copied += _copy_batch(start, start + batch_size)
+                with db.engine.begin() as conn:
+                    _swap(conn, lock_timeout)
+            except OperationalError as e:
+                if 'lock timeout' in str(e):
+                    raise PartitioningError('Timed out waiting for a lock on appointments; retry when it is quieter')
+                raise
+            with db.engine.connect() as conn:
+                conn.execute(text(f'ANALYZE {TABLE}'))
+                conn.commit()
+            return {'migrated': True, 'copied': copied, 'created': created}
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext('appointment_partitioning'))"))
+            lock_conn.commit()
+
+
+def _schedule_next():
+    """Queue tomorrow's partition top-up; every worker computes the same slot"""
+    run_at = datetime.combine(datetime.utcnow().date() + timedelta(days=1), time())
+    return enqueue('ensure_appointment_partitions', run_at=run_at, max_attempts=3,
+                   dedupe_key=f'ensure_appointment_partitions:{run_at.date().isoformat()}')
+
+
+def ensure_appointment_partitions():
+    """Create upcoming partitions when APPOINTMENT_PARTITIONING is on (PostgreSQL)
+
+    A table that is still empty, as on a new deployment, is partitioned right
+    away; one holding data is left to `flask partition-appointments`.
+    """
+    try:
+        mode = partitioning_mode()
+        if mode is None or db.engine.dialect.name != 'postgresql':
+            return []
+        with db.engine.begin() as conn:
+            partitioned = _is_partitioned(conn)
+            empty = not conn.execute(text(f'SELECT EXISTS (SELECT 1 FROM {TABLE})')).scalar()
+            created = ensure_partitions(conn, mode) if partitioned else []
+        if not partitioned:
+            if not empty:
+                print("⚠️  APPOINTMENT_PARTITIONING is set but appointments is not partitioned yet; "
+                      "run `flask partition-appointments`")
+                return []
+            created = partition_appointments(mode)['created']
+        _schedule_next()
+        return created
+    except Exception as e:
+        print(f"Error ensuring appointment partitions: {str(e)}")
+        return []
+
+
+@job_handler('ensure_appointment_partitions')
+def ensure_appointment_partitions_job(payload):
+    """Daily top-up of partitions ahead of the booking horizon, run by the background worker"""
+    mode = partitioning_mode()
+    if mode is None:
+        # Partitioning was turned off: let the schedule lapse
+        return {'created': []}
+    _schedule_next()
+    with db.engine.begin() as conn:
+        if not _is_partitioned(conn):
+            return {'created': []}
+        return {'created': ensure_partitions(conn, mode)}
+
+
+def init_partitioning(app):
+    """Register `flask partition-appointments`"""
+
+    @app.cli.command('partition-appointments')
+    @click.option('--mode', type=click.Choice(MODES), help='Defaults to APPOINTMENT_PARTITIONING')
+    @click.option('--batch-size', type=int, default=5000, help='Rows copied per transaction')
+    @click.option('--lock-timeout', type=float, default=5.0, help='Seconds to wait for each brief table lock')
+    def partition_appointments_command(mode, batch_size, lock_timeout):
+        """Partition appointments by date without downtime (PostgreSQL), or add upcoming partitions"""
+        try:
+            mode = mode or partitioning_mode()
+            if mode is None:
+                raise click.UsageError('Pass --mode or set APPOINTMENT_PARTITIONING')
+            result = partition_appointments(mode, batch_size=batch_size, lock_timeout=lock_timeout)
+        except PartitioningError as e:
+            raise click.ClickException(str(e))
+        if result['migrated']:
+            print(f"🗂️  Partitioned appointments {mode} ({result['copied']} rows copied)")
+            print(f"   The old table is kept as {RETIRED_TABLE}; drop it once you are satisfied")
+        for name in result['created']:
+            print(f"➕ Created partition {name}")
@@ -0,0 +1,257 @@
+import json
+import os
+import smtplib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from email.message import EmailMessage
+from string import Template
+import click
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.appointment import Appointment
+from src.models.base import db
+from src.models.patient import Patient
+from src.models.reminder import Reminder
+from src.services.jobs import job_handler
+
+MAX_ATTEMPTS = 3
+
+DEFAULT_TEMPLATES = {
+    'email': {
+        'subject': 'Appointment reminder for $date',
+        'body': (
+            'Dear $first_name,\n\n'
+            'This is a reminder of your $treatment appointment at $office_name '
+            'on $date at $time.\n\nIf you cannot make it, please call us to reschedule.\n'
+        ),
+    },
+    'sms': {
+        'subject': '',
+        'body': '$office_name: reminder of your appointment on $date at $time. Reply or call to reschedule.',
+    },
+}
+
+
+class FileDeliveryBackend:
+    """Writes every message as a JSON line to a local outbox file (development/testing)"""
+
+    channels = ('email', 'sms')
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def deliver(self, message):
+        line = json.dumps(message) + '\n'
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line)
+
+
+class SmtpDeliveryBackend:
+    """Sends email reminders through an SMTP server (e.g. `python -m aiosmtpd -n` for debugging)"""
+
+    channels = ('email',)
+
+    def __init__(self, host, port, sender):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per delivery thread, reused across messages
+        if getattr(self._local, 'smtp', None) is None:
+            self._local.smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        return self._local.smtp
+
+    def deliver(self, message):
+        email = EmailMessage()
+        email['From'] = self.sender
+        email['To'] = message['recipient']
+        email['Subject'] = message['subject']
+        email.set_content(message['body'])
+        try:
+            self._connection().send_message(email)
+        except smtplib.SMTPServerDisconnected:
+            self._local.smtp = None
+            self._connection().send_message(email)
+
+
+def get_delivery_backend():
+    backend = os.environ.get('REMINDER_BACKEND', 'file')
+    if backend == 'smtp':
+        return SmtpDeliveryBackend(
+            os.environ.get('SMTP_HOST', 'localhost'),
+            int(os.environ.get('SMTP_PORT', 1025)),
+            os.environ.get('REMINDER_SENDER', 'reminders@dentaloffice.com')
+        )
+    return FileDeliveryBackend(os.environ.get(
+        'REMINDER_OUTBOX',
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'reminders-outbox.jsonl')
+    ))
+
+
+def _templates():
+    templates = {channel: dict(parts) for channel, parts in DEFAULT_TEMPLATES.items()}
+    for channel in templates:
+        for part in ('subject', 'body'):
+            override = os.environ.get(f'REMINDER_{channel.upper()}_{part.upper()}')
+            if override:
+                templates[channel][part] = override
+    return {channel: {part: Template(text) for part, text in parts.items()} for channel, parts in templates.items()}
+
+
+def _insert_ignore(conn, rows):
+    """INSERT ... ON CONFLICT DO NOTHING on the (appointment_id, channel) key"""
+    dialect = postgresql if conn.dialect.name == 'postgresql' else sqlite
+    conn.execute(dialect.insert(Reminder.__table__).values(rows).on_conflict_do_nothing(
+        index_elements=['appointment_id', 'channel']
+    ))
+
+
+def _render(templates, row, channel):
+    values = {
+        'first_name': row.first_name,
+        'last_name': row.last_name,
+        'date': row.appointment_date.strftime('%A, %B %d'),
+        'time': row.appointment_date.strftime('%I:%M %p').lstrip('0'),
+        'treatment': row.treatment_type or 'dental',
+        'office_name': os.environ.get('OFFICE_NAME', 'the Dental Office'),
+    }
+    return {
+        'subject': templates[channel]['subject'].safe_substitute(values),
+        'body': templates[channel]['body'].safe_substitute(values),
+    }
+
+
+def _claim_timeout():
+    # A 'sending' claim this old belongs to a run that died before recording the outcome
+    return timedelta(seconds=int(os.environ.get('REMINDER_CLAIM_TIMEOUT', 900)))
+
+
+def send_reminders(target_date=None, chunk_size=500, workers=8, backend=None):
+    """Send reminders for one day's scheduled appointments
+
+    Appointments are read in keyset chunks (bounded memory). Each chunk's
+    reminders are claimed with a single compare-and-set UPDATE before being
+    delivered in parallel, so overlapping or repeated runs never send the
+    same reminder twice. A claim left by a run that died mid-chunk is taken
+    over after REMINDER_CLAIM_TIMEOUT. Returns delivery counts.
+    """
+    target_date = target_date or date.today() + timedelta(days=1)
+    backend = backend or get_delivery_backend()
+    templates = _templates()
+    day_start = datetime.combine(target_date, datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+    engine = db.engine
+    stats = {'date': target_date.isoformat(), 'sent': 0, 'failed': 0, 'skipped': 0}
+
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    select(
+                        Appointment.id, Appointment.appointment_date, Appointment.treatment_type,
+                        Patient.first_name, Patient.last_name, Patient.phone, Patient.email
+                    ).join(Patient, Appointment.patient_id == Patient.id).where(
+                        Appointment.appointment_date >= day_start,
+                        Appointment.appointment_date < day_end,
+                        Appointment.status == 'scheduled',
+                        Appointment.deleted_at.is_(None),
+                        Patient.deleted_at.is_(None),
+                        Appointment.id > last_id
+                    ).order_by(Appointment.id).limit(chunk_size)
+                ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            by_key = {}
+            for row in rows:
+                contacts = {'email': row.email, 'sms': row.phone}
+                for channel in backend.channels:
+                    if contacts.get(channel):
+                        by_key[(row.id, channel)] = (row, contacts[channel])
+            if not by_key:
+                continue
+
+            token = uuid.uuid4().hex
+            with engine.begin() as conn:
+                _insert_ignore(conn, [
+                    {'appointment_id': appointment_id, 'channel': channel, 'recipient': recipient,
+                     'status': 'pending', 'attempts': 0, 'created_at': datetime.utcnow()}
+                    for (appointment_id, channel), (row, recipient) in by_key.items()
+                ])
+                # Only the (appointment, channel) pairs this backend can deliver right now
+                wanted = or_(*(
+                    and_(Reminder.channel == channel,
+                         Reminder.appointment_id.in_([key[0] for key in by_key if key[1] == channel]))
+                    for channel in {key[1] for key in by_key}
+                ))
+                now = datetime.utcnow()
+                claimable = or_(
+                    Reminder.status.in_(('pending', 'failed')),
+                    and_(Reminder.status == 'sending',
+                         or_(Reminder.claimed_at.is_(None), Reminder.claimed_at < now - _claim_timeout()))
+                )
+                conn.execute(update(Reminder.__table__).where(
+                    wanted, claimable, Reminder.attempts < MAX_ATTEMPTS
+                ).values(status='sending', claim_token=token, claimed_at=now, attempts=Reminder.attempts + 1))
+                claimed = conn.execute(
+                    select(Reminder.id, Reminder.appointment_id, Reminder.channel, Reminder.recipient)
+                    .where(Reminder.claim_token == token)
+                ).all()
+            stats['skipped'] += len(by_key) - len(claimed)
+
+            def deliver(reminder):
+                try:
+                    row, _ = by_key[(reminder.appointment_id, reminder.channel)]
+                    message = {'channel': reminder.channel, 'recipient': reminder.recipient,
+                               'appointment_id': reminder.appointment_id,
+                               **_render(templates, row, reminder.channel)}
+                    backend.deliver(message)
+                    return reminder.id, None
+                except Exception as e:
+                    return reminder.id, str(e)
+
+            sent, failed = [], []
+            for reminder_id, error in pool.map(deliver, claimed):
+                (failed if error else sent).append((reminder_id, error))
+
+            with engine.begin() as conn:
+                if sent:
+                    conn.execute(update(Reminder.__table__).where(
+                        Reminder.id.in_([reminder_id for reminder_id, _ in sent])
+                    ).values(status='sent', sent_at=datetime.utcnow(), error=None))
+                for reminder_id, error in failed:
+                    conn.execute(update(Reminder.__table__).where(Reminder.id == reminder_id)
+                                 .values(status='failed', error=error))
+            stats['sent'] += len(sent)
+            stats['failed'] += len(failed)
+
+    return stats
+
+
+@job_handler('send_reminders')
+def send_reminders_job(payload):
+    """Send a day's reminders from the background worker"""
+    target_date = date.fromisoformat(payload['date']) if payload.get('date') else None
+    return send_reminders(target_date)
+
+
+def init_reminders(app):
+    """Register the `flask send-reminders` command"""
+
+    @app.cli.command('send-reminders')
+    @click.option('--date', 'target_date', default=None, help='YYYY-MM-DD (default: tomorrow)')
+    @click.option('--workers', type=int, default=8, help='Parallel deliveries')
+    def send_reminders_command(target_date, workers):
+        """Send reminders for the next day's scheduled appointments"""
+        day = date.fromisoformat(target_date) if target_date else None
+        stats = send_reminders(day, workers=workers)
+        print(f"📨 Reminders for {stats['date']}: {stats['sent']} sent, "
+              f"{stats['failed']} failed, {stats['skipped']} already handled")
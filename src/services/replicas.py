@@ -0,0 +1,156 @@
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from flask import g, has_request_context, request
+from sqlalchemy import event, func, select, text
+from sqlalchemy.orm import Session
+from src.models.appointment import Appointment
+from src.models.base import db
+from src.models.patient import Patient
+from src.services.metrics import DB_READ_ROUTING, DB_REPLICA_HEALTHY, DB_REPLICA_LAG
+
+# Blueprints that must see their own or other processes' latest writes
+# (calendar feeds are cached until the next change, so must not render stale)
+PRIMARY_BLUEPRINTS = {'sync', 'jobs', 'events', 'metrics', 'calendar'}
+STICKY_COOKIE = 'db_primary_until'
+
+_healthy = set()
+
+_PG_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def replica_urls():
+    urls = os.environ.get('DATABASE_REPLICA_URLS') or os.environ.get('DATABASE_REPLICA_URL') or ''
+    return [url.strip() for url in urls.split(',') if url.strip()]
+
+
+def _max_lag():
+    return float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 10))
+
+
+def _sticky_seconds():
+    return float(os.environ.get('REPLICA_STICKY_SECONDS', _max_lag()))
+
+
+def _oldest_missing_change(primary, replica):
+    """Timestamp of the oldest appointment/patient change the replica does not have yet, or None"""
+    missing = []
+    for model in (Appointment, Patient):
+        with replica.connect() as conn:
+            newest = conn.execute(select(func.max(model.updated_at))).scalar()
+        query = select(func.min(model.updated_at))
+        if newest is not None:
+            query = query.where(model.updated_at > newest)
+        with primary.connect() as conn:
+            oldest = conn.execute(query).scalar()
+        if oldest is not None:
+            missing.append(oldest)
+    return min(missing, default=None)
+
+
+def replica_lag(primary, replica):
+    """Seconds the replica is behind the primary
+
+    Streaming PostgreSQL replicas report their replay delay; anything else
+    (another server, a copied SQLite file) is measured by how long the oldest
+    appointment or patient change it lacks has existed on the primary.
+    """
+    if replica.dialect.name == 'postgresql':
+        with replica.connect() as conn:
+            if conn.execute(text('SELECT pg_is_in_recovery()')).scalar():
+                return float(conn.execute(_PG_LAG).scalar() or 0)
+    oldest_missing = _oldest_missing_change(primary, replica)
+    if oldest_missing is None:
+        return 0.0
+    return max((datetime.utcnow() - oldest_missing).total_seconds(), 0.0)
+
+
+def check_replicas():
+    """Measure every replica and update the set eligible for reads"""
+    primary = db.engines[None]
+    for key in sorted(key for key in db.engines if key):
+        try:
+            lag = replica_lag(primary, db.engines[key])
+        except Exception as e:
+            lag = None
+            if key in _healthy:
+                print(f"Error checking replica {key}: {str(e)}")
+        healthy = lag is not None and lag <= _max_lag()
+        if healthy != (key in _healthy):
+            print(f"{'✅' if healthy else '⚠️ '} Replica {key} {'in service' if healthy else 'out of service'} (lag {lag})")
+        (_healthy.add if healthy else _healthy.discard)(key)
+        DB_REPLICA_HEALTHY.labels(key).set(1 if healthy else 0)
+        if lag is not None and lag != float('inf'):
+            DB_REPLICA_LAG.labels(key).set(lag)
+
+
+def _check_forever(app):
+    interval = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+    while True:
+        try:
+            with app.app_context():
+                check_replicas()
+        except Exception as e:
+            print(f"Error checking replicas: {str(e)}")
+        time.sleep(interval)
+
+
+def read_bind_for(cookies):
+    """Replica bind a read-only request should use, or None for the primary"""
+    try:
+        # Read-your-writes: clients that wrote recently keep reading the primary
+        if float(cookies.get(STICKY_COOKIE, 0)) > time.time():
+            bind = None
+        else:
+            bind = random.choice(sorted(_healthy)) if _healthy else None
+    except ValueError:
+        bind = None
+    DB_READ_ROUTING.labels(bind or 'default').inc()
+    return bind
+
+
+def _choose_read_bind():
+    g.db_read_bind = None
+    if request.method in ('GET', 'HEAD') and request.blueprint not in PRIMARY_BLUEPRINTS:
+        g.db_read_bind = read_bind_for(request.cookies)
+
+
+def _pin_to_primary(session, flush_context):
+    """A request that writes reads the primary from then on, and its client does for a while"""
+    if has_request_context():
+        g.db_read_bind = None
+        g.db_wrote = True
+
+
+def _set_sticky_cookie(response):
+    if g.get('db_wrote'):
+        sticky = _sticky_seconds()
+        response.set_cookie(
+            STICKY_COOKIE, str(time.time() + sticky), max_age=int(sticky) + 1, httponly=True, samesite='Lax'
+        )
+    return response
+
+
+def init_replicas(app):
+    """Register DATABASE_REPLICA_URL(S) as extra binds and route GET requests to them
+
+    Must run before db.init_app so the binds are configured.
+    """
+    urls = replica_urls()
+    if not urls:
+        return
+    app.config['SQLALCHEMY_BINDS'] = {
+        **app.config.get('SQLALCHEMY_BINDS', {}),
+        **{f'replica_{i}': url for i, url in enumerate(urls)}
+    }
+    app.before_request(_choose_read_bind)
+    app.after_request(_set_sticky_cookie)
+    if not event.contains(Session, 'after_flush', _pin_to_primary):
+        event.listen(Session, 'after_flush', _pin_to_primary)
+    threading.Thread(target=_check_forever, args=(app,), name='replica-checker', daemon=True).start()
+    print(f"📖 Routing reads to {len(urls)} replica(s)")
@@ -0,0 +1,318 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from sqlalchemy import delete, event, func, inspect, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from src.models.appointment import Appointment
+from src.models.archive import ArchivedAppointment
+from src.models.base import db
+from src.models.revenue import RevenueCube
+from src.models.treatment import Treatment
+from src.services.jobs import enqueue, job_handler
+
+GRAINS = ('day', 'week', 'month')
+TRACKED_ATTRIBUTES = ('status', 'deleted_at', 'treatment_type', 'appointment_date')
+
+
+def period_start(day, grain):
+    """First day of the day/week (Monday)/month period containing day"""
+    if grain == 'week':
+        return day - timedelta(days=day.weekday())
+    if grain == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def previous_year(start, grain):
+    """Period a year earlier; weeks and days keep their weekday (52 weeks back)"""
+    if grain == 'month':
+        return start.replace(year=start.year - 1)
+    return start - timedelta(weeks=52)
+
+
+def _counts(status, deleted_at, treatment_type, appointment_date):
+    # Only completed, non-deleted appointments of a named treatment earn revenue
+    return (status == 'completed' and deleted_at is None and bool(treatment_type)
+            and appointment_date is not None)
+
+
+def _upsert(conn, deltas):
+    """Add (count, revenue) deltas keyed by (grain, period_start, treatment_type)"""
+    if not deltas:
+        return
+    table = RevenueCube.__table__
+    dialect = postgresql if conn.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(table).values([
+        {'grain': grain, 'period_start': start, 'treatment_type': treatment,
+         'appointment_count': count, 'revenue': revenue}
+        for (grain, start, treatment), (count, revenue) in deltas.items()
+    ])
+    conn.execute(statement.on_conflict_do_update(
+        index_elements=['grain', 'period_start', 'treatment_type'],
+        set_={
+            'appointment_count': table.c.appointment_count + statement.excluded.appointment_count,
+            'revenue': table.c.revenue + statement.excluded.revenue,
+        }
+    ))
+
+
+def _add_delta(deltas, prices, day, treatment_type, sign):
+    price = prices.get(treatment_type) or Decimal(0)
+    for grain in GRAINS:
+        cell = deltas.setdefault((grain, period_start(day, grain), treatment_type), [0, Decimal(0)])
+        cell[0] += sign
+        cell[1] += sign * price
+
+
+def _prices(conn, names):
+    if not names:
+        return {}
+    return dict(conn.execute(select(Treatment.name, Treatment.price).where(Treatment.name.in_(names))).all())
+
+
+def _old_value(state, attribute):
+    history = state.attrs[attribute].history
+    if history.has_changes():
+        return history.deleted[0] if history.deleted else None
+    return state.attrs[attribute].value
+
+
+def _after_flush(session, flush_context):
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            changes.append((None, obj))
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and session.is_modified(obj, include_collections=False):
+            changes.append((obj, obj))
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            changes.append((obj, None))
+
+    moves = []
+    for before, after in changes:
+        old = new = None
+        if before is not None:
+            state = inspect(before)
+            values = [_old_value(state, attribute) for attribute in TRACKED_ATTRIBUTES]
+            if _counts(*values):
+                old = (values[3].date(), values[2])
+        if after is not None:
+            values = [getattr(after, attribute) for attribute in TRACKED_ATTRIBUTES]
+            if _counts(*values):
+                new = (values[3].date(), values[2])
+        if old != new:
+            moves.append((old, new))
+
+    repriced = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Treatment):
+            state = inspect(obj)
+            if obj in session.dirty and not (
+                state.attrs.price.history.has_changes() or state.attrs.name.history.has_changes()
+            ):
+                continue
+            # A rename moves the price from the old name's cells to the new one's
+            repriced.add(obj.name)
+            repriced.update(state.attrs.name.history.deleted)
+
+    if not moves and not repriced:
+        return
+    conn = session.connection()
+    if moves:
+        names = {cell[1] for move in moves for cell in move if cell}
+        prices = _prices(conn, names)
+        deltas = {}
+        for old, new in moves:
+            if old:
+                _add_delta(deltas, prices, old[0], old[1], -1)
+            if new:
+                _add_delta(deltas, prices, new[0], new[1], 1)
+        _upsert(conn, deltas)
+    if repriced:
+        reprice(conn, repriced)
+
+
+def reprice(conn, treatment_names):
+    """Recompute cube revenue of the given treatments from their current price"""
+    table = RevenueCube.__table__
+    price = select(Treatment.price).where(Treatment.name == table.c.treatment_type).scalar_subquery()
+    conn.execute(update(table).where(table.c.treatment_type.in_(treatment_names)).values(
+        revenue=table.c.appointment_count * func.coalesce(price, 0)
+    ))
+
+
+def record_bulk_change(conn, rows, sign):
+    """Cube deltas for appointments that start (+1) or stop (-1) counting outside the ORM
+
+    Core updates bypass the flush hook; rows carry the status,
+    appointment_date and treatment_type of live appointments.
+    """
+    counted = [(row.appointment_date.date(), row.treatment_type) for row in rows
+               if _counts(row.status, None, row.treatment_type, row.appointment_date)]
+    if not counted:
+        return
+    prices = _prices(conn, {treatment for _, treatment in counted})
+    deltas = {}
+    for day, treatment in counted:
+        _add_delta(deltas, prices, day, treatment, sign)
+    _upsert(conn, deltas)
+
+
+def rebuild_revenue_cubes(batch_size=5000):
+    """Recompute every cube cell from appointments and their archive"""
+    day_counts = Counter()
+    with db.engine.begin() as conn:
+        for model in (Appointment, ArchivedAppointment):
+            result = conn.execution_options(yield_per=batch_size).execute(
+                select(model.appointment_date, model.treatment_type).where(
+                    model.status == 'completed',
+                    model.deleted_at.is_(None),
+                    model.treatment_type.isnot(None),
+                    model.treatment_type != ''
+                )
+            )
+            for appointment_date, treatment in result:
+                day_counts[(appointment_date.date(), treatment)] += 1
+
+        prices = dict(conn.execute(select(Treatment.name, Treatment.price)).all())
+        cells = defaultdict(int)
+        for (day, treatment), count in day_counts.items():
+            for grain in GRAINS:
+                cells[(grain, period_start(day, grain), treatment)] += count
+        rows = [
+            {'grain': grain, 'period_start': start, 'treatment_type': treatment,
+             'appointment_count': count, 'revenue': count * (prices.get(treatment) or Decimal(0))}
+            for (grain, start, treatment), count in cells.items()
+        ]
+
+        conn.execute(delete(RevenueCube.__table__))
+        for i in range(0, len(rows), 1000):
+            conn.execute(insert(RevenueCube.__table__), rows[i:i + 1000])
+    return len(rows)
+
+
+def _cells(grain, start, end, treatment_type=None):
+    query = select(
+        RevenueCube.period_start, RevenueCube.treatment_type,
+        RevenueCube.appointment_count, RevenueCube.revenue
+    ).where(
+        RevenueCube.grain == grain,
+        RevenueCube.period_start >= period_start(start, grain),
+        RevenueCube.period_start <= end,
+        RevenueCube.appointment_count != 0
+    )
+    if treatment_type:
+        query = query.where(RevenueCube.treatment_type == treatment_type)
+    return db.session.execute(query).all()
+
+
+def revenue_by_period(grain, start, end, treatment_type=None, compare=False):
+    """Revenue per period (and per treatment) between two dates, optionally year over year"""
+    periods = {}
+    for start_of_period, treatment, count, revenue in _cells(grain, start, end, treatment_type):
+        period = periods.setdefault(start_of_period, {
+            'period_start': start_of_period.isoformat(), 'appointment_count': 0, 'revenue': 0.0, 'by_treatment': []
+        })
+        period['appointment_count'] += count
+        period['revenue'] += float(revenue)
+        period['by_treatment'].append({
+            'treatment_type': treatment, 'appointment_count': count, 'revenue': float(revenue)
+        })
+
+    if compare:
+        previous = defaultdict(float)
+        for start_of_period, _, _, revenue in _cells(
+            grain, previous_year(period_start(start, grain), grain),
+            previous_year(period_start(end, grain), grain), treatment_type
+        ):
+            previous[start_of_period] += float(revenue)
+        # Walk every period in range so years with no revenue this year still compare
+        current = period_start(start, grain)
+        while current <= end:
+            if current not in periods:
+                periods[current] = {'period_start': current.isoformat(), 'appointment_count': 0,
+                                    'revenue': 0.0, 'by_treatment': []}
+            last_year = previous.get(previous_year(current, grain), 0.0)
+            periods[current]['previous_year_revenue'] = round(last_year, 2)
+            periods[current]['yoy_change'] = _change(periods[current]['revenue'], last_year)
+            current = _next_period(current, grain)
+
+    result = []
+    for start_of_period in sorted(periods):
+        period = periods[start_of_period]
+        period['revenue'] = round(period['revenue'], 2)
+        result.append(period)
+    return result
+
+
+def _next_period(start, grain):
+    if grain == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=7 if grain == 'week' else 1)
+
+
+def _change(current, previous):
+    """Relative change, or None when there is nothing to compare against"""
+    if not previous:
+        return None
+    return round((current - previous) / previous, 4)
+
+
+def _day_total(start, end):
+    total = db.session.execute(select(func.coalesce(func.sum(RevenueCube.revenue), 0)).where(
+        RevenueCube.grain == 'day', RevenueCube.period_start >= start, RevenueCube.period_start <= end
+    )).scalar()
+    return float(total)
+
+
+def month_to_date(as_of):
+    """Month-to-date revenue against the same span of last month and of last year"""
+    month_start = as_of.replace(day=1)
+    last_month_start = (month_start - timedelta(days=1)).replace(day=1)
+    # Clamp the span to the shorter month (e.g. March 31 -> February 28)
+    last_month_end = min(last_month_start + timedelta(days=as_of.day - 1), month_start - timedelta(days=1))
+    last_year_start = month_start.replace(year=month_start.year - 1)
+    last_year_end = last_year_start + timedelta(days=as_of.day - 1)
+    if last_year_end.month != last_year_start.month:
+        last_year_end = (last_year_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    current = _day_total(month_start, as_of)
+    last_month = _day_total(last_month_start, last_month_end)
+    last_year = _day_total(last_year_start, last_year_end)
+    return {
+        'as_of': as_of.isoformat(),
+        'month_to_date': round(current, 2),
+        'previous_month_to_date': round(last_month, 2),
+        'previous_month_change': _change(current, last_month),
+        'previous_year_month_to_date': round(last_year, 2),
+        'previous_year_change': _change(current, last_year),
+    }
+
+
+def ensure_revenue_cubes():
+    """Queue a rebuild when the cubes are empty but completed appointments exist (first deploy)"""
+    if db.session.query(RevenueCube.id).first() is not None:
+        return None
+    if db.session.query(Appointment.id).filter(Appointment.status == 'completed').first() is None:
+        return None
+    return enqueue('rebuild_revenue_cubes', dedupe_key='rebuild_revenue_cubes')
+
+
+@job_handler('rebuild_revenue_cubes')
+def rebuild_revenue_cubes_job(payload):
+    """Rebuild the revenue cubes from the background worker"""
+    return {'cells': rebuild_revenue_cubes()}
+
+
+def init_revenue(app):
+    """Maintain the revenue cubes on every ORM flush and register `flask rebuild-revenue-cubes`"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+
+    @app.cli.command('rebuild-revenue-cubes')
+    def rebuild_revenue_cubes_command():
+        """Recompute the revenue cubes from all appointment history"""
+        cells = rebuild_revenue_cubes()
+        print(f"💰 Rebuilt {cells} revenue cube cells")
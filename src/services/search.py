@@ -0,0 +1,268 @@
+import html
+import re
+from concurrent.futures import ThreadPoolExecutor
+import click
+from sqlalchemy import inspect, select, text
+from src.models.appointment import Appointment
+from src.models.base import db
+from src.models.patient import Patient
+from src.services.jobs import job_handler
+
+# Indexed text per table, by weight (PostgreSQL A-C; SQLite bm25 column weights)
+INDEXED = {
+    'patients': {'A': ('first_name', 'last_name'), 'B': ('medical_history',), 'C': ('notes',)},
+    'appointments': {'A': ('treatment_type',), 'B': ('notes',)},
+}
+BM25_WEIGHTS = {'A': 10.0, 'B': 5.0, 'C': 2.0}
+TS_CONFIG = 'english'
+# Highlight markers that cannot appear in stored text; swapped for <mark> after escaping
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def _columns(table):
+    return [column for weight in INDEXED[table].values() for column in weight]
+
+
+def _tsvector_sql(table, prefix=''):
+    return ' || '.join(
+        f"setweight(to_tsvector('{TS_CONFIG}', concat_ws(' ', {', '.join(prefix + c for c in columns)})), '{weight}')"
+        for weight, columns in INDEXED[table].items()
+    )
+
+
+def _ensure_postgresql(conn):
+    """tsvector column + GIN index, maintained by a BEFORE INSERT/UPDATE trigger"""
+    inspector = inspect(conn)
+    unindexed = []
+    for table in INDEXED:
+        if 'search_vector' not in {column['name'] for column in inspector.get_columns(table)}:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN search_vector tsvector'))
+            unindexed.append(table)
+        conn.execute(text(
+            f'CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)'
+        ))
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {table}_search_vector() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {_tsvector_sql(table, 'NEW.')};
+                RETURN NEW;
+            END $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {table}_search_vector ON {table}'))
+        conn.execute(text(
+            f"CREATE TRIGGER {table}_search_vector BEFORE INSERT OR UPDATE OF {', '.join(_columns(table))} "
+            f"ON {table} FOR EACH ROW EXECUTE FUNCTION {table}_search_vector()"
+        ))
+    return unindexed
+
+
+def _ensure_sqlite(conn):
+    """FTS5 external-content table per source table, maintained by AFTER triggers"""
+    stale = []
+    for table in INDEXED:
+        columns = _columns(table)
+        fts = f'{table}_fts'
+        existing = {row[0] for row in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE name = :fts OR tbl_name = :table AND type = 'trigger'"
+        ), {'fts': fts, 'table': table})}
+        new_values = ', '.join(f'new.{c}' for c in columns)
+        old_values = ', '.join(f'old.{c}' for c in columns)
+        delete_old = f"INSERT INTO {fts}({fts}, rowid, {', '.join(columns)}) VALUES ('delete', old.id, {old_values});"
+        insert_new = f"INSERT INTO {fts}(rowid, {', '.join(columns)}) VALUES (new.id, {new_values});"
+        statements = {
+            fts: f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(columns)}, "
+                 f"content='{table}', content_rowid='id', tokenize='porter unicode61')",
+            f'{fts}_insert': f'CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END',
+            f'{fts}_delete': f'CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END',
+            f'{fts}_update': f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {', '.join(columns)} ON {table} "
+                             f"BEGIN {delete_old} {insert_new} END",
+        }
+        missing = [name for name in statements if name not in existing]
+        for name in missing:
+            conn.execute(text(statements[name]))
+        if missing:
+            # Rows written while any piece was missing are not (correctly) indexed
+            stale.append(table)
+    return stale
+
+
+def ensure_search_index():
+    """Create the full-text index objects if missing; returns tables needing a reindex"""
+    with db.engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            return _ensure_postgresql(conn)
+        stale = _ensure_sqlite(conn)
+        for table in stale:
+            # FTS5 rebuilds in one statement; SQLite has a single writer anyway
+            conn.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+        return []
+
+
+def _reindex_chunk(app, table, low, high):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            return conn.execute(text(
+                f'UPDATE {table} SET search_vector = {_tsvector_sql(table)} WHERE id >= :low AND id < :high'
+            ), {'low': low, 'high': high}).rowcount
+
+
+def reindex_search(app, tables=None, chunk_size=5000, workers=4):
+    """Recompute the full-text index; returns rows indexed per table
+
+    PostgreSQL recomputes search_vector in id-range chunks on parallel
+    connections, each chunk its own short transaction. SQLite rebuilds each
+    FTS5 table in a single statement.
+    """
+    tables = tables or list(INDEXED)
+    counts = {}
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            with db.engine.begin() as conn:
+                for table in tables:
+                    conn.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+                    counts[table] = conn.execute(text(f'SELECT count(*) FROM {table}')).scalar()
+            return counts
+        bounds = {}
+        with db.engine.connect() as conn:
+            for table in tables:
+                bounds[table] = conn.execute(text(f'SELECT min(id), max(id) FROM {table}')).first()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for table in tables:
+            low, high = bounds[table]
+            if low is None:
+                counts[table] = 0
+                continue
+            chunks = range(low, high + 1, chunk_size)
+            counts[table] = sum(pool.map(
+                lambda start: _reindex_chunk(app, table, start, start + chunk_size), chunks
+            ))
+    return counts
+
+
+def _fts5_query(query):
+    """User input as an FTS5 query: every word or "quoted phrase" must match"""
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        words = re.findall(r'\w+', phrase or word)
+        if words:
+            terms.append('"' + ' '.join(words) + '"')
+    return ' AND '.join(terms)
+
+
+def _highlight(snippet):
+    if not snippet:
+        return ''
+    return html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def _search_table_sqlite(conn, table, query, limit):
+    fts = f'{table}_fts'
+    weights = ', '.join(str(BM25_WEIGHTS[weight]) for weight, columns in INDEXED[table].items() for _ in columns)
+    match = f'FROM {fts} JOIN {table} t ON t.id = {fts}.rowid WHERE {fts} MATCH :query AND t.deleted_at IS NULL'
+    params = {'query': query, 'limit': limit}
+    total = conn.execute(text(f'SELECT count(*) {match}'), params).scalar()
+    rows = conn.execute(text(
+        f"SELECT t.id, -bm25({fts}, {weights}) AS score, "
+        f"snippet({fts}, -1, '{MARK_START}', '{MARK_END}', ' … ', 16) AS snippet "
+        f'{match} ORDER BY bm25({fts}, {weights}), t.id LIMIT :limit'
+    ), params).all()
+    return total, rows
+
+
+def _search_table_postgresql(conn, table, query, limit):
+    match = (f"FROM {table} t, websearch_to_tsquery('{TS_CONFIG}', :query) q "
+             f'WHERE t.search_vector @@ q AND t.deleted_at IS NULL')
+    params = {'query': query, 'limit': limit}
+    total = conn.execute(text(f'SELECT count(*) {match}'), params).scalar()
+    # ts_headline re-parses the text, so only run it on the page of results
+    rows = conn.execute(text(f"""
+        SELECT page.id, page.score, ts_headline('{TS_CONFIG}', concat_ws(' ', {', '.join('t.' + c for c in _columns(table))}),
+            websearch_to_tsquery('{TS_CONFIG}', :query),
+            'StartSel={MARK_START}, StopSel={MARK_END}, MaxFragments=2, FragmentDelimiter=" … "') AS snippet
+        FROM (SELECT t.id, ts_rank_cd(t.search_vector, q) AS score {match}
+              ORDER BY score DESC, t.id LIMIT :limit) page
+        JOIN {table} t ON t.id = page.id
+        ORDER BY page.score DESC, page.id
+    """), params).all()
+    return total, rows
+
+
+def search(query, types=('patients', 'appointments'), page=1, per_page=20):
+    """Ranked, highlighted full-text search over patients and appointment notes"""
+    page, per_page = max(page, 1), min(max(per_page, 1), 100)
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'postgresql':
+            search_table, match_query = _search_table_postgresql, query
+        else:
+            search_table, match_query = _search_table_sqlite, _fts5_query(query)
+        if not match_query:
+            return {'query': query, 'page': page, 'per_page': per_page, 'total': 0, 'results': []}
+
+        # Each table's top page*per_page hits are enough to merge any page
+        total, hits = 0, []
+        for table in types:
+            count, rows = search_table(conn, table, match_query, page * per_page)
+            total += count
+            hits.extend((table, row) for row in rows)
+        hits.sort(key=lambda hit: (-hit[1].score, hit[0], hit[1].id))
+        hits = hits[(page - 1) * per_page:page * per_page]
+
+        patient_ids = [row.id for table, row in hits if table == 'patients']
+        appointment_ids = [row.id for table, row in hits if table == 'appointments']
+        appointments = {row.id: row for row in conn.execute(
+            select(Appointment.id, Appointment.patient_id, Appointment.appointment_date, Appointment.treatment_type)
+            .where(Appointment.id.in_(appointment_ids))
+        )} if appointment_ids else {}
+        patient_ids += [row.patient_id for row in appointments.values()]
+        patients = {row.id: row for row in conn.execute(
+            select(Patient.id, Patient.first_name, Patient.last_name).where(Patient.id.in_(patient_ids))
+        )} if patient_ids else {}
+
+    results = []
+    for table, row in hits:
+        if table == 'patients':
+            patient = patients[row.id]
+            results.append({
+                'type': 'patient',
+                'id': row.id,
+                'patient_id': row.id,
+                'title': f'{patient.first_name} {patient.last_name}',
+                'snippet': _highlight(row.snippet),
+                'score': round(float(row.score), 6)
+            })
+        else:
+            appointment = appointments[row.id]
+            patient = patients.get(appointment.patient_id)
+            name = f'{patient.first_name} {patient.last_name}' if patient else 'Unknown patient'
+            results.append({
+                'type': 'appointment',
+                'id': row.id,
+                'patient_id': appointment.patient_id,
+                'title': f'{appointment.treatment_type or "Appointment"} - {name}',
+                'appointment_date': appointment.appointment_date.isoformat(),
+                'snippet': _highlight(row.snippet),
+                'score': round(float(row.score), 6)
+            })
+    return {'query': query, 'page': page, 'per_page': per_page, 'total': total, 'results': results}
+
+
+@job_handler('reindex_search')
+def reindex_search_job(payload):
+    """Rebuild the full-text index from the background worker"""
+    from flask import current_app
+    return reindex_search(current_app._get_current_object(), tables=payload.get('tables'))
+
+
+def init_search(app):
+    """Register `flask reindex-search`"""
+
+    @app.cli.command('reindex-search')
+    @click.option('--table', 'tables', multiple=True, type=click.Choice(sorted(INDEXED)), help='Only these tables')
+    @click.option('--chunk-size', type=int, default=5000, help='Rows per chunk (PostgreSQL)')
+    @click.option('--workers', type=int, default=4, help='Chunks indexed in parallel (PostgreSQL)')
+    def reindex_search_command(tables, chunk_size, workers):
+        """Recompute the full-text search index"""
+        counts = reindex_search(app, tables=list(tables) or None, chunk_size=chunk_size, workers=workers)
+        for table, count in counts.items():
+            print(f"🔍 Indexed {count} {table}")
@@ -0,0 +1,294 @@
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from sqlalchemy import delete, insert, select, update
+from werkzeug.datastructures import CallbackDict
+from src.models.base import db
+from src.models.session import UserSession
+
+SNAPSHOT_KEY = '_user_snapshot'
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session whose data lives in a SessionStore; the cookie only holds its id"""
+
+    def __init__(self, initial=None, sid=None, expires_at=None, new=False):
+        def on_update(session):
+            session.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Move the session to a fresh id (call after login to prevent fixation)"""
+        if not self.new and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = _new_sid()
+        self.modified = True
+
+
+class SqlSessionStore:
+    """Sessions in the user_sessions table (SQLite or PostgreSQL)"""
+
+    def __init__(self, app):
+        with app.app_context():
+            # Sessions always live on the primary database
+            self.engine = db.engine
+        self.table = UserSession.__table__
+
+    def get(self, sid):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(self.table.c.data, self.table.c.expires_at).where(self.table.c.id == sid)
+            ).first()
+        if row is None or row.expires_at <= datetime.utcnow():
+            return None
+        return json.loads(row.data), row.expires_at
+
+    def save(self, sid, data, user_id, expires_at):
+        values = {'data': json.dumps(data), 'user_id': user_id, 'expires_at': expires_at}
+        with self.engine.begin() as conn:
+            result = conn.execute(update(self.table).where(self.table.c.id == sid).values(**values))
+            if result.rowcount == 0:
+                conn.execute(insert(self.table).values(id=sid, created_at=datetime.utcnow(), **values))
+
+    def delete(self, sid):
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.id == sid))
+
+    def delete_for_user(self, user_id, keep_sid=None):
+        statement = delete(self.table).where(self.table.c.user_id == user_id)
+        if keep_sid:
+            statement = statement.where(self.table.c.id != keep_sid)
+        with self.engine.begin() as conn:
+            return conn.execute(statement).rowcount
+
+    def sweep(self):
+        with self.engine.begin() as conn:
+            return conn.execute(
+                delete(self.table).where(self.table.c.expires_at <= datetime.utcnow())
+            ).rowcount
+
+
+class FileSessionStore:
+    """Sessions as small JSON files in a local directory (single-host deployments)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, f'{sid}.json')
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, sid):
+        record = self._read(self._path(sid))
+        if record is None:
+            return None
+        expires_at = datetime.fromisoformat(record['expires_at'])
+        if expires_at <= datetime.utcnow():
+            return None
+        return record['data'], expires_at
+
+    def save(self, sid, data, user_id, expires_at):
+        record = {'data': data, 'user_id': user_id, 'expires_at': expires_at.isoformat()}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, self._path(sid))
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except FileNotFoundError:
+            pass
+
+    def _records(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                yield name[:-5], path, self._read(path)
+
+    def delete_for_user(self, user_id, keep_sid=None):
+        removed = 0
+        for sid, path, record in self._records():
+            if record and record.get('user_id') == user_id and sid != keep_sid:
+                self.delete(sid)
+                removed += 1
+        return removed
+
+    def sweep(self):
+        now = datetime.utcnow()
+        removed = 0
+        for sid, path, record in self._records():
+            if record is None or datetime.fromisoformat(record['expires_at']) <= now:
+                self.delete(sid)
+                removed += 1
+        return removed
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps session data server-side, so requests carry a short signed id"""
+
+    salt = 'dental-server-session'
+
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            if sid:
+                stored = self.store.get(sid)
+                if stored is not None:
+                    data, expires_at = stored
+                    return ServerSideSession(data, sid=sid, expires_at=expires_at)
+        return ServerSideSession(sid=_new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+            session.previous_sid = None
+
+        if not session:
+            if not session.new:
+                self.store.delete(session.sid)
+            if session.modified:
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime
+        now = datetime.utcnow()
+        # Skip the write on read-only requests unless the expiry needs sliding forward
+        needs_refresh = session.expires_at is None or session.expires_at - now < lifetime / 2
+        if not (session.modified or session.new or needs_refresh):
+            return
+
+        expires_at = now + lifetime
+        self.store.save(session.sid, dict(session), session_user_id(session.get('_user_id')), expires_at)
+        session.expires_at = expires_at
+
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid.encode()).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def _new_sid():
+    return secrets.token_urlsafe(32)
+
+
+def init_sessions(app):
+    """Install the configured server-side session backend"""
+    backend = os.environ.get('SESSION_BACKEND', 'sql')
+    if backend == 'file':
+        directory = os.environ.get(
+            'SESSION_FILE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'sessions')
+        )
+        store = FileSessionStore(directory)
+    else:
+        store = SqlSessionStore(app)
+
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=int(os.environ.get('SESSION_LIFETIME_HOURS', 12)))
+    app.session_interface = ServerSideSessionInterface(store)
+    app.extensions['session_store'] = store
+
+    interval = int(os.environ.get('SESSION_SWEEP_INTERVAL', 300))
+    if interval > 0:
+        threading.Thread(target=_sweep_forever, args=(app, store, interval),
+                         name='session-sweeper', daemon=True).start()
+    return store
+
+
+def _sweep_forever(app, store, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            removed = store.sweep()
+            if removed:
+                print(f"Removed {removed} expired sessions")
+        except Exception as e:
+            print(f"Error sweeping expired sessions: {str(e)}")
+
+
+def revoke_user_sessions(user_id, keep_current=False):
+    """Log a user out everywhere (optionally except the current session)"""
+    from flask import current_app, session
+
+    keep_sid = getattr(session, 'sid', None) if keep_current else None
+    return current_app.extensions['session_store'].delete_for_user(user_id, keep_sid=keep_sid)
+
+
+def session_user_id(login_id):
+    """User id from a Flask-Login id ('<user id>:<password fingerprint>', see User.get_id)"""
+    return int(str(login_id).partition(':')[0]) if login_id else None
+
+
+def refresh_login(user):
+    """Re-issue this session's login (and remember-me cookie) after changing our own password"""
+    from flask import current_app, request, session
+
+    session['_user_id'] = user.get_id()
+    session[SNAPSHOT_KEY] = user_snapshot(user)
+    if current_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token') in request.cookies:
+        session['_remember'] = 'set'
+
+
+def user_snapshot(user):
+    """Fields cached in the session so requests do not reload the user"""
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'is_active': user.is_active,
+        'created_at': user.created_at.isoformat() if user.created_at else None,
+        'fingerprint': user.password_fingerprint(),
+    }
+
+
+def user_from_snapshot(snapshot):
+    """Rebuild a detached User from a session snapshot"""
+    from src.models.user import User
+
+    created_at = snapshot.get('created_at')
+    user = User(
+        id=snapshot['id'],
+        username=snapshot['username'],
+        email=snapshot['email'],
+        is_active=snapshot['is_active'],
+        created_at=datetime.fromisoformat(created_at) if created_at else None,
+    )
+    user.snapshot_fingerprint = snapshot.get('fingerprint', '')
+    return user
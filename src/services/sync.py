@@ -0,0 +1,142 @@
+import base64
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import and_, event, insert, or_
+from sqlalchemy.orm import Session
+from src.models.appointment import Appointment
+from src.models.archive import ArchivedAppointment
+from src.models.patient import Patient
+from src.models.tombstone import DeletedRecord
+from src.models.treatment import Treatment
+
+SYNCED_MODELS = {
+    'patients': Patient,
+    'appointments': Appointment,
+    'treatments': Treatment,
+}
+TOMBSTONE_TYPES = {model: name for name, model in SYNCED_MODELS.items()}
+EPOCH = datetime(1970, 1, 1)
+TOKEN_VERSION = 1
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def _safety_lag():
+    # Rows younger than this are held back: a transaction that stamped updated_at
+    # earlier but commits later must not slip behind a client's cursor
+    return timedelta(seconds=float(os.environ.get('SYNC_SAFETY_LAG_SECONDS', 2)))
+
+
+def encode_token(cursors):
+    payload = {'v': TOKEN_VERSION, 'c': {
+        name: [timestamp.isoformat(), last_id] for name, (timestamp, last_id) in cursors.items()
+    }}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Per-collection (updated_at, id) keyset cursors from an opaque token"""
+    cursors = {name: (EPOCH, 0) for name in list(SYNCED_MODELS) + ['deleted', 'archived']}
+    if not token:
+        return cursors
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload.get('v') != TOKEN_VERSION:
+            raise InvalidSyncToken('Unsupported sync token version')
+        for name, (timestamp, last_id) in payload['c'].items():
+            if name in cursors:
+                cursors[name] = (datetime.fromisoformat(timestamp), int(last_id))
+    except InvalidSyncToken:
+        raise
+    except Exception:
+        raise InvalidSyncToken('Malformed sync token')
+    return cursors
+
+
+def _after_keyset(column, id_column, cursor):
+    timestamp, last_id = cursor
+    return or_(column > timestamp, and_(column == timestamp, id_column > last_id))
+
+
+def changes_since(token=None, limit=1000):
+    """Rows created/updated and tombstones recorded after the token's cursors
+
+    Each collection is read with an indexed keyset scan on (updated_at, id),
+    at most `limit` rows at a time; `has_more` tells the client to call
+    again with `next_token` straight away. Archived appointments have left
+    the hot table, so they are reported among the deleted appointments.
+    """
+    cursors = decode_token(token)
+    horizon = datetime.utcnow() - _safety_lag()
+    result = {'deleted': {name: [] for name in SYNCED_MODELS}}
+    has_more = False
+
+    for name, model in SYNCED_MODELS.items():
+        rows = model.query.filter(
+            _after_keyset(model.updated_at, model.id, cursors[name]),
+            model.updated_at <= horizon
+        ).order_by(model.updated_at, model.id).limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            has_more = True
+        if rows:
+            cursors[name] = (rows[-1].updated_at, rows[-1].id)
+
+        changed = []
+        for row in rows:
+            # Soft-deleted rows are reported as tombstones
+            if getattr(row, 'deleted_at', None):
+                result['deleted'][name].append(row.id)
+            else:
+                changed.append(row.to_dict())
+        result[name] = changed
+
+    tombstones = DeletedRecord.query.filter(
+        _after_keyset(DeletedRecord.deleted_at, DeletedRecord.id, cursors['deleted']),
+        DeletedRecord.deleted_at <= horizon
+    ).order_by(DeletedRecord.deleted_at, DeletedRecord.id).limit(limit + 1).all()
+    if len(tombstones) > limit:
+        tombstones = tombstones[:limit]
+        has_more = True
+    if tombstones:
+        cursors['deleted'] = (tombstones[-1].deleted_at, tombstones[-1].id)
+    for tombstone in tombstones:
+        if tombstone.entity_type in result['deleted']:
+            result['deleted'][tombstone.entity_type].append(tombstone.entity_id)
+
+    # Archival moves rows with Core statements, which leave no tombstone; the archive is its own log
+    archive = ArchivedAppointment
+    archived = archive.query.with_entities(archive.id, archive.archived_at).filter(
+        _after_keyset(archive.archived_at, archive.id, cursors['archived']),
+        archive.archived_at <= horizon
+    ).order_by(archive.archived_at, archive.id).limit(limit + 1).all()
+    if len(archived) > limit:
+        archived = archived[:limit]
+        has_more = True
+    if archived:
+        cursors['archived'] = (archived[-1].archived_at, archived[-1].id)
+    result['deleted']['appointments'].extend(row.id for row in archived)
+
+    result['next_token'] = encode_token(cursors)
+    result['has_more'] = has_more
+    return result
+
+
+def _record_hard_deletes(session, flush_context):
+    rows = [
+        {'entity_type': TOMBSTONE_TYPES[type(obj)], 'entity_id': obj.id, 'deleted_at': datetime.utcnow()}
+        for obj in session.deleted if type(obj) in TOMBSTONE_TYPES
+    ]
+    if rows:
+        # Same transaction as the delete itself
+        session.connection().execute(insert(DeletedRecord.__table__), rows)
+
+
+def init_sync():
+    """Leave tombstones for hard-deleted patients, appointments and treatments"""
+    if not event.contains(Session, 'after_flush', _record_hard_deletes):
+        event.listen(Session, 'after_flush', _record_hard_deletes)
@@ -75,6 +75,72 @@ function initializeApp() {
     loadDashboard();
     setupEventListeners();
     updateUserInterface();
+    startChangeFeed();
+}
+
+// Live updates: apply changes made by other staff instead of re-pulling whole lists
+let dashboardRefreshTimer = null;
+
+function startChangeFeed() {
+    if (!window.EventSource) return;
+    
+    const source = new EventSource(`${API_BASE}/events`, { withCredentials: true });
+    source.addEventListener('change', function(e) {
+        applyChangeEvent(JSON.parse(e.data));
+    });
+    // The server could not replay what we missed: reload the visible section once
+    source.addEventListener('reset', function() {
+        refreshCurrentSection();
+    });
+}
+
+function refreshCurrentSection() {
+    if (currentSection === 'dashboard') loadDashboard();
+    else if (currentSection === 'appointments') loadAppointments();
+    else if (currentSection === 'patients') loadPatients();
+    else if (currentSection === 'treatments') loadTreatments();
+}
+
+function scheduleDashboardRefresh() {
+    // Coalesce bursts of changes into a single refresh
+    clearTimeout(dashboardRefreshTimer);
+    dashboardRefreshTimer = setTimeout(loadDashboard, 1000);
+}
+
+async function applyChangeEvent(change) {
+    if (currentSection === 'dashboard' && change.entity !== 'treatment') {
+        scheduleDashboardRefresh();
+    } else if (currentSection === 'appointments' && change.entity === 'appointment') {
+        const filtered = document.getElementById('appointment-date-filter').value ||
+            document.getElementById('appointment-status-filter').value;
+        if (filtered) {
+            loadAppointments();
+            return;
+        }
+        appointments = appointments.filter(apt => apt.id !== change.id);
+        if (change.action !== 'deleted') {
+            const response = await authenticatedFetch(`${API_BASE}/appointments/${change.id}`);
+            if (response && response.ok) {
+                appointments.push(await response.json());
+                appointments.sort((a, b) => b.appointment_date.localeCompare(a.appointment_date));
+            }
+        }
+        renderAppointments(appointments);
+    } else if (currentSection === 'appointments' && change.entity === 'patient' && change.action === 'deleted') {
+        appointments = appointments.filter(apt => apt.patient_id !== change.id);
+        renderAppointments(appointments);
+    } else if (currentSection === 'patients' && change.entity === 'patient') {
+        patients = patients.filter(patient => patient.id !== change.id);
+        if (change.action !== 'deleted') {
+            const response = await authenticatedFetch(`${API_BASE}/patients/${change.id}`);
+            if (response && response.ok) {
+                patients.push(await response.json());
+            }
+        }
+        renderPatientCards(patients);
+    } else if (currentSection === 'treatments' && change.entity === 'treatment') {
+        loadTreatments();
+    }
 }
 
 function updateUserInterface() {
@@ -576,7 +642,7 @@ async function selectPatient(patientId) {
 async function showPatientDetails(patient) {
     // Load patient's appointments (both past and future)
     try {
-        const response = await authenticatedFetch(`${API_BASE}/appointments?patient_id=${patient.id}`);
+        const response = await authenticatedFetch(`${API_BASE}/appointments?patient_id=${patient.id}&include_archived=true`);
         let allAppointments = [];
         if (response && response.ok) {
             allAppointments = await response.json();
@@ -1279,7 +1345,16 @@ async function generateReports() {
             return;
         }
         
-        const reportData = await response.json();
+        let reportData = await response.json();
+        
+        // Long date ranges are built by the background worker: wait for the job
+        if (response.status === 202) {
+            reportData = await waitForJob(reportData.job_id);
+            if (!reportData) {
+                showError('Report generation failed, please try again');
+                return;
+            }
+        }
         console.log('Reports data received:', reportData);
         
         // Validate data structure
@@ -1296,6 +1371,17 @@ async function generateReports() {
     }
 }
 
+async function waitForJob(jobId, intervalMs = 1500) {
+    while (true) {
+        const response = await authenticatedFetch(`${API_BASE}/jobs/${jobId}`);
+        if (!response || !response.ok) return null;
+        const job = await response.json();
+        if (job.status === 'succeeded') return job.result;
+        if (job.status === 'failed') return null;
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
 function displayReports(appointmentData, revenueData) {
     const container = document.getElementById('reports-content');
     if (!container) {
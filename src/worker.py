@@ -0,0 +1,12 @@
+import os
+import sys
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.main import app
+from src.services.jobs import run_worker
+
+# Background job worker: runs queued reports, reminders and maintenance jobs
+# outside the web workers. Start one or more with `cd src && python worker.py`.
+if __name__ == '__main__':
+    run_worker(app)